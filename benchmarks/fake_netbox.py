@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+"""A stand-in for the Netbox API, serving synthetic sites and devices.
+
+Usage:
+    python benchmarks/fake_netbox.py [--devices 10000] [--latency 0.05]
+"""
+
+import argparse
+import BaseHTTPServer
+import gzip
+import json
+import SocketServer
+import StringIO
+import threading
+import time
+import urllib
+import urlparse
+
+DEVICES_PER_SITE = 100
+
+
+class FakeNetbox(object):
+    """A local HTTP server that answers like the Netbox API.
+
+    Only the requests made by `NetboxAPI` are supported: paginated
+    `dcim/devices/` and `dcim/sites/` with the `limit`, `offset`, `site`, `q`,
+    `has_primary_ip`, `last_updated__gte` and `fields` parameters. Records are
+    generated from their index on each request, so the server's memory doesn't
+    grow with the number of devices.
+
+    Arguments:
+        devices (int, optional): The number of devices. Default is 1000.
+        sites (int, optional): The number of sites. Default is one for every
+            100 devices.
+        latency (float, optional): The number of seconds to wait before
+            answering each request. Default is 0.
+        fields (bool, optional): True if the `fields` parameter is honoured,
+            as in newer versions of Netbox. Default is True.
+        host (str, optional): The address to listen on. Default is
+            `127.0.0.1`.
+        port (int, optional): The port to listen on. Default is 0, which picks
+            a free port.
+    """
+
+    def __init__(self, devices=1000, sites=None, latency=0.0, fields=True,
+                 host='127.0.0.1', port=0):
+        self.devices = devices
+        self.sites = sites or max(devices // DEVICES_PER_SITE, 1)
+        self.latency = latency
+        self.fields = fields
+        self.requests = 0
+
+        self.server = FakeNetboxServer((host, port), FakeNetboxHandler)
+        self.server.netbox = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """The URL to use as `NetboxAPI.base_url`."""
+        host, port = self.server.server_address[:2]
+        return 'http://%s:%d/api/' % (host, port)
+
+    def start(self):
+        """Start answering requests in a background thread.
+
+        Returns:
+            str: The `base_url` of the server.
+        """
+        self._thread = threading.Thread(target=self.server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        """Stop the server and close its socket."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def site(self, index):
+        """Build the full representation of a site."""
+        return {
+            'id': index + 1,
+            'name': 'Site %04d' % index,
+            'slug': 'site-%04d' % index,
+            'facility': 'DC%04d' % index,
+            'asn': 64512 + index,
+            'time_zone': 'UTC',
+            'description': 'Synthetic site %d' % index,
+            'physical_address': '%d Example Street' % index,
+            'contact_name': 'Operations',
+            'comments': '',
+            'tags': [],
+            'custom_fields': {},
+            'count_prefixes': 4,
+            'count_vlans': 2,
+            'count_racks': 8,
+            'count_devices': len(range(index, self.devices, self.sites)),
+            'count_circuits': 1,
+            'last_updated': '2018-01-01T00:00:00Z',
+        }
+
+    def device(self, index):
+        """Build the full representation of a device."""
+        site = index % self.sites
+        return {
+            'id': index + 1,
+            'name': 'sw%06d-1' % index,
+            'display_name': 'sw%06d-1' % index,
+            'device_type': {
+                'id': 1, 'model': 'EX4300-48T', 'slug': 'ex4300-48t',
+                'manufacturer': {'id': 1, 'name': 'Juniper', 'slug': 'juniper'},
+            },
+            'device_role': {'id': 1, 'name': 'Access', 'slug': 'access'},
+            'tenant': None,
+            'platform': {'id': 1, 'name': 'Junos', 'slug': 'junos'},
+            'serial': 'SN%08d' % index,
+            'asset_tag': None,
+            'site': {'id': site + 1, 'name': 'Site %04d' % site,
+                     'slug': 'site-%04d' % site},
+            'rack': {'id': index // 40 + 1, 'name': 'R%d' % (index // 40),
+                     'display_name': 'R%d' % (index // 40)},
+            'position': index % 40 + 1,
+            'face': {'value': 0, 'label': 'Front'},
+            'parent_device': None,
+            'status': {'value': 1, 'label': 'Active'},
+            'primary_ip': {
+                'id': index + 1, 'family': 4,
+                'address': '10.%d.%d.%d/24' % (
+                    index >> 16 & 255, index >> 8 & 255, index & 255),
+            },
+            'primary_ip4': {
+                'id': index + 1, 'family': 4,
+                'address': '10.%d.%d.%d/24' % (
+                    index >> 16 & 255, index >> 8 & 255, index & 255),
+            },
+            'primary_ip6': None,
+            'cluster': None,
+            'virtual_chassis': None,
+            'vc_position': None,
+            'vc_priority': None,
+            'comments': '',
+            'tags': [],
+            'custom_fields': {},
+            'created': '2018-01-01',
+            'last_updated': '2018-01-01T00:00:00Z',
+        }
+
+    def select(self, path, params):
+        """Pick the indexes and builder for the records a request asks for.
+
+        Arguments:
+            path (str): The path of the request.
+            params (dict): The query parameters of the request.
+
+        Returns:
+            tuple: The indexes of the matching records and a callable that
+            builds a record from its index, or None if the path is unknown.
+        """
+        if path.endswith('/dcim/sites/'):
+            return range(self.sites), self.site
+        if not path.endswith('/dcim/devices/'):
+            return None
+
+        if params.get('last_updated__gte', '') > '2018-01-01T00:00:00Z':
+            return list(), self.device
+        if 'site' in params:
+            slug = params['site']
+            site = int(slug.rsplit('-', 1)[-1]) if slug[-1:].isdigit() else -1
+            if not 0 <= site < self.sites:
+                return list(), self.device
+            return range(site, self.devices, self.sites), self.device
+        if 'q' in params:
+            q = params['q'].lower()
+            return ([index for index in range(self.devices)
+                     if q in 'sw%06d-1' % index], self.device)
+        return range(self.devices), self.device
+
+    def respond(self, path, query):
+        """Build the response to a request.
+
+        Arguments:
+            path (str): The path of the request.
+            query (str): The query string of the request.
+
+        Returns:
+            tuple: The HTTP status and the response body.
+        """
+        params = dict(urlparse.parse_qsl(query))
+        selected = self.select(path, params)
+        if selected is None:
+            return 404, json.dumps({'detail': 'Not found.'})
+        indexes, build = selected
+
+        limit = int(params.get('limit', 50))
+        offset = int(params.get('offset', 0))
+        if limit:
+            page = indexes[offset:offset + limit]
+        else:
+            page = indexes[offset:]
+
+        fields = None
+        if self.fields and params.get('fields'):
+            fields = params['fields'].split(',')
+
+        results = list()
+        for index in page:
+            record = build(index)
+            if fields:
+                record = dict((key, record[key]) for key in fields
+                              if key in record)
+            results.append(record)
+
+        next_url = None
+        if limit and offset + limit < len(indexes):
+            params['offset'] = offset + limit
+            next_url = '%s%s?%s' % (self.base_url.split('/api/')[0], path,
+                                    urllib.urlencode(sorted(params.items())))
+
+        return 200, json.dumps({
+            'count': len(indexes),
+            'next': next_url,
+            'previous': None,
+            'results': results,
+        })
+
+
+class FakeNetboxHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answer a single request to the fake Netbox API."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        netbox = self.server.netbox
+        netbox.requests += 1
+        if netbox.latency:
+            time.sleep(netbox.latency)
+
+        parts = urlparse.urlsplit(self.path)
+        status, body = netbox.respond(parts.path, parts.query)
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            buf = StringIO.StringIO()
+            compressed = gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=1)
+            compressed.write(body)
+            compressed.close()
+            body = buf.getvalue()
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeNetboxServer(SocketServer.ThreadingMixIn,
+                       BaseHTTPServer.HTTPServer):
+    """A threaded HTTP server for `FakeNetbox`."""
+
+    daemon_threads = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, default=1000,
+                        help="number of devices (default: %(default)s)")
+    parser.add_argument('--sites', type=int, default=None,
+                        help="number of sites (default: devices / 100)")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="seconds added to each request (default: %(default)s)")
+    parser.add_argument('--no-fields', dest='fields', action='store_false',
+                        help="ignore the `fields` parameter, like older Netbox")
+    parser.add_argument('--port', type=int, default=8000,
+                        help="port to listen on (default: %(default)s)")
+    args = parser.parse_args()
+
+    netbox = FakeNetbox(devices=args.devices, sites=args.sites,
+                        latency=args.latency, fields=args.fields,
+                        port=args.port)
+    print("Serving %d devices at %s" % (netbox.devices, netbox.base_url))
+    try:
+        netbox.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
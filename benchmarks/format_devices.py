@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""Compare device normalization before and after `NetboxAPI.format_device`.
+
+Usage:
+    python benchmarks/format_devices.py [--count 100000] [--repeat 5]
+"""
+
+import argparse
+import copy
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'jumpbox'))
+
+from netbox_api import DEVICE_FIELDS  # noqa: E402
+from netbox_api import NetboxAPI  # noqa: E402
+
+
+def make_devices(count):
+    """Build `count` synthetic devices in the format returned by Netbox.
+
+    Arguments:
+        count (int): The number of devices.
+
+    Returns:
+        list
+    """
+    devices = list()
+    for index in range(count):
+        devices.append({
+            'id': index,
+            'name': u'switch%05d-%d' % (index, index % 3),
+            'display_name': u'switch%05d-%d' % (index, index % 3),
+            'primary_ip': {
+                'id': index,
+                'family': 4,
+                'address': u'10.%d.%d.%d/24' % (
+                    index >> 16 & 255, index >> 8 & 255, index & 255),
+            },
+            'site': {'id': index % 50, 'name': u'Site %d' % (index % 50),
+                     'slug': u'site-%d' % (index % 50)},
+            'last_updated': u'2018-01-01T00:00:00Z',
+        })
+    return devices
+
+
+def legacy_format_devices(data):
+    """The two-pass, regex based `format_devices` this benchmark compares to."""
+    for index, item in enumerate(data):
+        if re.search('[/]\d+$', item['primary_ip']['address']):
+            item['primary_ip']['address'] = re.sub(
+                '[/]\d+$', '', item['primary_ip']['address'])
+
+    for index, item in enumerate(data):
+        if re.search('-\d$', item['display_name']):
+            item['display_name'] = re.sub('-\d$', '', item['display_name'])
+
+    return data
+
+
+def best_time(function, devices, repeat):
+    """Return the best time, in seconds, to run `function` over `devices`.
+
+    Each run is given a fresh copy of the devices, since both versions
+    modify them.
+    """
+    times = list()
+    for _ in range(repeat):
+        data = copy.deepcopy(devices)
+        start = timeit.default_timer()
+        function(data)
+        times.append(timeit.default_timer() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000,
+                        help="number of synthetic devices (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="runs of each version (default: %(default)s)")
+    args = parser.parse_args()
+
+    devices = make_devices(args.count)
+    api = NetboxAPI(cache_ttl=0, socket_path=None)
+    api_full = NetboxAPI(cache_ttl=0, socket_path=None, fields=False)
+
+    expected = legacy_format_devices(copy.deepcopy(devices))
+    assert api_full.format_devices(copy.deepcopy(devices)) == expected
+
+    legacy = best_time(legacy_format_devices, devices, args.repeat)
+    print("%d devices, best of %d runs" % (args.count, args.repeat))
+    print("%-28s %8.3fs" % ("legacy format_devices", legacy))
+    trimmed = [dict((key, item[key]) for key in DEVICE_FIELDS)
+               for item in devices]
+    for label, instance, data in (
+            ("format_devices", api_full, devices),
+            ("format_devices (fields)", api, trimmed),
+            ("format_devices (trimming)", api, devices)):
+        elapsed = best_time(instance.format_devices, data, args.repeat)
+        print("%-28s %8.3fs  %5.1fx" % (label, elapsed, legacy / elapsed))
+
+
+if __name__ == '__main__':
+    main()
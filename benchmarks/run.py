@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+"""Benchmark the Jumpbox against a local stand-in for Netbox.
+
+Each benchmark runs in its own process, so the peak RSS it reports belongs to
+that benchmark alone. Results are written as JSON so they can be compared
+between runs.
+
+Usage:
+    python benchmarks/run.py [--scales 1000,10000,100000] [--latency 0.01]
+                             [--output results.json]
+"""
+
+import argparse
+import errno
+import fcntl
+import json
+import os
+import platform
+import pty
+import resource
+import select
+import struct
+import subprocess
+import sys
+import tempfile
+import termios
+import time
+import timeit
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, os.pardir, 'jumpbox'))
+
+from fake_netbox import FakeNetbox  # noqa: E402
+
+BENCHMARKS = ('fetch', 'fetch_stream', 'format', 'main', 'draw')
+SCALES = (1000, 10000, 100000)
+TERM_SIZE = (40, 120)
+
+
+def peak_rss_kb():
+    """Return the peak resident set size of this process, in KiB."""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return usage // 1024
+    return usage
+
+
+def summarize(samples):
+    """Summarize a list of timings, in seconds, as milliseconds.
+
+    Arguments:
+        samples (list): The timings.
+
+    Returns:
+        dict: The `mean`, `p50`, `p95` and `max` of the timings.
+    """
+    samples = sorted(samples)
+    count = len(samples)
+    return {
+        'mean_ms': 1000.0 * sum(samples) / count,
+        'p50_ms': 1000.0 * samples[count // 2],
+        'p95_ms': 1000.0 * samples[min(int(count * 0.95), count - 1)],
+        'max_ms': 1000.0 * samples[-1],
+    }
+
+
+def bench_api(url, **kwargs):
+    """Build a `NetboxAPI` that talks to the stand-in and nothing else."""
+    from netbox_api import NetboxAPI
+
+    api = NetboxAPI(cache_ttl=0, socket_path=None, **kwargs)
+    api.base_url = url
+    return api
+
+
+def bench_fetch(url, scale, stream=False):
+    """Time fetching and formatting every site and device."""
+    api = bench_api(url, stream=stream)
+
+    start = timeit.default_timer()
+    sites = api.get_sites()
+    sites_time = timeit.default_timer() - start
+
+    start = timeit.default_timer()
+    count = 0
+    for _ in api.iter_devices():
+        count += 1
+    devices_time = timeit.default_timer() - start
+
+    return {
+        'sites': len(sites),
+        'sites_s': sites_time,
+        'devices': count,
+        'devices_s': devices_time,
+        'devices_per_s': count / devices_time,
+    }
+
+
+def bench_format(url, scale):
+    """Time `format_devices` and `format_sites` on the raw responses.
+
+    Each page is formatted as soon as it arrives and then dropped, so only
+    the time spent formatting is counted. Pages are fetched one at a time, so
+    no other thread competes with the formatting for the interpreter.
+    """
+    api = bench_api(url, fields=False, max_workers=1)
+
+    result = dict()
+    for name, function, path in (
+            ('devices', api.format_devices, 'dcim/devices/?limit=1000'),
+            ('sites', api.format_sites, 'dcim/sites/?limit=1000')):
+        count = 0
+        elapsed = 0.0
+        for page in api.iter_pages(api.base_url + path):
+            start = timeit.default_timer()
+            count += len(function(page))
+            elapsed += timeit.default_timer() - start
+        result[name] = count
+        result[name + '_s'] = elapsed
+        result[name + '_per_s'] = count / elapsed if elapsed else None
+    return result
+
+
+def bench_main(url, scale):
+    """Time `main()` building the menus, without starting curses."""
+    import jumpbox
+    import main
+    import netbox_api
+    import netbox_item
+
+    class BenchNetboxAPI(netbox_api.NetboxAPI):
+        def __init__(self, *args, **kwargs):
+            kwargs['cache_ttl'] = 0
+            kwargs['socket_path'] = None
+            super(BenchNetboxAPI, self).__init__(*args, **kwargs)
+            self.base_url = url
+
+    menus = list()
+    main.NetboxAPI = netbox_item.NetboxAPI = BenchNetboxAPI
+    jumpbox.Jumpbox.start = lambda self, *args, **kwargs: menus.append(self)
+    os.environ.pop('JUMPBOX_ASYNC', None)
+
+    start = timeit.default_timer()
+    main.main()
+    elapsed = timeit.default_timer() - start
+
+    return {
+        'main_s': elapsed,
+        'main_menu_items': len(menus[0].items) if menus else None,
+    }
+
+
+def bench_draw(url, scale, keys=200):
+    """Time drawing and moving through a menu of `scale` devices.
+
+    This runs on the terminal the process was given, which `run_child`
+    provides as a pseudo-terminal, so nothing is shown.
+    """
+    import curses
+
+    from device_store import DeviceRecord
+    from jumpbox import Jumpbox
+    from netbox_item import DeviceItem
+
+    rows, cols = TERM_SIZE
+    fcntl.ioctl(sys.stdout.fileno(), termios.TIOCSWINSZ,
+                struct.pack('HHHH', rows, cols, 0, 0))
+
+    script = ([curses.KEY_DOWN] * keys + [curses.KEY_UP] * keys +
+              [curses.KEY_UP] + [curses.KEY_DOWN])
+    timings = {'draw': list(), 'down': list(), 'up': list(), 'wrap': list()}
+    names = (['down'] * keys + ['up'] * keys + ['wrap', 'wrap'])
+
+    class ScriptedJumpbox(Jumpbox):
+        """A menu that reads its keys from `script` and times each one."""
+
+        pressed = None
+        started = None
+
+        def get_input(self, wait=True):
+            if not wait:
+                # Keys are pressed one at a time, so none are ever waiting.
+                return -1
+            now = timeit.default_timer()
+            if self.pressed is not None:
+                timings[self.pressed].append(now - self.started)
+            if not script:
+                self.should_exit = True
+                return -1
+            self.pressed = names.pop(0)
+            self.started = timeit.default_timer()
+            return script.pop(0)
+
+        def run_idle_handlers(self):
+            pass
+
+    menu = ScriptedJumpbox("All Devices", "Select a device...")
+    menu.extend_items(
+        DeviceItem(record=DeviceRecord(index, 'sw%06d' % index,
+                                       '10.%d.%d.%d' % (index >> 16 & 255,
+                                                        index >> 8 & 255,
+                                                        index & 255)))
+        for index in range(scale))
+
+    def run(scr):
+        Jumpbox.stdscr = scr
+        menu.term_y, menu.term_x = scr.getmaxyx()
+        menu.screen = curses.newpad(menu.term_y, menu.term_x)
+        menu._set_up_colors()
+        menu.add_exit()
+        for _ in range(50):
+            start = timeit.default_timer()
+            menu.draw()
+            timings['draw'].append(timeit.default_timer() - start)
+        while not menu.should_exit:
+            menu.process_user_input()
+
+    curses.wrapper(run)
+
+    result = {'terminal': '%dx%d' % (cols, rows)}
+    for name, samples in timings.items():
+        for key, value in summarize(samples).items():
+            result['%s_%s' % (name, key)] = value
+    return result
+
+
+def child(args):
+    """Run a single benchmark and write its result as JSON."""
+    functions = {
+        'fetch': bench_fetch,
+        'fetch_stream': lambda url, scale: bench_fetch(url, scale, stream=True),
+        'format': bench_format,
+        'main': bench_main,
+        'draw': bench_draw,
+    }
+    result = functions[args.child](args.url, args.scale)
+    result['peak_rss_kb'] = peak_rss_kb()
+    with open(args.result, 'w') as output:
+        json.dump(result, output)
+
+
+def run_child(name, url, scale, timeout):
+    """Run a benchmark in a new process and return its result.
+
+    The `draw` benchmark is given a pseudo-terminal, which is read until the
+    process exits so curses never blocks on output.
+    """
+    handle, result_path = tempfile.mkstemp(prefix='jumpbox-bench-',
+                                           suffix='.json')
+    os.close(handle)
+    argv = [sys.executable, os.path.abspath(__file__), '--child', name,
+            '--url', url, '--scale', str(scale), '--result', result_path]
+    try:
+        start = time.time()
+        if name == 'draw':
+            pid, master = pty.fork()
+            if pid == 0:
+                os.environ['TERM'] = 'xterm'
+                os.execv(argv[0], argv)
+            done, status = 0, 0
+            while True:
+                if time.time() - start > timeout:
+                    os.kill(pid, 9)
+                try:
+                    ready, _, _ = select.select([master], [], [], 0.5)
+                    if ready and not os.read(master, 65536):
+                        break
+                except OSError as err:
+                    if err.errno != errno.EIO:
+                        raise
+                    break
+                done, status = os.waitpid(pid, os.WNOHANG)
+                if done:
+                    break
+            if not done:
+                _, status = os.waitpid(pid, 0)
+            os.close(master)
+        else:
+            status = subprocess.call(argv)
+
+        if status != 0:
+            return {'error': 'exit status %d' % status}
+        with open(result_path) as result:
+            return json.load(result)
+    finally:
+        os.unlink(result_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default=','.join(map(str, SCALES)),
+                        help="comma separated device counts (default: %(default)s)")
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS),
+                        help="comma separated benchmarks (default: %(default)s)")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="seconds added to each request (default: %(default)s)")
+    parser.add_argument('--timeout', type=int, default=600,
+                        help="seconds allowed per benchmark (default: %(default)s)")
+    parser.add_argument('--output', default=None,
+                        help="file to write the JSON results to (default: stdout)")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    parser.add_argument('--scale', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'latency_s': args.latency,
+        'results': list(),
+    }
+    for scale in [int(scale) for scale in args.scales.split(',')]:
+        netbox = FakeNetbox(devices=scale, latency=args.latency)
+        url = netbox.start()
+        try:
+            for name in args.benchmarks.split(','):
+                sys.stderr.write("%s at %d devices...\n" % (name, scale))
+                result = run_child(name, url, scale, args.timeout)
+                result.update({'benchmark': name, 'scale': scale})
+                report['results'].append(result)
+        finally:
+            netbox.stop()
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as results:
+            results.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+import errno
+import json
+import select
+import socket
+import ssl
+import time
+import urlparse
+import zlib
+
+from http_pool import TIMEOUT
+from netbox_api import NetboxAPI
+
+CHUNK_SIZE = 64 * 1024
+
+
+class AsyncRequest(object):
+    """A single GET request made over a non-blocking socket.
+
+    The request is driven by `AsyncNetboxAPI.poll`, which calls
+    `handle_write` and `handle_read` whenever the socket is ready, so many
+    requests can be in flight on one thread.
+
+    Arguments:
+        url (str): The URL for the request.
+        callback: Called with the parsed JSON response, or with an error
+            string in the same format as `NetboxAPI.api_call`.
+    """
+
+    def __init__(self, url, callback):
+        self.url = url
+        self.callback = callback
+        self.done = False
+        self.last_activity = time.time()
+
+        parts = urlparse.urlsplit(url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.https else 80)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        # HTTP/1.0 with `Connection: close` means the body is simply
+        # everything up to the end of the stream.
+        self._outgoing = (
+            "GET %s HTTP/1.0\r\n"
+            "Host: %s\r\n"
+            "Accept: application/json\r\n"
+            "Accept-Encoding: gzip\r\n"
+            "Connection: close\r\n\r\n" % (path, parts.netloc))
+        self._incoming = list()
+        self._status = None
+        self._decoder = None
+        self._handshaking = self.https
+        self._want_write = True
+
+        try:
+            address = socket.getaddrinfo(self.host, self.port, 0,
+                                         socket.SOCK_STREAM)[0]
+            self.sock = socket.socket(address[0], address[1], address[2])
+            self.sock.setblocking(0)
+            result = self.sock.connect_ex(address[4])
+            if result not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                raise socket.error(result, errno.errorcode.get(result, ''))
+        except socket.error as err:
+            self.sock = None
+            self.finish("URL Error: " + str(err))
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def wants_write(self):
+        """True if the request is waiting for the socket to be writable."""
+        return not self.done and self._want_write
+
+    def wants_read(self):
+        """True if the request is waiting for the socket to be readable."""
+        return not self.done and not self._want_write
+
+    def finish(self, response):
+        """Close the socket and pass the response to the callback.
+
+        Arguments:
+            response: The parsed JSON response or an error string.
+        """
+        if self.done:
+            return
+        self.done = True
+        if self.sock is not None:
+            self.sock.close()
+        self.callback(response)
+
+    def _handshake(self):
+        """Take the next step of the TLS handshake, if there is one."""
+        if not isinstance(self.sock, ssl.SSLSocket):
+            context = ssl.create_default_context()
+            self.sock = context.wrap_socket(
+                self.sock, server_hostname=self.host,
+                do_handshake_on_connect=False)
+        try:
+            self.sock.do_handshake()
+        except ssl.SSLWantReadError:
+            self._want_write = False
+            return
+        except ssl.SSLWantWriteError:
+            self._want_write = True
+            return
+        self._handshaking = False
+        self._want_write = True
+
+    def handle_write(self):
+        """Connect, then send the request, as the socket allows."""
+        try:
+            error = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if error:
+                raise socket.error(error, errno.errorcode.get(error, ''))
+            if self._handshaking:
+                self._handshake()
+                return
+            sent = self.sock.send(self._outgoing)
+            self._outgoing = self._outgoing[sent:]
+            if not self._outgoing:
+                self._want_write = False
+        except (socket.error, ssl.SSLError) as err:
+            self.finish("URL Error: " + str(err))
+
+    def handle_read(self):
+        """Read whatever has arrived, decompressing the body as it goes."""
+        if self._handshaking:
+            self.handle_write()
+            return
+        while not self.done:
+            try:
+                data = self.sock.recv(CHUNK_SIZE)
+            except ssl.SSLWantReadError:
+                return
+            except (socket.error, ssl.SSLError) as err:
+                if err.args and err.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                self.finish("URL Error: " + str(err))
+                return
+            if not data:
+                self._complete()
+                return
+            # A malformed response fails the request, like a socket error,
+            # rather than escaping `poll` and stopping the menu.
+            try:
+                self._receive(data)
+            except (IndexError, ValueError, zlib.error) as err:
+                self.finish("URL Error: malformed response: " + str(err))
+                return
+
+    def _receive(self, data):
+        """Handle a chunk of the response."""
+        if self._status is None:
+            self._incoming.append(data)
+            head = ''.join(self._incoming)
+            if '\r\n\r\n' not in head:
+                return
+            head, data = head.split('\r\n\r\n', 1)
+            lines = head.split('\r\n')
+            self._status = int(lines[0].split()[1])
+            headers = dict(line.lower().split(':', 1) for line in lines[1:]
+                           if ':' in line)
+            if headers.get('content-encoding', '').strip() == 'gzip':
+                self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            self._incoming = list()
+
+        if self._decoder is not None:
+            data = self._decoder.decompress(data)
+        self._incoming.append(data)
+
+    def _complete(self):
+        """Parse the response once the server has closed the connection."""
+        if self._status is None:
+            self.finish("URL Error: incomplete response")
+            return
+        if self._status != 200:
+            self.finish("HTTP Error: " + str(self._status))
+            return
+        try:
+            if self._decoder is not None:
+                self._incoming.append(self._decoder.flush())
+            response = json.loads(''.join(self._incoming))
+        except (ValueError, zlib.error) as err:
+            response = "URL Error: " + str(err)
+        self.finish(response)
+
+
+class AsyncNetboxAPI(object):
+    """Get data from Netbox without blocking.
+
+    Requests are made over non-blocking sockets and are driven by `poll`, so
+    the menu can be shown straight away and filled in as each page of sites
+    and devices arrives, without using threads. The results are in the same
+    format as `NetboxAPI`, since its `format_devices` and `format_sites`
+    methods are used to clean them.
+
+    Arguments:
+        api (:obj:`NetboxAPI`, optional): The API used to build the request
+            URLs and format the results. Default is a new `NetboxAPI` that
+            doesn't use the shared inventory daemon.
+        timeout (int, optional): The number of seconds a request can go
+            without making progress before it fails. Default is 30.
+
+    Notes:
+        Only the host name lookup blocks, which is normally answered from the
+        resolver's cache. Results are not read from or written to the on-disk
+        cache.
+    """
+
+    def __init__(self, api=None, timeout=TIMEOUT):
+        if api is None:
+            api = NetboxAPI(socket_path=None)
+        self.api = api
+        self.timeout = timeout
+        self.requests = list()
+
+    @property
+    def pending(self):
+        """True if any requests are still in flight."""
+        return bool(self.requests)
+
+    def fetch(self, req, callback):
+        """Start a GET request.
+
+        Arguments:
+            req (str): The URL for the API request.
+            callback: Called with the JSON response, or an error string.
+
+        Returns:
+            AsyncRequest
+        """
+        request = AsyncRequest(req, callback)
+        if not request.done:
+            self.requests.append(request)
+        return request
+
+    def fetch_pages(self, req, callback, done=None):
+        """GET every page of a paginated Netbox response.
+
+        Arguments:
+            req (str): The URL for the first page of the API request.
+            callback: Called with the list of `results` from each page, in
+                order, as it arrives.
+            done (optional): Called with None once the last page has arrived,
+                or with an error string if a request failed.
+        """
+        def handle_page(response):
+            if not isinstance(response, dict):
+                if done is not None:
+                    done(response)
+                return
+            callback(response['results'])
+            if response['next']:
+                self.fetch(response['next'], handle_page)
+            elif done is not None:
+                done(None)
+
+        self.fetch(req, handle_page)
+
+    def get_devices(self, callback, site_slug=None, q=None, done=None):
+        """GET devices from Netbox.
+
+        Arguments:
+            callback: Called with the formatted devices from each page.
+            site_slug (str, optional): Only GET devices for this site.
+            q (str, optional): A string to filter returned devices.
+            done (optional): Called once every page has arrived, as in
+                `fetch_pages`.
+        """
+        self.fetch_pages(
+            self.api.devices_url(site_slug, q),
+            lambda page: callback(self.api.format_devices(page)), done)
+
+    def get_sites(self, callback, done=None):
+        """GET sites from Netbox.
+
+        Arguments:
+            callback: Called with the formatted sites from each page.
+            done (optional): Called once every page has arrived, as in
+                `fetch_pages`.
+        """
+        self.fetch_pages(
+            self.api.sites_url(),
+            lambda page: callback(self.api.format_sites(page)), done)
+
+    def search(self, q, callback, done=None):
+        """Search Netbox for devices with hostnames matching `q`.
+
+        Arguments:
+            q (str): A full or partial hostname.
+            callback: Called with the formatted devices from each page.
+            done (optional): Called once every page has arrived, as in
+                `fetch_pages`.
+        """
+        self.get_devices(callback, q=q, done=done)
+
+    def poll(self, timeout=0):
+        """Make progress on the requests in flight.
+
+        Requests that make no progress for `timeout` seconds fail with a
+        `URL Error`.
+
+        Arguments:
+            timeout (float, optional): The number of seconds to wait for a
+                socket to become ready. Default is 0, which doesn't wait.
+                None waits until one is ready.
+
+        Returns:
+            bool: True if any request finished, False otherwise.
+        """
+        if not self.requests:
+            return False
+
+        readers = [request for request in self.requests
+                   if request.wants_read()]
+        writers = [request for request in self.requests
+                   if request.wants_write()]
+        readable, writable, _ = select.select(readers, writers, [], timeout)
+        now = time.time()
+        for request in writable:
+            request.last_activity = now
+            request.handle_write()
+        for request in readable:
+            request.last_activity = now
+            request.handle_read()
+        for request in list(self.requests):
+            if now - request.last_activity > self.timeout:
+                request.finish("URL Error: timed out")
+
+        finished = [request for request in self.requests if request.done]
+        self.requests = [request for request in self.requests
+                         if not request.done]
+        return bool(finished)
+
+    def run(self):
+        """Run until every request, including any pages they lead to, is done."""
+        while self.requests:
+            self.poll(self.timeout)
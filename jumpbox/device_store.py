@@ -0,0 +1,172 @@
+from collections import OrderedDict
+
+
+class DeviceRecord(object):
+    """The fields of a single device that are used by the menu.
+
+    Records use `__slots__`, so they take a fraction of the memory of the JSON
+    data returned by Netbox.
+
+    Arguments:
+        device_id (int): The Netbox ID of the device.
+        name (str): The formatted hostname (`display_name`) of the device.
+        address (str): The formatted primary IP address of the device.
+        site_slug (str, optional): The slug of the site the device belongs to.
+    """
+
+    __slots__ = ('id', 'name', 'address', 'site_slug')
+
+    def __init__(self, device_id, name, address, site_slug=None):
+        self.id = device_id
+        self.name = name
+        self.address = address
+        self.site_slug = site_slug
+
+    def __repr__(self):
+        return "%s: %s" % (self.name, self.address)
+
+    @classmethod
+    def from_device(cls, device):
+        """Create a record from the JSON data for a device.
+
+        Arguments:
+            device: The formatted device data, as returned by
+                `NetboxAPI.get_devices`.
+
+        Returns:
+            DeviceRecord
+        """
+        site = device.get('site') or dict()
+        return cls(device.get('id'), device['display_name'],
+                   device['primary_ip']['address'], site.get('slug'))
+
+    def to_device(self):
+        """Return the record in the format returned by `NetboxAPI.get_devices`.
+
+        Only the fields kept in the record are included.
+
+        Returns:
+            dict
+        """
+        return {
+            'id': self.id,
+            'display_name': self.name,
+            'primary_ip': {'address': self.address},
+            'site': {'slug': self.site_slug},
+        }
+
+
+class DeviceStore(object):
+    """A compact store holding one record per device.
+
+    Every menu that lists a device refers to the same `DeviceRecord`, so the
+    full JSON data for the inventory doesn't need to be kept once the store
+    has been built.
+
+    Arguments:
+        devices (optional): The formatted device data returned by
+            `NetboxAPI.get_devices`, to be added to the store.
+
+    Attributes:
+        update_handlers (list): Callables run with a `DeviceRecord` whenever
+            the hostname or address of a record already in the store changes,
+            such as a search index that needs to re-index it.
+    """
+
+    def __init__(self, devices=None):
+        self.records = list()
+        self.update_handlers = list()
+        self._by_id = dict()
+        self._by_site = OrderedDict()
+        self._strings = dict()
+
+        if devices:
+            for item in devices:
+                self.add(item)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _intern(self, value):
+        """Return a shared copy of a string that is repeated between devices.
+
+        Arguments:
+            value (str): The string to be shared.
+        """
+        if value is None:
+            return None
+        return self._strings.setdefault(value, value)
+
+    def add(self, device):
+        """Add a device to the store.
+
+        If the store already has a record for the device, that record is
+        updated instead of a second one being added.
+
+        Arguments:
+            device: The formatted device data for a single device.
+
+        Returns:
+            DeviceRecord: The record for the device.
+        """
+        record = DeviceRecord.from_device(device)
+        record.site_slug = self._intern(record.site_slug)
+
+        existing = self._by_id.get(record.id)
+        if existing is None:
+            if record.id is not None:
+                self._by_id[record.id] = record
+            self.records.append(record)
+            self._by_site.setdefault(record.site_slug, list()).append(record)
+            return record
+
+        changed = (existing.name != record.name or
+                   existing.address != record.address)
+        existing.name = record.name
+        existing.address = record.address
+        if changed:
+            for handler in self.update_handlers:
+                handler(existing)
+        if existing.site_slug != record.site_slug:
+            self._by_site[existing.site_slug].remove(existing)
+            if not self._by_site[existing.site_slug]:
+                del self._by_site[existing.site_slug]
+            existing.site_slug = record.site_slug
+            self._by_site.setdefault(record.site_slug, list()).append(existing)
+        return existing
+
+    def get(self, device_id):
+        """Return the record for a device.
+
+        Arguments:
+            device_id (int): The Netbox ID of the device.
+
+        Returns:
+            DeviceRecord or None
+        """
+        return self._by_id.get(device_id)
+
+    def has_site(self, site_slug):
+        """Check whether any devices belong to a site.
+
+        Arguments:
+            site_slug (str): The slug of the site.
+
+        Returns:
+            bool
+        """
+        return site_slug in self._by_site
+
+    def by_site(self, site_slug):
+        """Return the records for the devices that belong to a site.
+
+        Arguments:
+            site_slug (str): The slug of the site.
+
+        Returns:
+            list: The records, in the order they were added.
+        """
+        return self._by_site.get(site_slug, list())
@@ -1,8 +1,13 @@
 import curses
-import subprocess
+import sys
+import time
 
+from fan_out import describe
+from fan_out import fan_out
+from fan_out import summarize
 from jumpbox import MenuItem
 from jumpbox import clear_terminal
+from ssh_launcher import launcher
 
 
 class ExternalItem(MenuItem):
@@ -48,7 +53,8 @@ class QuickConnect(ExternalItem):
 
     Arguments:
         text (str): The text to be displayed as the menu option.
-        args:
+        args (list, optional): Extra `ssh` options for sessions started
+            from this option.
         menu: The menu the option belongs to.
         should_exit (bool, optional): True if the menu should exit,
             False otherwise.
@@ -65,22 +71,114 @@ class QuickConnect(ExternalItem):
             self.args = list()
 
         self.exit_status = None
+        self.connect_latency = None
 
     def action(self):
         """Action to be performed when the option is selected.
 
-        Estbalish an SSH session to specified IP address or hostname.
+        Estbalish an SSH session to specified IP address or hostname, sharing
+        a master connection if SSH multiplexing is enabled. A port can be
+        given after the hostname or IPv4 address, such as `router1:2222`.
+        """
+        hostname, port = split_port(raw_input("Hostname/IP Address: ").strip())
+        username = raw_input("Username: ").strip()
+        session = launcher.connect(hostname, username, port=port,
+                                   options=self.args)
+        self.exit_status = session['exit_status']
+        self.connect_latency = session['connect_latency']
+
+
+class FanOutItem(ExternalItem):
+    """A menu item to run a command on every marked device in its menu.
+
+    Devices are marked with space or tab, or all at once with Ctrl-A, and the
+    item is run with Ctrl-R once it is set as the menu's `marked_action`. The
+    command runs on the devices in parallel, with a progress line while it
+    runs. The path of each device's output is listed at the end, followed by
+    a summary.
+
+    Notes:
+        No pager or editor is started to show the output, since the menu may
+        be the login shell of a restricted account and most of them can start
+        a shell.
+
+    Arguments:
+        text (str, optional): The text to be displayed as the menu option.
+        menu: The menu the option belongs to.
+        should_exit (bool, optional): True if the menu should exit,
+            False otherwise.
+        runner (:obj:`FanOut`, optional): Runs the command. Default is the
+            shared `fan_out`.
+    """
 
-        Raises:
-            AttributeError: Call `commandline` via subprocess.
+    def __init__(self, text="Run a command on marked devices", menu=None,
+                 should_exit=False, runner=None):
+        super(FanOutItem, self).__init__(
+            text=text, menu=menu, should_exit=should_exit)
+
+        self.runner = runner or fan_out
+        self.results = None
+
+    def action(self):
+        """Action to be performed when the option is selected.
+
+        Ask for a username and command, run it on the marked devices, then
+        list where the output of each device was written.
         """
-        hostname = raw_input("Hostname/IP Address: ")
-        username = raw_input("Username: ")
-        ssh = "ssh"
-        commandline = "{0} {1} {2} {3}".format(ssh, "-l", "".join(username),
-                                               "".join(hostname))
-        try:
-            completed_process = subprocess.run(commandline, shell=True)
-            self.exit_status = completed_process.returncode
-        except AttributeError:
-            self.exit_status = subprocess.call(commandline, shell=True)
+        devices = [{'name': item.text, 'host': item.text_id,
+                    'port': item.port, 'options': item.ssh_options}
+                   for item in self.menu.marked_items]
+        if not devices:
+            raw_input("No devices are marked. Mark them with space, or every "
+                      "device with Ctrl-A.\nPress enter to continue...")
+            return
+
+        print("Running on %d devices. Leave the command empty to cancel."
+              % len(devices))
+        username = raw_input("Username: ").strip() or None
+        command = raw_input("Command: ").strip()
+        if not command:
+            return
+
+        started = time.time()
+
+        def progress(results):
+            ok = sum(1 for result in results if result['exit_status'] == 0 and
+                     not result['timed_out'])
+            sys.stdout.write("\r[%d/%d] %d ok, %d failed  %.1fs " % (
+                len(results), len(devices), ok, len(results) - ok,
+                time.time() - started))
+            sys.stdout.flush()
+
+        self.results, path = self.runner.run(devices, username, command,
+                                             progress=progress)
+        elapsed = time.time() - started
+        print("\n")
+        # The summary is printed last, so it is still on the screen however
+        # many devices there are.
+        for result in self.results:
+            print("%s (%s): %s\n  %s" % (result['name'], result['host'],
+                                         describe(result), result['output']))
+        print("")
+        for line in summarize(self.results, elapsed):
+            print(line)
+        print("All output: %s" % path)
+        raw_input("Press enter to continue...")
+
+
+def split_port(address):
+    """Split an optional port from the end of a hostname or address.
+
+    Arguments:
+        address (str): A hostname or IP address, optionally followed by a
+            colon and port, such as `router1:2222`. IPv6 addresses, which
+            contain several colons, are never split.
+
+    Returns:
+        tuple: The hostname or address and the port, which is None if there
+        isn't one.
+    """
+    host, colon, port = address.rpartition(':')
+    if colon and ':' not in host and port.isdigit():
+        return host, int(port)
+    return address, None
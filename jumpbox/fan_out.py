@@ -0,0 +1,301 @@
+import os
+import re
+import subprocess
+import threading
+import time
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
+
+from ssh_launcher import launcher
+from timing import timings
+
+BATCH_OPTIONS = ['-T', '-o', 'BatchMode=yes', '-o', 'ConnectTimeout=10']
+COMMAND_TIMEOUT = 300
+MAX_WORKERS = 16
+OUTPUT_DIR = os.path.expanduser('~/.cache/jumpbox/runs')
+PROGRESS_INTERVAL = 0.5
+
+
+class FanOut(object):
+    """Run the same command on many devices at once.
+
+    Each device gets its own non-interactive `ssh` process, started from the
+    same arguments as an interactive session, and no more than `max_workers`
+    run at once. The output of each device is written to its own file as it
+    arrives, and all of it is gathered into a single file at the end.
+
+    Arguments:
+        launcher (:obj:`SSHLauncher`, optional): Builds the `ssh` arguments
+            for each device. Default is the shared launcher.
+        max_workers (int, optional): The number of devices the command runs
+            on at once. Default is 16.
+        timeout (int, optional): The number of seconds the command has on
+            each device before it is stopped. Default is 300.
+        output_dir (str, optional): The directory a new directory of output
+            files is created in for each run. Default is
+            `~/.cache/jumpbox/runs`.
+
+    Notes:
+        `ssh` is run with `BatchMode=yes`, since there is no way to answer a
+        password prompt for many devices at once. Devices must accept a key
+        from the user's agent, or have a shared master connection open if SSH
+        multiplexing is enabled. A run never starts a master connection of
+        its own, which would otherwise be left open for every device.
+    """
+
+    def __init__(self, launcher=launcher, max_workers=MAX_WORKERS,
+                 timeout=COMMAND_TIMEOUT, output_dir=OUTPUT_DIR):
+        self.launcher = launcher
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.output_dir = output_dir
+
+        self._cancelled = threading.Event()
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environ(cls, environ=None):
+        """Configure fan-out from the environment.
+
+        `JUMPBOX_FANOUT_WORKERS` sets the number of devices the command runs
+        on at once, and `JUMPBOX_FANOUT_TIMEOUT` the number of seconds it has
+        on each device.
+
+        Arguments:
+            environ (dict, optional): The environment. Default is
+                `os.environ`.
+
+        Returns:
+            FanOut
+        """
+        if environ is None:
+            environ = os.environ
+        try:
+            max_workers = int(environ.get('JUMPBOX_FANOUT_WORKERS',
+                                          MAX_WORKERS))
+        except ValueError:
+            max_workers = MAX_WORKERS
+        try:
+            timeout = int(environ.get('JUMPBOX_FANOUT_TIMEOUT',
+                                      COMMAND_TIMEOUT))
+        except ValueError:
+            timeout = COMMAND_TIMEOUT
+        return cls(max_workers=max(max_workers, 1), timeout=timeout)
+
+    def _run_dir(self):
+        """Create a private directory for the output of a run.
+
+        Returns:
+            str: The path of the directory.
+        """
+        path = os.path.join(self.output_dir, time.strftime('%Y%m%dT%H%M%S') +
+                            '-%d' % os.getpid())
+        os.makedirs(path, 0o700)
+        return path
+
+    def _run_one(self, args):
+        """Run the command on a single device.
+
+        Arguments:
+            args (tuple): The device, as given to `run`, the username, the
+                command and the path of the device's output file.
+
+        Returns:
+            dict: The device's `name` and `host`, the `exit_status` of `ssh`,
+            the `duration` of the command, the path of its `output` and
+            whether it `timed_out`. An `error` is included if `ssh` couldn't
+            be started, and the exit status is None if the run was cancelled
+            first.
+        """
+        device, username, command, path = args
+        result = {'name': device['name'], 'host': device['host'],
+                  'output': path, 'exit_status': None, 'timed_out': False,
+                  'duration': 0.0}
+        if self._cancelled.is_set():
+            return result
+
+        argv = self.launcher.argv(
+            device['host'], username, device.get('port'),
+            list(device.get('options') or []) + BATCH_OPTIONS,
+            master=False) + [command]
+        start = timings.clock()
+        started = time.time()
+        with open(path, 'wb') as output, open(os.devnull, 'rb') as devnull:
+            try:
+                process = subprocess.Popen(argv, stdin=devnull, stdout=output,
+                                           stderr=subprocess.STDOUT)
+            except OSError as err:
+                result['error'] = str(err)
+                return result
+            with self._lock:
+                self._processes.add(process)
+
+            def stop():
+                result['timed_out'] = True
+                _kill(process)
+            timer = threading.Timer(self.timeout, stop)
+            timer.daemon = True
+            timer.start()
+            try:
+                result['exit_status'] = process.wait()
+            finally:
+                timer.cancel()
+                with self._lock:
+                    self._processes.discard(process)
+
+        result['duration'] = time.time() - started
+        timings.record('fanout.device', start, host=result['host'],
+                       exit_status=result['exit_status'],
+                       timed_out=result['timed_out'])
+        return result
+
+    def cancel(self):
+        """Stop every command that is running and skip those still queued."""
+        self._cancelled.set()
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            _kill(process)
+
+    def run(self, devices, username, command, progress=None):
+        """Run a command on every device.
+
+        Arguments:
+            devices (list): A dict for each device, with its `name`, `host`,
+                and optionally its SSH `port` and extra `ssh` `options`.
+            username (str): The username to log in with, or None for the
+                `ssh` default.
+            command (str): The command to run on each device.
+            progress (optional): Called with the results so far each time a
+                device finishes, and every `PROGRESS_INTERVAL` seconds.
+
+        Returns:
+            tuple: The results, in the same order as `devices`, as returned
+            by `_run_one`, and the path of the file all of the output was
+            gathered into.
+        """
+        run_dir = self._run_dir()
+        names = set(['all'])
+        jobs = list()
+        for device in devices:
+            name = re.sub(r'[^\w.-]', '_', device['name'] or device['host'])
+            unique, count = name, 1
+            while unique in names:
+                count += 1
+                unique = '%s-%d' % (name, count)
+            names.add(unique)
+            jobs.append((device, username, command,
+                         os.path.join(run_dir, unique + '.txt')))
+
+        self._cancelled.clear()
+        results = dict()
+        pool = ThreadPool(max(min(self.max_workers, len(jobs)), 1))
+        with timings.span('fanout.run', devices=len(jobs)):
+            try:
+                iterator = pool.imap_unordered(self._run_one, jobs)
+                while True:
+                    try:
+                        # Waiting with a timeout keeps Ctrl-C working.
+                        result = iterator.next(PROGRESS_INTERVAL)
+                    except TimeoutError:
+                        pass
+                    except KeyboardInterrupt:
+                        self.cancel()
+                        continue
+                    except StopIteration:
+                        break
+                    else:
+                        results[result['output']] = result
+                    if progress is not None:
+                        progress(results.values())
+            finally:
+                pool.close()
+                pool.join()
+
+        ordered = [results[job[3]] for job in jobs]
+        return ordered, self._gather(run_dir, ordered, command)
+
+    def _gather(self, run_dir, results, command):
+        """Write a summary and the output of every device into one file.
+
+        Returns:
+            str: The path of the file.
+        """
+        path = os.path.join(run_dir, 'all.txt')
+        with open(path, 'wb') as gathered:
+            gathered.write("$ %s\n\n" % command)
+            for line in summarize(results):
+                gathered.write(line + '\n')
+            for result in results:
+                gathered.write("\n==> %s (%s): %s <==\n" % (
+                    result['name'], result['host'], describe(result)))
+                if not os.path.exists(result['output']):
+                    continue
+                with open(result['output'], 'rb') as output:
+                    for chunk in iter(lambda: output.read(65536), ''):
+                        gathered.write(chunk)
+        return path
+
+
+def _kill(process):
+    """Kill a process, if it is still running."""
+    try:
+        process.kill()
+    except OSError:
+        pass
+
+
+def describe(result):
+    """Describe how a command finished on a device.
+
+    Arguments:
+        result (dict): The device's result, as returned by `FanOut.run`.
+
+    Returns:
+        str: Such as `ok in 1.2s` or `exit status 255 in 10.0s`.
+    """
+    if result.get('error'):
+        return "failed: %s" % result['error']
+    if result['exit_status'] is None:
+        return "cancelled"
+    if result['timed_out']:
+        status = "timed out"
+    elif result['exit_status'] == 0:
+        status = "ok"
+    else:
+        status = "exit status %d" % result['exit_status']
+    return "%s in %.1fs" % (status, result['duration'])
+
+
+def summarize(results, elapsed=None):
+    """Summarize a run for the user.
+
+    Arguments:
+        results (list): The results returned by `FanOut.run`.
+        elapsed (float, optional): The number of seconds the run took.
+
+    Returns:
+        list: The lines of the summary: the counts of each outcome, then a
+        line for each device that didn't succeed and the slowest device.
+    """
+    ok = [result for result in results if result['exit_status'] == 0 and
+          not result['timed_out']]
+    failed = [result for result in results if result not in ok]
+    line = "%d devices: %d ok, %d failed" % (len(results), len(ok),
+                                             len(failed))
+    if elapsed is not None:
+        line += " in %.1fs" % elapsed
+    lines = [line]
+    for result in failed:
+        lines.append("  %s (%s): %s" % (result['name'], result['host'],
+                                        describe(result)))
+    finished = [result for result in results if result['duration']]
+    if finished:
+        slowest = max(finished, key=lambda result: result['duration'])
+        lines.append("Slowest: %s in %.1fs" % (slowest['name'],
+                                               slowest['duration']))
+    return lines
+
+
+fan_out = FanOut.from_environ()
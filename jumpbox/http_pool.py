@@ -0,0 +1,224 @@
+import httplib
+import socket
+import threading
+import urlparse
+import zlib
+
+CHUNK_SIZE = 64 * 1024
+MAX_REDIRECTS = 5
+TIMEOUT = 30
+
+
+class PooledResponse(object):
+    """A response from a pooled connection.
+
+    The body is decompressed as it is read. Once the body has been read to the
+    end, the connection is handed back to the pool to be reused.
+
+    Arguments:
+        pool: The `HTTPConnectionPool` the connection belongs to.
+        key (tuple): The scheme, host and port the connection is for.
+        conn: The connection the response was received on.
+        response: The `httplib.HTTPResponse` being wrapped.
+    """
+
+    def __init__(self, pool, key, conn, response):
+        self.pool = pool
+        self.key = key
+        self.conn = conn
+        self.response = response
+        self.status = response.status
+        self.reason = response.reason
+
+        encoding = response.getheader('content-encoding', '').lower()
+        if encoding == 'gzip':
+            self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            self._decoder = zlib.decompressobj()
+        else:
+            self._decoder = None
+
+        self.bytes_read = 0
+
+    def getheader(self, name, default=None):
+        """Return the value of a response header.
+
+        Arguments:
+            name (str): The name of the header.
+            default (optional): The value returned if the header is missing.
+        """
+        return self.response.getheader(name, default)
+
+    def iter_content(self, chunk_size=CHUNK_SIZE):
+        """Read the body of the response, one chunk at a time.
+
+        Arguments:
+            chunk_size (int, optional): The number of bytes read from the
+                socket at a time. Default is 64KiB.
+
+        Yields:
+            str: The decompressed body, as it arrives.
+        """
+        try:
+            while True:
+                chunk = self.response.read(chunk_size)
+                if not chunk:
+                    break
+                self.bytes_read += len(chunk)
+                if self._decoder is not None:
+                    chunk = self._decoder.decompress(chunk)
+                if chunk:
+                    yield chunk
+            if self._decoder is not None:
+                chunk = self._decoder.flush()
+                if chunk:
+                    yield chunk
+        except Exception:
+            self.close()
+            raise
+        self.release()
+
+    def read(self):
+        """Read the entire body of the response.
+
+        Returns:
+            str: The decompressed body.
+        """
+        return ''.join(self.iter_content())
+
+    def release(self):
+        """Return the connection to the pool for reuse."""
+        if self.conn is not None:
+            if self.response.will_close:
+                self.conn.close()
+            else:
+                self.pool.put_conn(self.key, self.conn)
+            self.conn = None
+
+    def close(self):
+        """Close the connection without returning it to the pool."""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class HTTPConnectionPool(object):
+    """A pool of persistent HTTP and HTTPS connections.
+
+    Connections are kept open between requests and reused, so repeated calls
+    to the same server skip the TCP (and TLS) handshake. Every request asks
+    for a gzip compressed response.
+
+    Arguments:
+        maxsize (int, optional): The number of idle connections kept for each
+            server. Default is 4.
+        timeout (int, optional): The socket timeout, in seconds. Default is
+            30.
+    """
+
+    def __init__(self, maxsize=4, timeout=TIMEOUT):
+        self.maxsize = maxsize
+        self.timeout = timeout
+
+        self._idle = dict()
+        self._lock = threading.Lock()
+
+    def get_conn(self, key, fresh=False):
+        """Get an idle connection for `key`, or open a new one.
+
+        Arguments:
+            key (tuple): The scheme, host and port of the server.
+            fresh (bool, optional): True to always open a new connection.
+                Default is False.
+
+        Returns:
+            tuple: The connection and True if it was reused, False otherwise.
+        """
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle and not fresh:
+                return idle.pop(), True
+
+        scheme, host, port = key
+        if scheme == 'https':
+            conn = httplib.HTTPSConnection(host, port, timeout=self.timeout)
+        else:
+            conn = httplib.HTTPConnection(host, port, timeout=self.timeout)
+        return conn, False
+
+    def put_conn(self, key, conn):
+        """Return a connection to the pool.
+
+        Arguments:
+            key (tuple): The scheme, host and port of the server.
+            conn: The connection to be returned.
+        """
+        with self._lock:
+            idle = self._idle.setdefault(key, list())
+            if len(idle) < self.maxsize:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        """Close every idle connection in the pool."""
+        with self._lock:
+            idle, self._idle = self._idle, dict()
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def _request(self, url, headers):
+        """Send a single GET request, without following redirects."""
+        parts = urlparse.urlsplit(url)
+        default_port = 443 if parts.scheme == 'https' else 80
+        key = (parts.scheme, parts.hostname, parts.port or default_port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        request_headers = {
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+        }
+        if headers:
+            request_headers.update(headers)
+
+        # The server may have closed an idle keep-alive connection, so a
+        # failed request on a reused connection is retried once on a fresh
+        # connection.
+        for fresh in (False, True):
+            conn, reused = self.get_conn(key, fresh=fresh)
+            try:
+                conn.request('GET', path, headers=request_headers)
+                response = conn.getresponse()
+            except (httplib.HTTPException, socket.error):
+                conn.close()
+                if not reused:
+                    raise
+                continue
+            return PooledResponse(self, key, conn, response)
+
+    def get(self, url, headers=None):
+        """Send a GET request, following any redirects.
+
+        Arguments:
+            url (str): The URL for the request.
+            headers (dict, optional): Any additional request headers.
+
+        Returns:
+            PooledResponse: The response to the request.
+
+        Raises:
+            httplib.HTTPException: The server returned an invalid response.
+            socket.error: The connection to the server failed.
+        """
+        for redirect in range(MAX_REDIRECTS + 1):
+            response = self._request(url, headers)
+            location = response.getheader('location')
+            if response.status not in (301, 302, 303, 307, 308) or not location:
+                return response
+            response.read()
+            url = urlparse.urljoin(url, location)
+        return response
@@ -0,0 +1,191 @@
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+CACHE_DIR = os.path.expanduser('~/.cache/jumpbox')
+CACHE_TTL = 300
+
+
+class InventoryCache(object):
+    """An on-disk cache of Netbox API responses.
+
+    The cache is shared by every Jumpbox session on the host, so concurrent
+    logins are served from the same files instead of each querying Netbox.
+    Entries older than `ttl` are still returned right away, while a single
+    background thread refreshes them (stale-while-revalidate).
+
+    Arguments:
+        cache_dir (str, optional): The directory the cache files are kept in.
+            Default is `~/.cache/jumpbox`.
+        ttl (int, optional): The number of seconds an entry is considered
+            fresh. Default is 300.
+
+    Notes:
+        Files are written to a temporary file and renamed into place, so a
+        reader never sees a partially written entry. Only JSON objects are
+        cached; the error strings returned by `NetboxAPI.api_call` are not.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def _path(self, key):
+        """Return the file path used to store `key`.
+
+        Arguments:
+            key (str): The cache key, usually the URL of the API request.
+
+        Returns:
+            str: The path of the cache file.
+        """
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest + '.json')
+
+    def _make_dir(self):
+        """Create the cache directory, if it doesn't already exist."""
+        try:
+            os.makedirs(self.cache_dir, 0o700)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+
+    def read(self, key):
+        """Read an entry from the cache.
+
+        Arguments:
+            key (str): The cache key.
+
+        Returns:
+            tuple: The cached data and its age in seconds, or `(None, None)`
+            if there is no usable entry.
+        """
+        path = self._path(key)
+        try:
+            age = time.time() - os.stat(path).st_mtime
+            with open(path) as cache_file:
+                return json.load(cache_file), age
+        except (IOError, OSError, ValueError):
+            return None, None
+
+    def write(self, key, data):
+        """Atomically write an entry to the cache.
+
+        Arguments:
+            key (str): The cache key.
+            data: The JSON serializable data to be stored.
+        """
+        self._make_dir()
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                json.dump(data, tmp_file)
+            os.rename(tmp_path, self._path(key))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def _lock(self, key, blocking=True):
+        """Take the per-entry lock that serializes refreshes between sessions.
+
+        Arguments:
+            key (str): The cache key.
+            blocking (bool, optional): True to wait for the lock, False to
+                give up if another session holds it. Default is True.
+
+        Returns:
+            The open lock file, or None if the lock could not be taken.
+        """
+        self._make_dir()
+        lock_file = open(self._path(key) + '.lock', 'a')
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(lock_file, flags)
+        except IOError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _fetch_and_store(self, key, fetch):
+        """Call `fetch` and store the result, if it can be cached.
+
+        Arguments:
+            key (str): The cache key.
+            fetch: A callable that returns fresh data for `key`.
+
+        Returns:
+            The data returned by `fetch`.
+        """
+        data = fetch()
+        if isinstance(data, dict):
+            try:
+                self.write(key, data)
+            except (IOError, OSError):
+                pass
+        return data
+
+    def _refresh(self, key, fetch):
+        """Refresh an entry, unless another session is already doing so."""
+        try:
+            lock_file = self._lock(key, blocking=False)
+        except (IOError, OSError):
+            return
+        if lock_file is None:
+            return
+        try:
+            self._fetch_and_store(key, fetch)
+        finally:
+            lock_file.close()
+
+    def refresh_async(self, key, fetch):
+        """Refresh an entry in a background thread.
+
+        Arguments:
+            key (str): The cache key.
+            fetch: A callable that returns fresh data for `key`.
+
+        Returns:
+            threading.Thread: The thread performing the refresh.
+        """
+        thread = threading.Thread(target=self._refresh, args=(key, fetch))
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def get(self, key, fetch):
+        """Get an entry from the cache, fetching it if necessary.
+
+        A fresh entry is returned as-is. A stale entry is returned as-is and
+        refreshed in the background. A missing entry is fetched while holding
+        the entry lock, so sessions starting at the same time make a single
+        request between them.
+
+        Arguments:
+            key (str): The cache key.
+            fetch: A callable that returns fresh data for `key`.
+
+        Returns:
+            The cached or freshly fetched data.
+        """
+        data, age = self.read(key)
+        if data is not None:
+            if age > self.ttl:
+                self.refresh_async(key, fetch)
+            return data
+
+        try:
+            lock_file = self._lock(key)
+        except (IOError, OSError):
+            return fetch()
+        try:
+            data, age = self.read(key)
+            if data is not None:
+                return data
+            return self._fetch_and_store(key, fetch)
+        finally:
+            lock_file.close()
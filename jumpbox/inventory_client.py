@@ -0,0 +1,98 @@
+import json
+import os
+import socket
+
+SOCKET_PATH = os.path.expanduser('~/.cache/jumpbox/inventory.sock')
+TIMEOUT = 10
+
+
+class InventoryError(Exception):
+    """The inventory daemon could not answer a request."""
+
+
+class InventoryClient(object):
+    """A client for the shared inventory daemon.
+
+    The daemon (`inventory_daemon.py`) holds one copy of the Netbox inventory
+    for every Jumpbox session on the host and answers requests over a Unix
+    domain socket. Each request and response is a single line of JSON.
+
+    Arguments:
+        socket_path (str, optional): The path of the daemon's socket.
+            Default is `~/.cache/jumpbox/inventory.sock`.
+        timeout (int, optional): The socket timeout, in seconds. Default is
+            10.
+    """
+
+    def __init__(self, socket_path=SOCKET_PATH, timeout=TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def available(self):
+        """Check whether the daemon is running.
+
+        Returns:
+            bool: True if the daemon's socket accepts connections, False
+            otherwise.
+        """
+        if not self.socket_path or not os.path.exists(self.socket_path):
+            return False
+        try:
+            self._connect().close()
+        except socket.error:
+            return False
+        return True
+
+    def _connect(self):
+        """Open a connection to the daemon's socket."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except socket.error:
+            sock.close()
+            raise
+        return sock
+
+    def call(self, method, **params):
+        """Make a request to the daemon.
+
+        Arguments:
+            method (str): The name of the request, such as `get_sites`.
+            **params: The arguments for the request.
+
+        Returns:
+            The result of the request.
+
+        Raises:
+            InventoryError: The daemon could not be reached or returned an
+                error.
+        """
+        request = json.dumps({'method': method, 'params': params}) + '\n'
+        try:
+            sock = self._connect()
+            try:
+                sock.sendall(request)
+                line = sock.makefile('r').readline()
+            finally:
+                sock.close()
+            response = json.loads(line)
+        except (socket.error, ValueError) as err:
+            raise InventoryError(str(err))
+
+        if 'error' in response:
+            raise InventoryError(response['error'])
+        return response['result']
+
+    def get_sites(self):
+        """Get the sites, as returned by `NetboxAPI.get_sites`."""
+        return self.call('get_sites')
+
+    def get_devices(self, site_slug=None, q=None):
+        """Get devices, as returned by `NetboxAPI.get_devices`.
+
+        Arguments:
+            site_slug (str, optional): Only get devices for this site.
+            q (str, optional): Only get devices matching this search string.
+        """
+        return self.call('get_devices', site_slug=site_slug, q=q)
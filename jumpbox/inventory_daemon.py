@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import os
+import SocketServer
+import threading
+import time
+
+from device_store import DeviceStore
+from inventory_client import SOCKET_PATH
+from netbox_api import NetboxAPI
+from search_index import SearchIndex
+
+REFRESH_INTERVAL = 300
+
+
+class Inventory(object):
+    """A warm copy of the Netbox inventory, shared by every session.
+
+    Arguments:
+        api (:obj:`NetboxAPI`): The API used to refresh the inventory.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self.sites = list()
+        self.store = DeviceStore()
+        self.index = SearchIndex()
+
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Reload the sites and devices from Netbox.
+
+        The new inventory is built before it replaces the old one, so requests
+        are answered from the old inventory while a refresh is running.
+        """
+        sites, devices = self.api.get_inventory()
+        store = DeviceStore(devices)
+        sites = [item for item in sites if store.has_site(item['slug'])]
+        index = SearchIndex(store)
+
+        with self._lock:
+            self.sites = sites
+            self.store = store
+            self.index = index
+
+    def get_sites(self):
+        """Return the sites with one or more devices."""
+        return self.sites
+
+    def get_devices(self, site_slug=None, q=None):
+        """Return the devices, optionally filtered by site or search string.
+
+        Arguments:
+            site_slug (str, optional): Only return devices for this site.
+            q (str, optional): Only return devices matching this string.
+
+        Returns:
+            list: The fields of each device used by the menu, in the format
+            returned by `NetboxAPI.get_devices`.
+        """
+        if site_slug:
+            records = self.store.by_site(site_slug)
+        elif q:
+            with self._lock:
+                records = self.index.search(q)
+        else:
+            records = self.store
+        return [record.to_device() for record in records]
+
+
+class InventoryHandler(SocketServer.StreamRequestHandler):
+    """Answer requests from a single client connection.
+
+    Each line received is a JSON request with a `method` and `params`, which
+    is answered with a single line of JSON holding the `result` or an `error`.
+    """
+
+    methods = ('get_sites', 'get_devices')
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if request.get('method') not in self.methods:
+                    raise ValueError("Unknown method: %s" % request.get('method'))
+                method = getattr(self.server.inventory, request['method'])
+                params = dict((str(key), value) for key, value
+                              in request.get('params', dict()).items())
+                response = {'result': method(**params)}
+            except (ValueError, TypeError) as err:
+                response = {'error': str(err)}
+            self.wfile.write(json.dumps(response) + '\n')
+            self.wfile.flush()
+
+
+class InventoryServer(SocketServer.ThreadingMixIn,
+                      SocketServer.UnixStreamServer):
+    """A Unix domain socket server for the shared inventory.
+
+    Arguments:
+        socket_path (str): The path of the socket to listen on.
+        inventory (:obj:`Inventory`): The inventory to serve.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, inventory):
+        self.inventory = inventory
+        SocketServer.UnixStreamServer.__init__(
+            self, socket_path, InventoryHandler)
+
+
+def refresh_loop(inventory, interval):
+    """Refresh the inventory every `interval` seconds, forever.
+
+    Arguments:
+        inventory (:obj:`Inventory`): The inventory to refresh.
+        interval (int): The number of seconds between refreshes.
+    """
+    while True:
+        time.sleep(interval)
+        try:
+            inventory.refresh()
+        except Exception:
+            # Keep serving the last good inventory until Netbox is back.
+            pass
+
+
+def serve(socket_path=SOCKET_PATH, interval=REFRESH_INTERVAL):
+    """Load the inventory, then serve it until the process is stopped.
+
+    Arguments:
+        socket_path (str, optional): The path of the socket to listen on.
+        interval (int, optional): The number of seconds between refreshes.
+    """
+    # The daemon must talk to Netbox itself, never to another daemon. It
+    # keeps its own copy warm, so the on-disk cache would only make each
+    # refresh serve the data from the previous one.
+    inventory = Inventory(NetboxAPI(cache_ttl=0, socket_path=None))
+    inventory.refresh()
+
+    refresher = threading.Thread(target=refresh_loop,
+                                 args=(inventory, interval))
+    refresher.daemon = True
+    refresher.start()
+
+    socket_dir = os.path.dirname(socket_path)
+    if socket_dir and not os.path.isdir(socket_dir):
+        os.makedirs(socket_dir, 0o700)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    old_umask = os.umask(0o077)
+    try:
+        server = InventoryServer(socket_path, inventory)
+    finally:
+        os.umask(old_umask)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+
+
+def main():
+    """Parse the command line arguments and start the daemon."""
+    parser = argparse.ArgumentParser(
+        description="Serve a shared Netbox inventory to Jumpbox sessions.")
+    parser.add_argument('--socket', default=SOCKET_PATH,
+                        help="path of the Unix socket (default: %(default)s)")
+    parser.add_argument('--interval', type=int, default=REFRESH_INTERVAL,
+                        help="seconds between refreshes (default: %(default)s)")
+    args = parser.parse_args()
+
+    serve(socket_path=args.socket, interval=args.interval)
+
+
+if __name__ == '__main__':
+    main()
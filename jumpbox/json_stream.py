@@ -0,0 +1,160 @@
+import json
+import re
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+_RESULTS = object()
+
+
+class JSONStream(object):
+    """Decode JSON values one at a time from a stream of text chunks.
+
+    Only the chunk being decoded, and whatever is left over from the one
+    before it, is held in memory.
+
+    Arguments:
+        chunks: An iterable of strings, such as
+            `PooledResponse.iter_content()`.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = ''
+        self._pos = 0
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self):
+        """Add the next chunk to the buffer.
+
+        Returns:
+            bool: False if the stream has ended, True otherwise.
+        """
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """Skip any whitespace and return the next character.
+
+        Raises:
+            ValueError: The stream ended first.
+        """
+        while True:
+            self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON data")
+
+    def expect(self, chars):
+        """Consume the next character, which must be one of `chars`.
+
+        Arguments:
+            chars (str): The characters allowed next.
+
+        Returns:
+            str: The character consumed.
+
+        Raises:
+            ValueError: The next character is not one of `chars`.
+        """
+        char = self.peek()
+        if char not in chars:
+            raise ValueError("Expected one of %r at %r" % (chars, char))
+        self._pos += 1
+        return char
+
+    def value(self):
+        """Decode the next complete JSON value.
+
+        Raises:
+            ValueError: The value is not valid JSON.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                # The value may just be cut off at the end of the chunk.
+                if not self._fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next
+            # chunk, so it is decoded again once more has arrived.
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def drain(self):
+        """Read the rest of the stream, discarding it."""
+        for _ in self._chunks:
+            pass
+
+
+def _members(stream, page, key):
+    """Decode the members of a JSON object into `page`.
+
+    When the `key` member is an array, `_RESULTS` is yielded as it starts,
+    followed by each of its items. The members after the array are decoded
+    once the last item has been yielded.
+    """
+    stream.expect('{')
+    if stream.peek() == '}':
+        stream.expect('}')
+        stream.drain()
+        return
+
+    while True:
+        name = stream.value()
+        stream.expect(':')
+        if name == key and stream.peek() == '[':
+            stream.expect('[')
+            yield _RESULTS
+            if stream.peek() == ']':
+                stream.expect(']')
+            else:
+                while True:
+                    yield stream.value()
+                    if stream.expect(',]') == ']':
+                        break
+        else:
+            page[name] = stream.value()
+        if stream.expect(',}') == '}':
+            break
+    stream.drain()
+
+
+def parse_page(chunks, key='results'):
+    """Decode a paginated Netbox response as it arrives.
+
+    Everything up to the `key` array, such as the `count` and `next` members
+    Netbox sends first, is decoded straight away. The array itself is decoded
+    one item at a time as it is iterated over, so only a single record is
+    held in memory at once.
+
+    Arguments:
+        chunks: An iterable of strings holding the JSON response.
+        key (str, optional): The member holding the array of records.
+            Default is `results`.
+
+    Returns:
+        dict: The members of the response, with `key` holding an iterator
+        over the records.
+
+    Raises:
+        ValueError: The response is not a valid JSON object, or has no `key`
+            array, such as the `detail` Netbox sends in place of the results
+            when a token is rejected.
+    """
+    page = dict()
+    members = _members(JSONStream(chunks), page, key)
+    for _ in members:
+        page[key] = members
+        break
+    if page.get(key) is not members:
+        raise ValueError("No %r array in the response" % key)
+    return page
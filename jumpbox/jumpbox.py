@@ -1,9 +1,23 @@
 import curses
 import os
 import platform
+import sys
+import time
 
+from timing import timings
 from version import __version__
 
+BACKSPACE_KEYS = (curses.KEY_BACKSPACE, 127, 8)
+ESCAPE_KEY = 27
+FILTER_KEY = ord('/')
+GO_TO_TIMEOUT = 1.0
+IDLE_TIMEOUT = 100
+MARK_ALL_KEY = 1  # Ctrl-A
+MARK_KEYS = (ord(' '), ord('\t'))
+RUN_MARKED_KEY = 18  # Ctrl-R
+NAVIGATION_KEYS = (curses.KEY_DOWN, curses.KEY_UP, curses.KEY_NPAGE,
+                   curses.KEY_PPAGE, curses.KEY_HOME, curses.KEY_END)
+
 
 class Jumpbox(object):
     """A class that builds a menu and allows a user to interact with it.
@@ -15,6 +29,9 @@ class Jumpbox(object):
         currently_active_menu: A variable to hold the currently active menu
             or None if no menu is active.
         stdscr: The Curses initialization variable.
+        idle_handlers: Callables run whenever no key has been pressed for
+            `IDLE_TIMEOUT` milliseconds, such as background work that fills
+            in the menu. A handler returns True if the menu needs redrawing.
 
     Arguments:
         screen: Curses window associated with the visible menu.
@@ -23,18 +40,36 @@ class Jumpbox(object):
         term_y (int): The max Y coordinate of the terminal (height).
         term_x (int): The max X coordinate of the terminal (width).
         items: The list of options used to build the menu.
-        current_option (int): The index of the highlighted menu option.
+        current_option (int): The index of the highlighted menu option in
+            `options`.
+        top_option (int): The index in `options` of the first menu option
+            visible in the terminal.
         selected_option (int): The index of the user selected menu option.
         returned_value: Value returned by the selected menu option.
         should_exit (bool): True if the menu should exit.
         parent: Parent menu of the current menu or None.
         previous_active_menu: Previously active menu or None.
         exit_item: The displayed menu option that allows the user to exit.
+        marked_action: The menu option run on the marked options with Ctrl-R,
+            which isn't shown in the list, or None.
+        _dirty_options (set): The indexes of the menu options that need to be
+            redrawn by `draw_dirty`.
+        _filters (list): A stack with an entry for each character typed into
+            the filter, holding the filter text, the matching menu options
+            and their lower case `match_text`. Empty if the menu isn't being
+            filtered.
+        _digits (str): The digits typed so far for the option to go to.
+        _digits_typed (float): When the last digit was typed.
+        _unread (int): A key read while applying waiting navigation keys
+            that wasn't one, to be processed next, or None.
+        _marked (set): The menu options that have been marked, for options
+            that act on several others at once.
         _running (bool): True if the menu is actively running.
     """
 
     currently_active_menu = None
     stdscr = None
+    idle_handlers = list()
 
     def __init__(self, title=None, subtitle=None, show_exit_option=True):
         """
@@ -57,6 +92,7 @@ class Jumpbox(object):
 
         self.items = list()
         self.current_option = 0
+        self.top_option = 0
         self.selected_option = -1
         self.returned_value = None
         self.should_exit = False
@@ -64,13 +100,55 @@ class Jumpbox(object):
         self.previous_active_menu = None
 
         self.exit_item = ExitItem(menu=self)
-
+        self.marked_action = None
+
+        self._dirty_options = set()
+        self._filters = list()
+        self._digits = ''
+        self._digits_typed = 0
+        self._unread = None
+        self._marked = set()
         self._running = False
 
     def __repr__(self):
         return "%s: %s. %d items" % (self.title, self.subtitle,
                                      len(self.items))
 
+    @property
+    def options(self):
+        """The menu options that are shown.
+
+        This is every option in `items`, or only those matching the filter
+        while one is being typed, followed by the exit option.
+
+        Returns:
+            list
+        """
+        if not self._filters:
+            return self.items
+        options = self._filters[-1][1]
+        if self.items and self.items[-1] is self.exit_item:
+            return options + [self.exit_item]
+        return options
+
+    @property
+    def filter_text(self):
+        """The text typed into the filter, or None if there is no filter."""
+        if self._filters:
+            return self._filters[-1][0]
+        return None
+
+    @property
+    def marked_items(self):
+        """The menu options that have been marked, in menu order.
+
+        Returns:
+            list
+        """
+        if not self._marked:
+            return list()
+        return [item for item in self.items if item in self._marked]
+
     @property
     def current_item(self):
         """The currently highlighted menu option.
@@ -80,8 +158,9 @@ class Jumpbox(object):
         Returns:
             MenuItem or None
         """
-        if self.items:
-            return self.items[self.current_option]
+        options = self.options
+        if options:
+            return options[self.current_option]
         else:
             return None
 
@@ -94,8 +173,9 @@ class Jumpbox(object):
         Returns:
             MenuItem or None
         """
-        if self.items and self.selected_option != -1:
-            return self.items[self.current_option]
+        options = self.options
+        if options and self.selected_option != -1:
+            return options[self.current_option]
         else:
             return None
 
@@ -103,25 +183,55 @@ class Jumpbox(object):
         """Append a menu item to the menu options list.
 
         This will take a menu option and append it to the end of the menu list,
-        before the exit option appears.
+        before the exit option appears. If the exit option is highlighted, it
+        stays highlighted.
 
         Arguments:
             item (:obj:`str`): The menu option to be added to the `items` list.
         """
+        on_exit = self.current_item is self.exit_item
         did_remove = self.remove_exit()
         item.menu = self
         self.items.append(item)
         if did_remove:
             self.add_exit()
-        if self.screen:
-            self.term_y, self.term_x = self.screen.getmaxyx()
-            if self.term_y < 6 + len(self.items):
-                self.screen.resize(len(self.items) + 6, self.term_x)
+        self._filter_new_items([item])
+        if on_exit:
+            self.current_option = len(self.options) - 1
+        if self.screen and Jumpbox.currently_active_menu is self:
+            self.draw()
+
+    def extend_items(self, items):
+        """Append several menu items to the menu options list.
+
+        This is the same as calling `append_item` for each item, but the menu
+        is only redrawn once.
+
+        Arguments:
+            items: The menu options to be added to the `items` list.
+        """
+        on_exit = self.current_item is self.exit_item
+        did_remove = self.remove_exit()
+        start = len(self.items)
+        for item in items:
+            item.menu = self
+            self.items.append(item)
+        end = len(self.items)
+        if did_remove:
+            self.add_exit()
+        self._filter_new_items(self.items[start:end])
+        if on_exit:
+            self.current_option = len(self.options) - 1
+        if self.screen and Jumpbox.currently_active_menu is self:
             self.draw()
 
     def reset_menu(self):
         """Reset the menu to a blank list."""
         self.items = list()
+        self.current_option = 0
+        self.top_option = 0
+        self._filters = list()
+        self._marked = set()
 
     def add_exit(self):
         """Add the exit menu option.
@@ -156,7 +266,7 @@ class Jumpbox(object):
     def _wrap_start(self):
         """Create a wrapper to start the menu."""
         if self.parent is None:
-            curses.wrapper(self._main_loop)
+            curses.wrapper(self._main_loop, timings.clock())
         else:
             self._main_loop(None)
         Jumpbox.currently_active_menu = None
@@ -178,6 +288,8 @@ class Jumpbox(object):
         Jumpbox.currently_active_menu = None
 
         self.current_option = 0
+        self.top_option = 0
+        self._filters = list()
 
         self.should_exit = False
 
@@ -191,85 +303,252 @@ class Jumpbox(object):
 
         self._wrap_start()
 
-    def _main_loop(self, scr):
-        """Loop the menu, until the user signals to exit."""
+    def _main_loop(self, scr, started=None):
+        """Loop the menu, until the user signals to exit.
+
+        Arguments:
+            scr: The curses screen, or None to keep using `stdscr`.
+            started (float, optional): When curses started to initialize, as
+                returned by `timings.clock`, to record it as a timing span.
+        """
+        if started is not None:
+            timings.record('curses.init', started)
         if scr is not None:
             Jumpbox.stdscr = scr
-        self.term_y, self.term_x = Jumpbox.stdscr.getmaxyx()
-        self.screen = curses.newpad(len(self.items) + 6, self.term_x)
-        self._set_up_colors()
-        curses.curs_set(0)
-        Jumpbox.stdscr.refresh()
-        self.draw()
+        with timings.span('menu.first_draw', title=self.title):
+            self.term_y, self.term_x = Jumpbox.stdscr.getmaxyx()
+            # The pad only ever holds what fits in the terminal, no matter how
+            # many options the menu has.
+            self.screen = curses.newpad(self.term_y, self.term_x)
+            self._set_up_colors()
+            curses.curs_set(0)
+            Jumpbox.stdscr.refresh()
+            self.draw()
         Jumpbox.currently_active_menu = self
         self._running = True
         while self._running is not False and not self.should_exit:
             self.process_user_input()
 
+    @property
+    def visible_options(self):
+        """The number of menu options that fit in the terminal.
+
+        Returns:
+            int
+        """
+        return max(self.term_y - 6, 1)
+
+    @property
+    def shown_options(self):
+        """The menu options currently on the screen.
+
+        Returns:
+            list
+        """
+        return self.options[self.top_option:
+                            self.top_option + self.visible_options]
+
+    def _scroll_to_current(self):
+        """Scroll the menu just enough to keep the current option visible."""
+        if self.current_option < self.top_option:
+            self.top_option = self.current_option
+        elif self.current_option >= self.top_option + self.visible_options:
+            self.top_option = self.current_option - self.visible_options + 1
+
+        last_top = max(len(self.options) - self.visible_options, 0)
+        self.top_option = max(min(self.top_option, last_top), 0)
+
     def draw(self):
         """Draw the menu in the terminal.
 
         This should be called whenever something changes that needs to be
-        refreshed on the screen.
+        refreshed on the screen. Only the menu options visible in the terminal
+        are drawn, so the cost doesn't grow with the length of the menu.
         """
+        self.term_y, self.term_x = self.screen.getmaxyx()
+        self._scroll_to_current()
+
+        self._dirty_options.clear()
+        self.screen.erase()
         self.screen.border(0)
         if self.title is not None:
             self.screen.addstr(2, 2, self.title, curses.A_UNDERLINE)
-        if self.subtitle is not None:
-            self.screen.addstr(4, 2, self.subtitle, curses.A_BOLD)
-
-        for index, item in enumerate(self.items):
-            if self.current_option == index:
-                text_style = self.highlight
-            else:
-                text_style = self.normal
-            self.screen.addstr(index + 5, 4, item.show(index), text_style)
-
-        self.screen.addstr(index + 5, self.term_x - len(__version__) - 2,
-                           __version__, curses.A_BOLD)
-
-        self.term_y, self.term_x = Jumpbox.stdscr.getmaxyx()
-        top_row = 0
-        if len(self.items) + 6 > self.term_y:
-            if self.term_y + self.current_option < len(self.items) + 6:
-                top_row = self.current_option
-            else:
-                top_row = len(self.items) + 6 - self.term_y
-
-        self.screen.refresh(top_row, 0, 0, 0, self.term_y - 1, self.term_x - 1)
-
-    def get_input(self):
+        if self._filters:
+            matches = len(self._filters[-1][1])
+            self.screen.addstr(
+                4, 2, ("Filter: %s_  (%d match%s)" % (
+                    self.filter_text, matches, "" if matches == 1 else "es")
+                )[:max(self.term_x - 4, 0)], curses.A_BOLD)
+        elif self.subtitle is not None:
+            subtitle = self.subtitle
+            if self._marked and self.marked_action is not None:
+                subtitle += "  (%d marked, Ctrl-R: %s)" % (
+                    len(self._marked), self.marked_action.text)
+            elif self._marked:
+                subtitle += "  (%d marked)" % len(self._marked)
+            self.screen.addstr(4, 2, subtitle[:max(self.term_x - 4, 0)],
+                               curses.A_BOLD)
+
+        options = self.options
+        last_option = min(self.top_option + self.visible_options,
+                          len(options))
+        for index in range(self.top_option, last_option):
+            self._draw_item(index, options)
+
+        if last_option > self.top_option:
+            self.screen.addstr(last_option - self.top_option + 4,
+                               self.term_x - len(__version__) - 2,
+                               __version__, curses.A_BOLD)
+
+        self.screen.refresh(0, 0, 0, 0, self.term_y - 1, self.term_x - 1)
+
+    def draw_dirty(self):
+        """Redraw only the menu options that have changed.
+
+        This is used when moving the highlight between options that are both
+        already visible, so the border, titles and every other option are left
+        alone. Anything else, such as scrolling, falls back to `draw`.
+        """
+        top_option = self.top_option
+        self._scroll_to_current()
+        if self.top_option != top_option:
+            self.draw()
+            return
+
+        options = self.options
+        last_option = min(self.top_option + self.visible_options,
+                          len(options))
+        for index in self._dirty_options:
+            if self.top_option <= index < last_option:
+                self._draw_item(index, options)
+        self._dirty_options.clear()
+
+        self.screen.refresh(0, 0, 0, 0, self.term_y - 1, self.term_x - 1)
+
+    def _draw_item(self, index, options=None):
+        """Draw a single menu option on its row of the screen.
+
+        Arguments:
+            index (int): The index of the menu option in `options`.
+            options (list, optional): The menu options that are shown, if
+                the caller already has them. Default is `options`.
+        """
+        if options is None:
+            options = self.options
+        if self.current_option == index:
+            text_style = self.highlight
+        else:
+            text_style = self.normal
+        text = options[index].show(index)[:max(self.term_x - 6, 0)]
+        row = index - self.top_option + 5
+        self.screen.addstr(row, 2, '*' if options[index] in self._marked
+                           else ' ')
+        self.screen.addstr(row, 4, text, text_style)
+
+    @classmethod
+    def add_idle_handler(cls, handler):
+        """Run `handler` whenever the menu is waiting for input.
+
+        Arguments:
+            handler: A callable that returns True if the menu needs
+                redrawing.
+        """
+        cls.idle_handlers.append(handler)
+
+    @classmethod
+    def remove_idle_handler(cls, handler):
+        """Stop running `handler` while the menu is waiting for input.
+
+        Arguments:
+            handler: A callable passed to `add_idle_handler`.
+        """
+        if handler in cls.idle_handlers:
+            cls.idle_handlers.remove(handler)
+
+    def run_idle_handlers(self):
+        """Run the idle handlers, then redraw the menu if any asked for it."""
+        changed = False
+        for handler in list(Jumpbox.idle_handlers):
+            if handler():
+                changed = True
+        if changed:
+            self.draw()
+
+    def get_input(self, wait=True):
         """Wait for user input.
 
+        If there are idle handlers, give up waiting after `IDLE_TIMEOUT`
+        milliseconds so they can be run.
+
+        Arguments:
+            wait (bool, optional): False to only read a key that has already
+                been pressed, without waiting. Default is True.
+
         Returns:
-            int: Ordinal value of a single character.
+            int: Ordinal value of a single character, or -1 if no key was
+            pressed.
         """
+        if not wait:
+            Jumpbox.stdscr.timeout(0)
+        elif Jumpbox.idle_handlers:
+            Jumpbox.stdscr.timeout(IDLE_TIMEOUT)
+        else:
+            Jumpbox.stdscr.timeout(-1)
         return Jumpbox.stdscr.getch()
 
     def process_user_input(self):
         """Process the user input.
 
         After the user presses a single key, determine what to do with the
-        key press.
+        key press. Typing a letter, or `/` followed by anything, filters the
+        menu options; backspace removes the last character typed and escape
+        leaves the filter. Space, or tab while filtering, marks or unmarks
+        the highlighted option, Ctrl-A marks every option shown and Ctrl-R
+        runs the `marked_action`. Digits typed within `GO_TO_TIMEOUT` seconds
+        of each other are read as a single option number. Navigation keys that
+        are already waiting, such as those from a held key, are applied
+        together with a single redraw.
 
         Returns:
             `get_input`
         """
-        user_input = self.get_input()
-
-        go_to_max = ord("9") if len(self.items) >= 9 else ord(
-            str(len(self.items)))
-
-        if ord('1') <= user_input <= go_to_max:
-            self.go_to(user_input - ord('0') - 1)
-        elif user_input == curses.KEY_DOWN:
-            self.go_down()
-        elif user_input == curses.KEY_UP:
-            self.go_up()
+        if self._unread is not None:
+            user_input, self._unread = self._unread, None
+        else:
+            user_input = self.get_input()
+        if user_input == -1:
+            self.run_idle_handlers()
+            return user_input
+
+        is_digit = ord('0') <= user_input <= ord('9')
+        if not is_digit:
+            self._digits = ''
+
+        if self._filters and 32 <= user_input < 127:
+            self.push_filter(chr(user_input))
+        elif self._filters and user_input in BACKSPACE_KEYS:
+            self.pop_filter()
+        elif self._filters and user_input == ESCAPE_KEY:
+            self.clear_filter()
+        elif is_digit:
+            self.type_digit(chr(user_input))
+        elif user_input in MARK_KEYS:
+            self.toggle_mark()
+        elif user_input == MARK_ALL_KEY:
+            self.mark_all()
+        elif user_input == RUN_MARKED_KEY and self.marked_action is not None:
+            self.run_item(self.marked_action)
+        elif user_input == FILTER_KEY:
+            self.push_filter('')
+        elif 32 < user_input < 127 and chr(user_input).isalpha():
+            self.push_filter(chr(user_input))
+        elif user_input in NAVIGATION_KEYS:
+            self._move_to(self._drain_navigation(
+                self._navigation_target(user_input)))
         elif user_input == curses.KEY_RIGHT:
             self.select()
         elif user_input == curses.KEY_LEFT:
-            self.current_option = len(self.items) - 1
+            self.current_option = len(self.options) - 1
             self.select()
         elif user_input == curses.KEY_RESIZE:
             self._running = False
@@ -279,14 +558,102 @@ class Jumpbox(object):
 
         return user_input
 
+    def _move_to(self, option):
+        """Move the highlight to another option.
+
+        Only the previously and newly highlighted options are redrawn, unless
+        the menu has to scroll.
+
+        Arguments:
+            option (int): The index of the option to highlight.
+        """
+        self._dirty_options.update((self.current_option, option))
+        self.current_option = option
+        self.draw_dirty()
+
+    def _navigation_target(self, key, option=None):
+        """Work out which option a navigation key moves the highlight to.
+
+        Arguments:
+            key (int): One of the `NAVIGATION_KEYS`.
+            option (int, optional): The index of the option the highlight
+                moves from. Default is `current_option`.
+
+        Returns:
+            int: The index of the option to highlight.
+        """
+        if option is None:
+            option = self.current_option
+        last = max(len(self.options) - 1, 0)
+
+        if key == curses.KEY_DOWN:
+            return option + 1 if option < last else 0
+        elif key == curses.KEY_UP:
+            return option - 1 if option > 0 else last
+        elif key == curses.KEY_NPAGE:
+            return min(option + self.visible_options, last)
+        elif key == curses.KEY_PPAGE:
+            return max(option - self.visible_options, 0)
+        elif key == curses.KEY_HOME:
+            return 0
+        elif key == curses.KEY_END:
+            return last
+        return option
+
+    def _drain_navigation(self, option):
+        """Apply any navigation keys that are already waiting to be read.
+
+        Keys are read without waiting until there are none left or one that
+        isn't a navigation key turns up, which is kept in `_unread` to be
+        processed next.
+
+        Arguments:
+            option (int): The index of the option the highlight is moving to.
+
+        Returns:
+            int: The index of the option to highlight once the waiting keys
+            have been applied.
+        """
+        while True:
+            user_input = self.get_input(wait=False)
+            if user_input == -1:
+                break
+            if user_input not in NAVIGATION_KEYS:
+                self._unread = user_input
+                break
+            option = self._navigation_target(user_input, option)
+        return option
+
+    def type_digit(self, digit):
+        """Go to an option by its number, one digit at a time.
+
+        A digit typed within `GO_TO_TIMEOUT` seconds of the last is added to
+        the number, if there is an option with the longer number. Otherwise
+        the number starts again from this digit.
+
+        Arguments:
+            digit (str): The digit typed.
+        """
+        now = time.time()
+        if now - self._digits_typed > GO_TO_TIMEOUT:
+            self._digits = ''
+        self._digits_typed = now
+
+        options = len(self.options)
+        for digits in (self._digits + digit, digit):
+            if 1 <= int(digits) <= options:
+                self._digits = digits
+                self.go_to(int(digits) - 1)
+                return
+        self._digits = ''
+
     def go_to(self, option):
         """Go to the option entered by the user as a number.
 
         Arguments:
             option (int): The menu item to go to.
         """
-        self.current_option = option
-        self.draw()
+        self._move_to(option)
 
     def go_down(self):
         """Go down one option.
@@ -294,11 +661,7 @@ class Jumpbox(object):
         If the currently highlighted option is the last option in the list,
         wrap to the first menu option.
         """
-        if self.current_option < len(self.items) - 1:
-            self.current_option += 1
-        else:
-            self.current_option = 0
-        self.draw()
+        self._move_to(self._navigation_target(curses.KEY_DOWN))
 
     def go_up(self):
         """Go up one option.
@@ -306,11 +669,117 @@ class Jumpbox(object):
         If the currently highlighted option is the first option in the list,
         wrap to the last menu option.
         """
-        if self.current_option > 0:
-            self.current_option += -1
+        self._move_to(self._navigation_target(curses.KEY_UP))
+
+    def go_page_down(self):
+        """Go down a page of options, stopping at the last option."""
+        self._move_to(self._navigation_target(curses.KEY_NPAGE))
+
+    def go_page_up(self):
+        """Go up a page of options, stopping at the first option."""
+        self._move_to(self._navigation_target(curses.KEY_PPAGE))
+
+    def toggle_mark(self):
+        """Mark or unmark the highlighted option, then move to the next.
+
+        Only options that can be marked, such as devices, are affected.
+        """
+        item = self.current_item
+        if not getattr(item, 'markable', False):
+            return
+        if item in self._marked:
+            self._marked.remove(item)
+        else:
+            self._marked.add(item)
+        # The whole menu is redrawn, since the count in the subtitle changes.
+        self.current_option = min(self.current_option + 1,
+                                  len(self.options) - 1)
+        if self.screen:
+            self.draw()
+
+    def mark_all(self):
+        """Mark every option shown, or unmark them if they all are.
+
+        While filtering, only the options that match the filter are marked.
+        """
+        items = [item for item in self.options
+                 if getattr(item, 'markable', False)]
+        if all(item in self._marked for item in items):
+            self._marked.difference_update(items)
+        else:
+            self._marked.update(items)
+        if self.screen:
+            self.draw()
+
+    def push_filter(self, text):
+        """Add text to the filter, narrowing the menu options shown.
+
+        Only the options that matched the filter before the text was added are
+        searched, so each character typed makes the search smaller.
+
+        Arguments:
+            text (str): The text typed, which is matched without regard to
+                case against each option's `match_text`. An empty string
+                starts a filter without narrowing the options.
+        """
+        if self._filters:
+            query, items, keys = self._filters[-1]
+        else:
+            query = ''
+            items = [item for item in self.items if item is not self.exit_item]
+            keys = [item.match_text().lower() for item in items]
+
+        query += text
+        needle = query.lower()
+        if text:
+            matches = [index for index, key in enumerate(keys)
+                       if needle in key]
+            items = [items[index] for index in matches]
+            keys = [keys[index] for index in matches]
         else:
-            self.current_option = len(self.items) - 1
-        self.draw()
+            items = list(items)
+            keys = list(keys)
+        self._filters.append((query, items, keys))
+        self._filter_changed()
+
+    def pop_filter(self):
+        """Remove the last character typed into the filter.
+
+        The options that matched before it was typed are restored from the
+        stack. Removing the last entry leaves the filter.
+        """
+        if self._filters:
+            self._filters.pop()
+        self._filter_changed()
+
+    def clear_filter(self):
+        """Leave the filter, showing every menu option again."""
+        del self._filters[:]
+        self._filter_changed()
+
+    def _filter_changed(self):
+        """Highlight the first option and redraw after the filter changes."""
+        self.current_option = 0
+        self.top_option = 0
+        if self.screen:
+            self.draw()
+
+    def _filter_new_items(self, items):
+        """Add menu options appended while filtering to the matches.
+
+        Arguments:
+            items: The menu options that were appended.
+        """
+        if not self._filters:
+            return
+        new_items = [item for item in items if item is not self.exit_item]
+        new_keys = [item.match_text().lower() for item in new_items]
+        for query, matches, keys in self._filters:
+            needle = query.lower()
+            for item, key in zip(new_items, new_keys):
+                if needle in key:
+                    matches.append(item)
+                    keys.append(key)
 
     def select(self):
         """Select the current menu option.
@@ -318,11 +787,32 @@ class Jumpbox(object):
         When the option is selected, it will run any associated actions.
         """
         self.selected_option = self.current_option
-        self.selected_item.set_up()
-        self.selected_item.action()
-        self.selected_item.clean_up()
-        self.returned_value = self.selected_item.get_return()
-        self.should_exit = self.selected_item.should_exit
+        self.run_item(self.selected_item)
+
+    def set_marked_action(self, item):
+        """Set the menu option run on the marked options with Ctrl-R.
+
+        The option isn't added to the list, so the numbers of the other
+        options don't change.
+
+        Arguments:
+            item: The menu option, such as a `FanOutItem`, or None.
+        """
+        if item is not None:
+            item.menu = self
+        self.marked_action = item
+
+    def run_item(self, item):
+        """Run the actions of a menu option.
+
+        Arguments:
+            item: The menu option to run.
+        """
+        item.set_up()
+        item.action()
+        item.clean_up()
+        self.returned_value = item.get_return()
+        self.should_exit = item.should_exit
 
         if not self.should_exit:
             self.draw()
@@ -356,8 +846,14 @@ class MenuItem(object):
         menu (:obj:`item`, optional): The menu the option belongs to.
         should_exit (bool, optional): True if the menu should exit, False
             otherwise. Default is False.
+
+    Attributes:
+        markable (bool): True if the option can be marked, so that options
+            such as `FanOutItem` can act on it along with others.
     """
 
+    markable = False
+
     def __init__(self, text, menu=None, should_exit=False):
         self.text = text
         self.menu = menu
@@ -367,6 +863,14 @@ class MenuItem(object):
     def __str__(self):
         return "%s %s" % (self.menu.title, self.text)
 
+    def match_text(self):
+        """The text a menu filter is matched against.
+
+        Returns:
+            str
+        """
+        return self.text
+
     def show(self, index):
         """Display the menu option.
 
@@ -430,16 +934,56 @@ class ExitItem(MenuItem):
         return super(ExitItem, self).show(index)
 
 
-def clear_terminal():
+def _clear_sequence():
+    """Build the escape sequence that clears the terminal.
+
+    The sequence leaves keypad mode, shows the cursor, then clears the screen
+    and the scrollback, using the capabilities of the current terminal where
+    they are known.
+
+    Returns:
+        str: The escape sequence.
+    """
+    fallback = {'rmkx': '', 'cnorm': '\033[?25h', 'clear': '\033[H\033[2J',
+                'E3': '\033[3J'}
+    try:
+        curses.tigetstr('clear')
+    except curses.error:
+        try:
+            curses.setupterm()
+        except curses.error:
+            return ''.join(fallback[cap] for cap in ('cnorm', 'clear', 'E3'))
+
+    sequence = ''
+    for cap in ('rmkx', 'cnorm', 'clear', 'E3'):
+        sequence += curses.tigetstr(cap) or fallback[cap]
+    return sequence
+
+
+def clear_terminal(reset=None):
     """Clear the terminal.
 
-    Calls the platform specific command to reset the terminal and clear any
-    residual commands.
+    Returns the terminal to the mode it was in before the menu started, then
+    clears the screen and scrollback by writing the escape sequence directly,
+    without starting any other process.
 
-    Examples:
-        >>> reset
+    Arguments:
+        reset (bool, optional): True to run the platform specific command to
+            reset the terminal instead, which is much slower but will fix a
+            terminal left in a broken state. Default is None, which uses the
+            `JUMPBOX_RESET_TERMINAL` environment variable.
     """
+    if reset is None:
+        reset = os.environ.get('JUMPBOX_RESET_TERMINAL', '') not in ('', '0')
+
     if platform.system().lower() == "windows":
         os.system('cls')
-    else:
+    elif reset:
         os.system('reset')
+    else:
+        try:
+            curses.reset_shell_mode()
+        except curses.error:
+            pass
+        sys.stdout.write(_clear_sequence())
+        sys.stdout.flush()
@@ -1,20 +1,59 @@
 #!/usr/bin/env python
 
+import os
+import sys
+from functools import partial
+
+from async_netbox import AsyncNetboxAPI
+from device_store import DeviceStore
+from external_item import FanOutItem
 from external_item import QuickConnect
 from jumpbox import *
 from netbox_api import NetboxAPI
+from netbox_api import NetboxError
 from netbox_item import *
+from reachability import prober
+from search_index import SearchIndex
+from ssh_mux import multiplexer
 from submenu_item import SubmenuItem
+from timing import timings
 
 
 def main():
     """Initialize the menu.
 
     Everything needed to build the menu should be written within this function.
+    Setting `JUMPBOX_ASYNC=1` in the environment starts the menu straight away
+    and fills in the sites and devices as they arrive from Netbox. Setting
+    `JUMPBOX_STREAM=1` decodes uncached responses one record at a time as they
+    arrive. Setting `JUMPBOX_TIMING=1` writes a timing report for the session
+    when it ends.
     """
-    api = NetboxAPI()
-    get_devices = api.get_devices()
-    get_sites = api.get_sites()
+    timings.start()
+    try:
+        run()
+    except NetboxError as err:
+        sys.exit("Unable to load the inventory from Netbox: %s" % err)
+    finally:
+        if multiplexer is not None:
+            multiplexer.close()
+        timings.write_report()
+
+
+def run():
+    """Build the menu and start it."""
+    api = NetboxAPI(
+        stream=os.environ.get('JUMPBOX_STREAM', '') not in ('', '0'))
+    background = (os.environ.get('JUMPBOX_ASYNC', '') not in ('', '0') and
+                  api.daemon is None)
+    # With the shared inventory daemon, each session only asks it for the
+    # devices in the menus that are opened, instead of holding a copy of the
+    # whole inventory.
+    on_demand = api.daemon is not None
+
+    # Every menu refers to the compact records in the device store, so the
+    # full JSON data for the devices is not kept once the store is built.
+    store = DeviceStore()
 
     # Define the main menu
     main_menu = Jumpbox("Jumpbox Main", "Select an option...")
@@ -24,9 +63,17 @@ def main():
     # Selecting this menu option will allow the user to input a string that
     # will return devices with hostnames matching (full or partial) the string.
     # Selecting an option from the filtered list of devices will establish an
-    # SSH connection to the specified device.
+    # SSH connection to the specified device. Searches are answered by the
+    # shared inventory daemon, when it is running, or from an index of the
+    # devices already loaded, rather than by querying Netbox. Netbox is only
+    # searched while the devices are still loading in the background.
+    if api.daemon is None:
+        search_index = SearchIndex(store, complete=not background)
+    else:
+        search_index = None
     search_menu = Jumpbox("Search Results", "Select a device...")
-    search_item = SearchItem("Search", submenu=search_menu, menu=main_menu)
+    search_item = SearchItem("Search", submenu=search_menu, menu=main_menu,
+                             index=search_index, api=api)
     main_menu.append_item(search_item)
 
     # Sites option:
@@ -42,22 +89,56 @@ def main():
     # the sites configured in Netbox that have one or more devices assigned with
     # a primary IP address. Selecting an option from this submenu will open a
     # submenu of the devices associated with the selected site.
-    for index, item in enumerate(get_sites):
-        sites_submenu = Jumpbox(item['name'], "Select a device...")
-        sites_submenu_item = SitesItem(
-            item['name'],
-            item['facility'],
-            submenu=sites_submenu,
-            menu=sites_menu)
-        sites_menu.append_item(sites_submenu_item)
-        # Devices by Site submenu:
-        # This is the submenu that is displayed when a site is selected from
-        # the `Sites` submenu. Selecting an option in this menu will establish
-        # an SSH connection to the associated device.
-        for index, item in enumerate(api.get_devices(item['slug'])):
-            text = item['display_name']
-            text_id = item['primary_ip']['address']
-            sites_submenu.append_item(DeviceItem(text, text_id))
+    #
+    # Devices by Site submenu:
+    # This is the submenu that is displayed when a site is selected from
+    # the `Sites` submenu. Selecting an option in this menu will establish
+    # an SSH connection to the associated device. The devices come from
+    # the device store, grouped by site, and the submenu is only built the
+    # first time the site is selected. With the shared inventory daemon, the
+    # site's devices are requested from it at that point instead. Ctrl-R
+    # runs a command on the devices marked in it.
+    known_sites = dict()
+    site_items = dict()
+
+    # A failure is shown in place of the subtitle of each menu that is
+    # missing data.
+    def report(error, menus):
+        for menu in menus:
+            menu.subtitle = "Unable to load from Netbox: %s" % error
+
+    def load_site(slug):
+        try:
+            return [store.add(item)
+                    for item in api.iter_devices(site_slug=slug)]
+        except NetboxError as err:
+            report(err, (site_items[slug].submenu,))
+            return list()
+
+    def add_site_items(site_slugs):
+        items = list()
+        for slug in site_slugs:
+            site = known_sites.get(slug)
+            if site is None or slug in site_items:
+                continue
+            if on_demand:
+                loader = partial(load_site, slug)
+            elif store.has_site(slug):
+                loader = partial(store.by_site, slug)
+            else:
+                continue
+            site_items[slug] = SitesItem(
+                site['name'],
+                site['facility'],
+                menu=sites_menu,
+                loader=loader)
+            items.append(site_items[slug])
+        sites_menu.extend_items(items)
+
+    def add_sites(sites):
+        for item in sites:
+            known_sites[item['slug']] = item
+        add_site_items(item['slug'] for item in sites)
 
     # Quick Connect option:
     # This is the `Quick Connect` option to be displayed in the main menu.
@@ -69,25 +150,104 @@ def main():
 
     # Devices option:
     # This is the `Devices` option to be displayed in the main menu. Selecting
-    # of this menu option will open the `Devices` submenu.
+    # of this menu option will open the `Devices` submenu. With the shared
+    # inventory daemon, the devices are requested from it the first time the
+    # option is selected.
     devices_menu = Jumpbox("All Devices", "Select a device...")
+
+    def load_devices():
+        # Devices from sites opened earlier are already in the store, but
+        # still need listing here.
+        try:
+            items = [DeviceItem(record=store.add(item))
+                     for item in api.iter_devices()]
+        except NetboxError as err:
+            report(err, (devices_menu,))
+            return
+        devices_menu.extend_items(items)
     devices_item = SubmenuItem(
-        "All Devices", submenu=devices_menu, menu=main_menu)
+        "All Devices", submenu=devices_menu, menu=main_menu,
+        loader=load_devices if on_demand else None)
     main_menu.append_item(devices_item)
+    devices_menu.set_marked_action(FanOutItem())
 
     # Devices submenu:
     # This is the `Devices` submenu that is displayed when the `Devices` option
     # is selected from the main menu. There are no filters applied to this menu,
     # so all devices, in Netbox, with a primary IP address assigned will be
     # displayed in this submenu. Selecting an option in this menu will establish
-    # an SSH connection to the associated device.
-    for index, item in enumerate(get_devices):
-        text = item['display_name']
-        text_id = item['primary_ip']['address']
-        devices_menu.append_item(DeviceItem(text, text_id))
+    # an SSH connection to the associated device. Ctrl-R runs a command on
+    # the devices marked in it.
+    def add_devices(devices):
+        items = list()
+        new_sites = list()
+        for item in devices:
+            count = len(store)
+            record = store.add(item)
+            if len(store) == count:
+                continue
+            items.append(DeviceItem(record=record))
+
+            # Devices arriving for a site that is already in the menu are
+            # added to its submenu, if the submenu has been built.
+            site_item = site_items.get(record.site_slug)
+            if site_item is None:
+                new_sites.append(record.site_slug)
+            elif site_item.loader is None and site_item.submenu is not None:
+                site_item.submenu.append_item(DeviceItem(record=record))
+        devices_menu.extend_items(items)
+        add_site_items(new_sites)
+
+    if background:
+        client = AsyncNetboxAPI(api)
+
+        # Failures are redrawn by the idle handler below.
+        def sites_loaded(error):
+            if error is not None:
+                report(error, (main_menu, sites_menu))
+        client.get_sites(add_sites, done=sites_loaded)
+
+        def devices_loaded(error):
+            if error is None:
+                search_index.complete = True
+            else:
+                report(error, (main_menu, sites_menu, devices_menu))
+        client.get_devices(add_devices, done=devices_loaded)
+
+        def poll():
+            changed = client.poll()
+            if not client.pending:
+                Jumpbox.remove_idle_handler(poll)
+            return changed
+        Jumpbox.add_idle_handler(poll)
+    elif on_demand:
+        with timings.span('main.inventory'):
+            add_sites(api.get_sites())
+    else:
+        with timings.span('main.inventory'):
+            get_sites, get_devices = api.get_inventory()
+        with timings.span('main.build_menus'):
+            add_devices(get_devices)
+            del get_devices
+            add_sites(get_sites)
+
+    # Reachability probing:
+    # While any menu is waiting for input, the devices on the screen are
+    # probed in the background and marked as up or down as the results come
+    # in. This is only enabled by setting `JUMPBOX_PROBE=1`.
+    if prober is not None:
+        def probe():
+            menu = Jumpbox.currently_active_menu
+            if menu is None:
+                return False
+            prober.watch(item.probe_target for item in menu.shown_options
+                         if isinstance(item, DeviceItem))
+            return prober.poll()
+        Jumpbox.add_idle_handler(probe)
 
     # Start the menu
-    main_menu.start()
+    with timings.span('main.menu'):
+        main_menu.start()
 
 
 if __name__ == '__main__':
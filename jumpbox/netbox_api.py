@@ -1,6 +1,66 @@
+import httplib
 import json
-import re
-import urllib2
+import socket
+import time
+import urllib
+from collections import OrderedDict
+from itertools import islice
+from multiprocessing.pool import ThreadPool
+
+from http_pool import HTTPConnectionPool
+from inventory_cache import CACHE_DIR
+from inventory_cache import CACHE_TTL
+from inventory_cache import InventoryCache
+from inventory_client import SOCKET_PATH
+from inventory_client import InventoryClient
+from inventory_client import InventoryError
+from json_stream import parse_page
+from timing import timings
+
+DIGITS = '0123456789'
+DEVICE_FIELDS = ('id', 'display_name', 'primary_ip', 'site', 'last_updated')
+MAX_WORKERS = 4
+PAGE_SIZE = 1000
+RECONCILE_INTERVAL = 3600
+SITE_FIELDS = ('id', 'name', 'slug', 'facility', 'count_devices')
+STREAM_BATCH_SIZE = 100
+
+
+class NetboxError(Exception):
+    """Netbox could not be reached, or answered a request with an error.
+
+    The message is the error string returned by `NetboxAPI.api_call`, such as
+    `HTTP Error: 500`.
+    """
+
+
+def clean_address(address):
+    """Remove the CIDR prefix length from an IP address.
+
+    Arguments:
+        address (str): An IP address, such as `192.0.2.1/24`.
+
+    Returns:
+        str: The address without the prefix length, such as `192.0.2.1`.
+    """
+    host, slash, length = address.rpartition('/')
+    if slash and length and not length.lstrip(DIGITS):
+        return host
+    return address
+
+
+def clean_hostname(name):
+    """Remove the member number from the end of a device hostname.
+
+    Arguments:
+        name (str): A device hostname, such as `switch01-1`.
+
+    Returns:
+        str: The hostname without a trailing `-<digit>`, such as `switch01`.
+    """
+    if len(name) > 1 and name[-2] == '-' and name[-1] in DIGITS:
+        return name[:-2]
+    return name
 
 
 class NetboxAPI(object):
@@ -9,6 +69,42 @@ class NetboxAPI(object):
     Use the Netbox API to gather the relevant information to be displayed in
     the menu system.
 
+    Arguments:
+        cache_ttl (int, optional): The number of seconds cached site and
+            device data is considered fresh. Stale data is still used, but is
+            refreshed in the background. Set to 0 or None to disable the
+            on-disk cache. Default is 300.
+        cache_dir (str, optional): The directory the on-disk cache is kept
+            in. It is shared by all sessions on the host. Default is
+            `~/.cache/jumpbox`.
+        page_size (int, optional): The number of records requested per page
+            when walking paginated results. Netbox caps this at its
+            `MAX_PAGE_SIZE` setting. Set to 0 or None to request everything
+            in a single response (`limit=0`). Default is 1000.
+        max_workers (int, optional): The maximum number of requests made to
+            Netbox at the same time. Set to 1 to make every request one after
+            another. Default is 4.
+        reconcile_interval (int, optional): The number of seconds between
+            full downloads of the device inventory. In between, only devices
+            changed since the last sync are requested, which does not pick up
+            deleted devices. Default is 3600.
+        socket_path (str, optional): The socket of the shared inventory
+            daemon. If the daemon is running, sites, devices and searches are
+            requested from it instead of from Netbox. Set to None to always
+            use Netbox. Default is `~/.cache/jumpbox/inventory.sock`.
+        fields (bool, optional): True to request only the fields used by the
+            menu (`DEVICE_FIELDS` and `SITE_FIELDS`) with Netbox's `fields`
+            query parameter. Versions of Netbox without field selection
+            return the full representations, which are trimmed to the same
+            fields once they arrive. Set to False for versions that reject
+            the parameter, or to keep every field. Default is True.
+        stream (bool, optional): True to decode uncached responses one record
+            at a time as they arrive, instead of holding the whole response
+            in memory. Pages are then requested one after another, and when
+            the on-disk cache is disabled the device inventory is returned as
+            an iterator, so memory stays flat however many devices there are.
+            Default is False.
+
     Notes:
         If Netbox is not being used, this module should be deleted and replaced
         with a similar module to gather the relevant information. However, a
@@ -16,12 +112,38 @@ class NetboxAPI(object):
         menu system and display options.
     """
 
-    def __init__(self):
+    def __init__(self, cache_ttl=CACHE_TTL, cache_dir=CACHE_DIR,
+                 page_size=PAGE_SIZE, max_workers=MAX_WORKERS,
+                 reconcile_interval=RECONCILE_INTERVAL,
+                 socket_path=SOCKET_PATH, fields=True, stream=False):
         self.base_url = 'http://<netbox_url>/api/'
+        self.fields = fields
+        self.stream = stream
+        self.page_size = page_size or 0
+        self.max_workers = max(max_workers or 1, 1)
+        self.reconcile_interval = reconcile_interval
+        self._pool = None
+        self.http = HTTPConnectionPool(maxsize=self.max_workers)
+
+        if cache_ttl:
+            self.cache = InventoryCache(cache_dir=cache_dir, ttl=cache_ttl)
+        else:
+            self.cache = None
+
+        self.daemon = None
+        if socket_path:
+            client = InventoryClient(socket_path)
+            if client.available():
+                self.daemon = client
 
     def api_call(self, req):
         """GET a JSON response from the Netbox API.
 
+        Requests are made over persistent, pooled connections and ask for a
+        gzip compressed response, which is decompressed as it arrives. Each
+        call is recorded as an `api_call` timing span, with the URL, status
+        and the number of bytes received.
+
         Arguments:
             req (str): The URL for the API request.
 
@@ -33,14 +155,333 @@ class NetboxAPI(object):
             URLError: Prints the reason for the URL error.
         """
         self.req = req
-        try:
-            request = urllib2.urlopen(self.req)
-            response = json.load(request)
-            return response
-        except urllib2.HTTPError, err:
-            return "HTTP Error: " + str(err.code)
-        except urllib2.URLError, err:
-            return "URL Error: " + str(err.reason)
+        with timings.span('api_call', url=req) as span:
+            try:
+                request = self.http.get(self.req)
+                body = request.read()
+            except (httplib.HTTPException, socket.error) as err:
+                span.set(error=str(err))
+                return "URL Error: " + str(err)
+
+            span.set(status=request.status, bytes=request.bytes_read,
+                     decoded_bytes=len(body))
+            if request.status >= 400:
+                return "HTTP Error: " + str(request.status)
+
+            response = json.loads(body)
+        return response
+
+    def stream_call(self, req):
+        """GET a paginated JSON response, decoding records as they arrive.
+
+        Arguments:
+            req (str): The URL for the API request.
+
+        Returns:
+            The JSON response for the Netbox GET request, with `results`
+            holding an iterator over the records, as decoded by
+            `json_stream.parse_page`.
+
+        Raises:
+            HTTPError: Prints the HTTP error code.
+            URLError: Prints the reason for the URL error.
+        """
+        self.req = req
+        with timings.span('stream_call', url=req) as span:
+            try:
+                request = self.http.get(self.req)
+                span.set(status=request.status)
+                if request.status >= 400:
+                    request.read()
+                    return "HTTP Error: " + str(request.status)
+                return parse_page(request.iter_content())
+            except (httplib.HTTPException, socket.error, ValueError) as err:
+                span.set(error=str(err))
+                return "URL Error: " + str(err)
+
+    @property
+    def pool(self):
+        """The worker pool used to make independent requests concurrently.
+
+        The pool is created the first time it is needed and is bounded by
+        `max_workers`.
+
+        Returns:
+            multiprocessing.pool.ThreadPool
+        """
+        if self._pool is None:
+            self._pool = ThreadPool(self.max_workers)
+        return self._pool
+
+    def close(self):
+        """Stop the worker pool and close any idle connections."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+        self.http.close()
+
+    def fields_query(self, fields):
+        """Build the query string that limits a response to `fields`.
+
+        Arguments:
+            fields (tuple): The names of the fields to request.
+
+        Returns:
+            str: The `fields` query parameter, or an empty string if field
+            selection is disabled.
+        """
+        if not self.fields:
+            return ''
+        return '&fields=' + ','.join(fields)
+
+    def trim_fields(self, item, fields):
+        """Drop everything but `fields` from a record.
+
+        Arguments:
+            item (dict): The JSON data for a single record.
+            fields (tuple): The names of the fields to keep.
+
+        Returns:
+            dict: The trimmed record, or `item` unchanged if field selection
+            is disabled or Netbox has already trimmed it.
+        """
+        if not self.fields or len(item) <= len(fields):
+            return item
+        return {key: item[key] for key in fields if key in item}
+
+    def daemon_call(self, method, **params):
+        """Make a request to the shared inventory daemon, if it is in use.
+
+        If the daemon stops answering, it is no longer used by this instance
+        and requests go to Netbox instead.
+
+        Arguments:
+            method (str): The name of the request, such as `get_sites`.
+            **params: The arguments for the request.
+
+        Returns:
+            The result of the request, or None if the daemon is not in use.
+        """
+        if self.daemon is None:
+            return None
+        with timings.span('daemon_call', method=method) as span:
+            try:
+                return self.daemon.call(method, **params)
+            except InventoryError as err:
+                span.set(error=str(err))
+                self.daemon = None
+                return None
+
+    def iter_pages(self, req, use_cache=True):
+        """GET each page of a paginated Netbox response.
+
+        Once the first page reports the total `count`, the remaining pages are
+        requested concurrently through the worker pool. Pages are always
+        yielded in order. With a single worker, Netbox's `next` links are
+        followed one page at a time instead.
+
+        When the on-disk cache is used, every page is fetched and the whole
+        listing is cached as a single entry, so a listing is never assembled
+        from pages cached at different times. It is then yielded as a single
+        page.
+
+        When streaming is enabled and the pages are not cached, `next` links
+        are followed one page at a time and each page is yielded in batches
+        of `STREAM_BATCH_SIZE` records as it is decoded.
+
+        Arguments:
+            req (str): The URL for the first page of the API request.
+            use_cache (bool, optional): True if the pages may be served from
+                the on-disk cache. Default is True.
+
+        Yields:
+            The list of `results` from each page of the response.
+
+        Raises:
+            NetboxError: A request failed.
+        """
+        if use_cache and self.cache is not None:
+            listing = self.cache.get(req + '#listing',
+                                     lambda: self._fetch_listing(req))
+            if not isinstance(listing, dict):
+                raise NetboxError(listing)
+            yield listing['results']
+            return
+
+        if self.stream:
+            for batch in self._stream_pages(req):
+                yield batch
+            return
+
+        for response in self._fetch_pages(req):
+            if not isinstance(response, dict):
+                raise NetboxError(response)
+            yield response['results']
+
+    def _fetch_pages(self, req):
+        """GET each page of a paginated Netbox response, without the cache.
+
+        Arguments:
+            req (str): The URL for the first page of the API request.
+
+        Yields:
+            The JSON response for each page, in order. If a request fails,
+            its error string is yielded and no more pages are requested.
+        """
+        response = self.api_call(req)
+        yield response
+        if not isinstance(response, dict):
+            return
+
+        page_size = len(response['results'])
+        if self.max_workers > 1 and response['next'] and page_size:
+            offsets = range(page_size, response['count'], page_size)
+            urls = [req + '&offset=%d' % offset for offset in offsets]
+            for response in self.pool.imap(self.api_call, urls):
+                yield response
+                if not isinstance(response, dict):
+                    return
+            return
+
+        req = response['next']
+        while req:
+            response = self.api_call(req)
+            yield response
+            if not isinstance(response, dict):
+                return
+            req = response['next']
+
+    def _fetch_listing(self, req):
+        """GET every page of a paginated Netbox response as one listing.
+
+        Arguments:
+            req (str): The URL for the first page of the API request.
+
+        Returns:
+            dict: The `count` and every record in `results`, or the error
+            string of the first request that failed.
+        """
+        results = list()
+        for response in self._fetch_pages(req):
+            if not isinstance(response, dict):
+                return response
+            results.extend(response['results'])
+        return {'count': len(results), 'results': results}
+
+    def _stream_pages(self, req):
+        """GET each page of a paginated Netbox response, streaming it.
+
+        Arguments:
+            req (str): The URL for the first page of the API request.
+
+        Yields:
+            list: Up to `STREAM_BATCH_SIZE` records at a time.
+
+        Raises:
+            NetboxError: A request failed, or a response was cut off or
+                malformed part of the way through.
+        """
+        while req:
+            response = self.stream_call(req)
+            if not isinstance(response, dict):
+                raise NetboxError(response)
+            results = response['results']
+            while True:
+                # The records are only read from the socket here, so errors
+                # part of the way through a response surface here too.
+                try:
+                    batch = list(islice(results, STREAM_BATCH_SIZE))
+                except (httplib.HTTPException, socket.error,
+                        ValueError) as err:
+                    raise NetboxError("URL Error: " + str(err))
+                if not batch:
+                    break
+                yield batch
+            req = response.get('next')
+
+    def devices_url(self, site_slug=None, q=None, page_size=None):
+        """Build the URL for a device request.
+
+        Arguments:
+            site_slug (str, optional): The site slug to filter devices by.
+            q (str, optional): A string to filter returned devices.
+            page_size (int, optional): The number of devices per page.
+                Default is the `page_size` of the instance.
+
+        Returns:
+            str: The URL for the API request.
+        """
+        if page_size is None:
+            page_size = self.page_size
+        get_url = self.base_url + 'dcim/devices/?limit=%d&has_primary_ip=True' % page_size
+        get_url += self.fields_query(DEVICE_FIELDS)
+        if site_slug:
+            get_url += '&site=' + site_slug
+        elif q:
+            get_url += '&q=' + urllib.quote(q)
+        return get_url
+
+    def sites_url(self, page_size=None):
+        """Build the URL for a site request.
+
+        Arguments:
+            page_size (int, optional): The number of sites per page.
+                Default is the `page_size` of the instance.
+
+        Returns:
+            str: The URL for the API request.
+        """
+        if page_size is None:
+            page_size = self.page_size
+        return (self.base_url + 'dcim/sites/?limit=%d' % page_size +
+                self.fields_query(SITE_FIELDS))
+
+    def iter_devices(self, site_slug=None, q=None, page_size=None):
+        """GET devices from Netbox, one page at a time.
+
+        Arguments:
+            site_slug (str, optional): The site slug associated with Sites in
+                Netbox. Used to only GET devices associated with a particular
+                site. Default is None.
+            q (str, optional): A string to filter returned devices.
+            page_size (int, optional): The number of devices per page.
+                Default is the `page_size` of the instance.
+
+        Yields:
+            The JSON data for each requested device, cleaned by the
+            `format_devices` method, as soon as its page has arrived.
+        """
+        devices = self.daemon_call('get_devices', site_slug=site_slug, q=q)
+        if devices is not None:
+            for item in devices:
+                yield item
+            return
+
+        get_url = self.devices_url(site_slug, q, page_size)
+        for page in self.iter_pages(get_url, use_cache=not q):
+            for item in self.format_devices(page):
+                yield item
+
+    def iter_sites(self, page_size=None):
+        """GET sites from Netbox, one page at a time.
+
+        Arguments:
+            page_size (int, optional): The number of sites per page.
+                Default is the `page_size` of the instance.
+
+        Yields:
+            The JSON data for each requested site, cleaned by the
+            `format_sites` method, as soon as its page has arrived.
+        """
+        sites = self.daemon_call('get_sites')
+        if sites is not None:
+            for item in sites:
+                yield item
+            return
+
+        for page in self.iter_pages(self.sites_url(page_size)):
+            for item in self.format_sites(page):
+                yield item
 
     def get_devices(self, site_slug=None, q=None):
         """GET devices from Netbox.
@@ -56,18 +497,10 @@ class NetboxAPI(object):
 
         Notes:
             The JSON data returned in this function has been cleaned by the
-            `format_devices` method.
+            `format_devices` method. Search results (`q`) are never cached.
         """
-        devices_url = 'dcim/devices/?limit=0&has_primary_ip=True'
-        if site_slug:
-            get_url = self.base_url + devices_url + '&site=' + site_slug
-        elif q:
-            get_url = self.base_url + devices_url + '&q=' + q
-        else:
-            get_url = self.base_url + devices_url
-
-        response = self.api_call(get_url)
-        return self.format_devices(response['results'])
+        with timings.span('get_devices', site_slug=site_slug, q=q):
+            return list(self.iter_devices(site_slug=site_slug, q=q))
 
     def get_sites(self):
         """GET sites from Netbox.
@@ -79,12 +512,160 @@ class NetboxAPI(object):
             The JSON data returned in this function has been cleaned by the
             `format_sites` method.
         """
-        sites_url = 'dcim/sites/?limit=0'
-        get_url = self.base_url + sites_url
+        with timings.span('get_sites'):
+            return list(self.iter_sites())
+
+    def sync_devices(self):
+        """GET devices from Netbox, using an incrementally synced inventory.
 
-        response = self.api_call(get_url)
+        The formatted device inventory is kept in the on-disk cache along with
+        the newest `last_updated` time seen (the high-water mark). When the
+        inventory goes stale, only the devices changed since the high-water
+        mark are requested and merged into it. Every `reconcile_interval`
+        seconds, the full inventory is downloaded again to drop any devices
+        that have been deleted.
 
-        return self.format_sites(response['results'])
+        Returns:
+            The JSON data for all devices with a primary IP address, as
+            returned by `get_devices`.
+
+        Raises:
+            NetboxError: The inventory isn't cached and Netbox could not be
+                reached.
+
+        Notes:
+            If the on-disk cache is disabled, or the shared inventory daemon
+            is in use, this is the same as `get_devices`. If streaming is also
+            enabled, the devices are returned by `iter_devices` instead, and
+            are requested as they are iterated over.
+        """
+        if self.cache is None or self.daemon is not None:
+            if self.stream:
+                return self.iter_devices()
+            return self.get_devices()
+
+        with timings.span('sync_devices'):
+            key = self.devices_url(page_size=0) + '#inventory'
+            state = self.cache.get(key, lambda: self._sync_state(key))
+        if not isinstance(state, dict):
+            raise NetboxError(state)
+        return state['devices']
+
+    def _sync_state(self, key):
+        """Build the next state of the synced device inventory.
+
+        Arguments:
+            key (str): The cache key the inventory is stored under.
+
+        Returns:
+            dict: The `devices`, the `high_water` mark and the time the
+            inventory was last `reconciled`, or the error string of the
+            request that failed if Netbox could not be reached. The error
+            string isn't cached, and is raised as a `NetboxError` by
+            `sync_devices`.
+        """
+        state, age = self.cache.read(key)
+        now = time.time()
+        try:
+            if (not isinstance(state, dict) or 'devices' not in state or
+                    now - state.get('reconciled', 0) > self.reconcile_interval):
+                devices = list()
+                for page in self.iter_pages(self.devices_url(), use_cache=False):
+                    devices.extend(self.format_devices(page))
+                state = {'devices': devices, 'reconciled': now}
+            else:
+                state['devices'] = self.merge_devices(
+                    state['devices'],
+                    self._changed_devices(state.get('high_water')))
+        except NetboxError as err:
+            return str(err)
+
+        state['high_water'] = max(
+            [item.get('last_updated') or '' for item in state['devices']] +
+            [state.get('high_water') or ''])
+        return state
+
+    def _changed_devices(self, high_water):
+        """GET every device changed since `high_water`.
+
+        Arguments:
+            high_water (str): The newest `last_updated` time already synced.
+
+        Returns:
+            list: The raw JSON data for the changed devices, including devices
+            that no longer have a primary IP address.
+        """
+        get_url = self.base_url + 'dcim/devices/?limit=%d' % self.page_size
+        get_url += self.fields_query(DEVICE_FIELDS)
+        if high_water:
+            get_url += '&last_updated__gte=' + urllib.quote(high_water)
+
+        changed = list()
+        for page in self.iter_pages(get_url, use_cache=False):
+            changed.extend(page)
+        return changed
+
+    def merge_devices(self, devices, changed):
+        """Merge changed devices into the device inventory.
+
+        Arguments:
+            devices: The formatted device data in the inventory.
+            changed: The raw JSON data for the changed devices.
+
+        Returns:
+            list: The merged device data. Updated devices keep their place,
+            new devices are added to the end and devices that no longer have a
+            primary IP address are removed.
+        """
+        merged = OrderedDict((item['id'], item) for item in devices)
+        for item in changed:
+            if item.get('primary_ip'):
+                merged[item['id']] = self.format_device(item)
+            else:
+                merged.pop(item['id'], None)
+
+        return list(merged.values())
+
+    def get_inventory(self):
+        """GET sites and devices from Netbox at the same time.
+
+        The sites are requested through the worker pool while the devices are
+        requested by the caller, so neither waits on the other.
+
+        Returns:
+            tuple: The sites, as returned by `get_sites`, and the devices, as
+            returned by `sync_devices`.
+        """
+        if self.max_workers <= 1:
+            return self.get_sites(), self.sync_devices()
+
+        sites = self.pool.apply_async(self.get_sites)
+        devices = self.sync_devices()
+        return sites.get(), devices
+
+    def format_device(self, item):
+        """Format the data for a single device returned from Netbox.
+
+        This can be used on each device as it arrives, such as when responses
+        are streamed.
+
+        Arguments:
+            item (dict): The JSON data for a device.
+
+        Returns:
+            dict: The device data after the ```primary_ip``` has been cleaned
+            of CIDR notation and the device hostname member number has been
+            removed. Fields not in `DEVICE_FIELDS` are dropped, unless field
+            selection is disabled.
+        """
+        item = self.trim_fields(item, DEVICE_FIELDS)
+
+        # The JSON response also includes a ```primary_ip4``` field, which is
+        # left as-is when field selection is disabled.
+        primary_ip = item['primary_ip']
+        primary_ip['address'] = clean_address(primary_ip['address'])
+        item['display_name'] = clean_hostname(item['display_name'])
+        return item
 
     def format_devices(self, data):
         """Format the device data returned from Netbox.
@@ -93,25 +674,11 @@ class NetboxAPI(object):
             data: The JSON data returned by the API call to Netbox.
 
         Returns:
-            The JSON `data` after the ```primary_ip``` has been cleaned of CIDR
-            notation and the device hostname member number has been removed.
+            list: Each device in `data`, formatted by `format_device`.
         """
-        # This section removes the CIDR notation from the ```primary_ip``` field
-        # of the JSON data. The JSON response also includes a ```primary_ip4`
-        # field, which is left as-is.
-        for index, item in enumerate(data):
-            if re.search('[/]\d+$', item['primary_ip']['address']):
-                item['primary_ip']['address'] = re.sub(
-                    '[/]\d+$', '', item['primary_ip']['address'])
-
-        # This section removes the device member number from the
-        # ```display_name``` field of the JSON data. This is the field that
-        # contains the hostname of the device.
-        for index, item in enumerate(data):
-            if re.search('-\d$', item['display_name']):
-                item['display_name'] = re.sub('-\d$', '', item['display_name'])
-
-        return data
+        with timings.span('format_devices', records=len(data)):
+            format_device = self.format_device
+            return [format_device(item) for item in data]
 
     def format_sites(self, data):
         """Format the sites data returned from Netbox.
@@ -123,10 +690,9 @@ class NetboxAPI(object):
 
         Returns:
             The list of sites with one or more devices, with a primary IP
-            address, assigned.
+            address, assigned. Fields not in `SITE_FIELDS` are dropped, unless
+            field selection is disabled.
         """
-        for index, item in enumerate(data):
-            if item['count_devices'] <= 0:
-                data.pop(index)
-
-        return data
+        with timings.span('format_sites', records=len(data)):
+            return [self.trim_fields(item, SITE_FIELDS) for item in data
+                    if item['count_devices'] > 0]
@@ -1,11 +1,21 @@
 import curses
-import subprocess
 
+from device_store import DeviceRecord
+from external_item import FanOutItem
+from jumpbox import Jumpbox
 from jumpbox import MenuItem
 from jumpbox import clear_terminal
 from netbox_api import NetboxAPI
+from netbox_api import NetboxError
+from reachability import DOWN
+from reachability import UNKNOWN
+from reachability import UP
+from reachability import prober
+from ssh_launcher import launcher
 from submenu_item import SubmenuItem
 
+REACHABILITY_MARKS = {UP: '[ up ]', DOWN: '[down]', UNKNOWN: '[ ?? ]'}
+
 
 class NetboxItem(MenuItem):
     """A base class for menu options populated via Netbox.
@@ -32,27 +42,121 @@ class NetboxItem(MenuItem):
 
                 1 - Option 1: ID 1
                 2 - Option 2: ID 2
+
+            Options with a `reachability` are marked with it::
+
+                1 - [ up ] Option 1: ID 1
+                2 - [down] Option 2: ID 2
+                3 - [ ?? ] Option 3: ID 3
+        """
+        status = self.reachability()
+        if status is None:
+            return "%d - %s: %s" % (index + 1, self.text, self.text_id)
+        return "%d - %s %s: %s" % (index + 1, REACHABILITY_MARKS[status],
+                                   self.text, self.text_id)
+
+    def reachability(self):
+        """Whether the option can be connected to.
+
+        Returns:
+            str or None: `UP`, `DOWN` or `UNKNOWN`, or None if the option
+            isn't a device or devices aren't being probed.
         """
-        return "%d - %s: %s" % (index + 1, self.text, self.text_id)
+        return None
+
+    def match_text(self):
+        """The text a menu filter is matched against.
+
+        Returns:
+            str: The text and its ID, such as a hostname and IP address.
+        """
+        return "%s %s" % (self.text, self.text_id)
 
 
 class DeviceItem(NetboxItem):
     """A menu option that is a network device.
 
     These options establish an SSH session to the option (device) that is
-    selected from the menu.
+    selected from the menu. The hostname and IP address are read from the
+    device's `DeviceRecord`, which is shared by every menu the device is
+    listed in.
 
     Arguments:
-        text (str): The text to be displayed as the menu option.
-        text_id (str): The unique ID string associated with the `text`.
+        text (str, optional): The text to be displayed as the menu option.
+            Not needed if a `record` is given.
+        text_id (str, optional): The unique ID string associated with the
+            `text`. Not needed if a `record` is given.
         menu: The menu the option belongs to.
         should_exit (bool, optional): True if the menu should exit,
             False otherwise.
+        record (:obj:`DeviceRecord`, optional): The device's record from the
+            device store.
+        port (int, optional): The SSH port of the device. Default is the
+            `ssh` default.
+        ssh_options (list, optional): Extra `ssh` options for sessions to the
+            device, such as `['-o', 'KexAlgorithms=+diffie-hellman-group1-sha1']`.
+
+    Devices can be marked, to run a command on several at once with a
+    `FanOutItem`.
+
+    There is an option for every device in every menu it is listed in, so
+    attributes that are usually unset are class defaults, only stored on an
+    option once they are given or its session has run.
     """
 
-    def __init__(self, text, text_id, menu=None, should_exit=False):
+    markable = True
+    port = None
+    ssh_options = None
+    exit_status = None
+    connect_latency = None
+
+    def __init__(self, text=None, text_id=None, menu=None, should_exit=False,
+                 record=None, port=None, ssh_options=None):
+        if record is None:
+            record = DeviceRecord(None, text, text_id)
+        self.record = record
+        if port is not None:
+            self.port = port
+        if ssh_options is not None:
+            self.ssh_options = ssh_options
+
         super(DeviceItem, self).__init__(
-            text=text, text_id=text_id, menu=menu, should_exit=should_exit)
+            text=record.name, text_id=record.address, menu=menu,
+            should_exit=should_exit)
+
+    @property
+    def text(self):
+        """The hostname of the device."""
+        return self.record.name
+
+    @text.setter
+    def text(self, value):
+        self.record.name = value
+
+    @property
+    def text_id(self):
+        """The IP address of the device."""
+        return self.record.address
+
+    @text_id.setter
+    def text_id(self, value):
+        self.record.address = value
+
+    @property
+    def probe_target(self):
+        """The `(host, port)` probed to check the device is reachable."""
+        return (self.text_id, self.port)
+
+    def reachability(self):
+        """Whether the device accepted a connection when it was last probed.
+
+        Returns:
+            str or None: `UP`, `DOWN` or `UNKNOWN`, or None if devices aren't
+            being probed.
+        """
+        if prober is None:
+            return None
+        return prober.status(*self.probe_target)
 
     def set_up(self):
         """Setup to be performed before the action.
@@ -66,20 +170,14 @@ class DeviceItem(NetboxItem):
     def action(self):
         """Action to be performed when the option is selected.
 
-        Estbalish an SSH session to the selected device.
-
-        Raises:
-            AttributeError: Call `commandline` via subprocess.
+        Estbalish an SSH session to the selected device, sharing a master
+        connection if SSH multiplexing is enabled.
         """
         username = raw_input("Username: ")
-        ssh = "ssh"
-        commandline = "{0} {1} {2} {3}".format(ssh, "-l", "".join(username),
-                                               "".join(self.text_id))
-        try:
-            completed_process = subprocess.run(commandline, shell=True)
-            self.exit_status = completed_process.returncode
-        except AttributeError:
-            self.exit_status = subprocess.call(commandline, shell=True)
+        session = launcher.connect(self.text_id, username, port=self.port,
+                                   options=self.ssh_options)
+        self.exit_status = session['exit_status']
+        self.connect_latency = session['connect_latency']
 
     def clean_up(self):
         """Cleanup to be performed after the action.
@@ -96,24 +194,35 @@ class DeviceItem(NetboxItem):
 class SitesItem(NetboxItem):
     """A menu option that is a site.
 
-    Sites menu options open a submenu upon selection.
+    Sites menu options open a submenu upon selection. When a `loader` is
+    given, the submenu is only populated the first time the option is
+    selected, then kept for the rest of the session. A submenu created by
+    the option runs a `FanOutItem` with Ctrl-R, to run a command on the
+    devices marked in it.
 
     Arguments:
         text (str): The text to be displayed as the menu option.
         text_id (str): The unique ID string associated with the `text`.
-        submenu: The submenu to be called when the option is selected.
+        submenu (optional): The submenu to be called when the option is
+            selected. If None, it is created when the option is first
+            selected.
         menu: The menu the option belongs to.
         should_exit (bool, optional): True if the menu should exit,
             False otherwise.
+        loader (optional): A callable that returns the `DeviceRecord` for
+            each device at the site. Default is None, in which case the
+            submenu is used as-is.
     """
 
-    def __init__(self, text, text_id, submenu, menu=None, should_exit=False):
+    def __init__(self, text, text_id, submenu=None, menu=None,
+                 should_exit=False, loader=None):
         super(SitesItem, self).__init__(
             text=text, text_id=text_id, menu=menu, should_exit=should_exit)
 
         self.text_id = text_id
         self.submenu = submenu
-        if menu:
+        self.loader = loader
+        if menu and self.submenu:
             self.submenu.parent = menu
 
     def set_menu(self, menu):
@@ -123,7 +232,26 @@ class SitesItem(NetboxItem):
             menu: The menu the option belongs to.
         """
         self.menu = menu
-        self.submenu.parent = menu
+        if self.submenu:
+            self.submenu.parent = menu
+
+    def load_submenu(self):
+        """Populate the submenu with the devices for the site.
+
+        This only does any work the first time it is called. The loader is
+        released afterwards, so the submenu is the only copy that is kept.
+        """
+        if self.submenu is None:
+            self.submenu = Jumpbox(self.text, "Select a device...")
+            self.submenu.parent = self.menu
+            self.submenu.set_marked_action(FanOutItem())
+
+        if self.loader is None:
+            return
+
+        for index, record in enumerate(self.loader()):
+            self.submenu.append_item(DeviceItem(record=record))
+        self.loader = None
 
     def set_up(self):
         """Setup to be performed before the action.
@@ -136,8 +264,10 @@ class SitesItem(NetboxItem):
     def action(self):
         """Action to be performed when the option is selected.
 
-        Start the submenu and display it on the screen.
+        Populate the submenu, if it hasn't been already, then start it and
+        display it on the screen.
         """
+        self.load_submenu()
         self.submenu.start()
 
     def clean_up(self):
@@ -157,16 +287,34 @@ class SitesItem(NetboxItem):
         Returns:
             :obj:`item`
         """
+        if self.submenu is None:
+            return None
         return self.submenu.returned_value
 
 
 class SearchItem(SubmenuItem):
     """A class to search devices.
 
-    Search strings will only match on device hostnames.
+    When a search index is given, searches are answered from the device
+    inventory that is already loaded and match on device hostnames and
+    primary IP addresses. Otherwise, or while the inventory is still being
+    loaded, Netbox is searched, which will only match on device hostnames.
+
+    Arguments:
+        text (str): The text to be displayed as the menu option.
+        submenu: The submenu the search results are displayed in.
+        menu: The menu the option belongs to.
+        should_exit (bool, optional): True if the menu should exit,
+            False otherwise.
+        index (:obj:`SearchIndex`, optional): The local search index. Default
+            is None, which searches Netbox instead.
+        api (:obj:`NetboxAPI`, optional): The API Netbox is searched with,
+            which is reused for every search so its connections are kept
+            alive. Default is a new `NetboxAPI`, created by the first search.
     """
 
-    def __init__(self, text, submenu=None, menu=None, should_exit=False):
+    def __init__(self, text, submenu=None, menu=None, should_exit=False,
+                 index=None, api=None):
         super(SearchItem, self).__init__(
             text=text, submenu=submenu, menu=menu, should_exit=should_exit)
 
@@ -175,6 +323,25 @@ class SearchItem(SubmenuItem):
             self.submenu.parent = self.menu
 
         self.search_str = None
+        self.index = index
+        self.api = api
+
+    def search(self, search_str):
+        """Search for devices matching `search_str`.
+
+        Arguments:
+            search_str (str): A full or partial string to search for.
+
+        Returns:
+            The `DeviceRecord` for each matching device.
+        """
+        if self.index is not None and self.index.complete:
+            return self.index.search(search_str)
+
+        if self.api is None:
+            self.api = NetboxAPI()
+        return (DeviceRecord.from_device(item)
+                for item in self.api.iter_devices(q=search_str))
 
     def set_menu(self, menu):
         """Set the menu the option belongs to.
@@ -203,14 +370,17 @@ class SearchItem(SubmenuItem):
         self.search_str = raw_input("Search: ")
         self.submenu.reset_menu()
 
-        api = NetboxAPI()
-        get_devices = api.get_devices(q=self.search_str)
-        if len(get_devices) > 0:
-            for index, item in enumerate(get_devices):
-                text = item['display_name']
-                text_id = item['primary_ip']['address']
-                self.submenu.append_item(DeviceItem(text, text_id))
+        try:
+            records = list(self.search(self.search_str))
+        except NetboxError as err:
+            raw_input("Unable to search Netbox: %s\n"
+                      "Press enter to continue..." % err)
+            return
+
+        for index, record in enumerate(records):
+            self.submenu.append_item(DeviceItem(record=record))
 
+        if len(self.submenu.items) > 0:
             clear_terminal()
             self.menu.clear_screen()
             curses.reset_prog_mode()
@@ -0,0 +1,229 @@
+import errno
+import os
+import select
+import socket
+import time
+
+from timing import timings
+
+MAX_PROBES = 32
+PROBE_PORT = 22
+PROBE_TIMEOUT = 1.0
+PROBE_TTL = 60
+
+UP = 'up'
+DOWN = 'down'
+UNKNOWN = 'unknown'
+
+
+class Probe(object):
+    """A single non-blocking TCP connect to a device's SSH port.
+
+    The connect is driven by `ReachabilityProber.poll`, which checks the
+    result once the socket is writable.
+
+    Arguments:
+        host (str): The IP address of the device.
+        port (int): The port to connect to.
+    """
+
+    def __init__(self, host, port):
+        self.key = (host, port)
+        self.status = None
+        self.sock = None
+        self.started = time.time()
+        self.start = timings.clock()
+
+        try:
+            # Only numeric addresses are probed, so a slow DNS lookup can't
+            # hold up the menu.
+            address = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM,
+                                         0, socket.AI_NUMERICHOST)[0]
+        except (socket.error, TypeError):
+            self.status = UNKNOWN
+            return
+        try:
+            self.sock = socket.socket(address[0], address[1], address[2])
+            self.sock.setblocking(0)
+            result = self.sock.connect_ex(address[4])
+        except socket.error:
+            self.finish(UNKNOWN)
+            return
+        if result == 0:
+            self.finish(UP)
+        elif result not in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+            self.finish(DOWN)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def check(self):
+        """Finish the probe once its socket is ready."""
+        error = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        self.finish(DOWN if error else UP)
+
+    def finish(self, status):
+        """Close the socket and record the result.
+
+        Arguments:
+            status (str): `UP`, `DOWN` or `UNKNOWN`.
+        """
+        self.status = status
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class ReachabilityProber(object):
+    """Check which devices are accepting SSH connections.
+
+    Devices are probed with a TCP connect to their SSH port. Probes run over
+    non-blocking sockets driven by `poll`, with no more than `max_probes` in
+    flight at once, so checking a screen full of devices takes about as long
+    as checking one. Each result is kept for `ttl` seconds before the device
+    is probed again.
+
+    Arguments:
+        timeout (float, optional): The number of seconds a device has to
+            accept a connection before it is marked down. Default is 1.
+        ttl (int, optional): The number of seconds a result is kept before
+            the device is probed again. Default is 60.
+        max_probes (int, optional): The number of probes in flight at once.
+            Default is 32.
+
+    Notes:
+        A device that refuses the connection is marked down, since an SSH
+        session to it would fail the same way.
+    """
+
+    def __init__(self, timeout=PROBE_TIMEOUT, ttl=PROBE_TTL,
+                 max_probes=MAX_PROBES):
+        self.timeout = timeout
+        self.ttl = ttl
+        self.max_probes = max_probes
+        self.results = dict()
+
+        self._probes = dict()
+        self._queue = list()
+
+    @classmethod
+    def from_environ(cls, environ=None):
+        """Configure probing from the environment.
+
+        `JUMPBOX_PROBE=1` enables probing, `JUMPBOX_PROBE_TIMEOUT` sets the
+        number of seconds to wait for each device and `JUMPBOX_PROBE_TTL` sets
+        the number of seconds each result is kept.
+
+        Arguments:
+            environ (dict, optional): The environment. Default is
+                `os.environ`.
+
+        Returns:
+            ReachabilityProber or None: None if probing isn't enabled.
+        """
+        if environ is None:
+            environ = os.environ
+        if environ.get('JUMPBOX_PROBE', '') in ('', '0'):
+            return None
+        try:
+            timeout = float(environ.get('JUMPBOX_PROBE_TIMEOUT',
+                                        PROBE_TIMEOUT))
+        except ValueError:
+            timeout = PROBE_TIMEOUT
+        try:
+            ttl = int(environ.get('JUMPBOX_PROBE_TTL', PROBE_TTL))
+        except ValueError:
+            ttl = PROBE_TTL
+        return cls(timeout=timeout, ttl=ttl)
+
+    @property
+    def pending(self):
+        """True if any probes are queued or in flight."""
+        return bool(self._queue or self._probes)
+
+    def status(self, host, port=None):
+        """The last known status of a device.
+
+        Arguments:
+            host (str): The IP address of the device.
+            port (int, optional): The SSH port of the device. Default is 22.
+
+        Returns:
+            str: `UP`, `DOWN`, or `UNKNOWN` if it hasn't been probed yet.
+        """
+        result = self.results.get((host, port or PROBE_PORT))
+        if result is None:
+            return UNKNOWN
+        return result[0]
+
+    def watch(self, targets):
+        """Set the devices that should be probed next.
+
+        Any device that was queued but isn't in `targets` is dropped from the
+        queue, so only the devices the user can see are probed.
+
+        Arguments:
+            targets: The `(host, port)` of each device, where a port of None
+                is port 22.
+        """
+        now = time.time()
+        in_flight = set(probe.key for probe in self._probes.values())
+        queue = list()
+        queued = set()
+        for host, port in targets:
+            key = (host, port or PROBE_PORT)
+            if key in in_flight or key in queued:
+                continue
+            result = self.results.get(key)
+            if result is None or now - result[1] >= self.ttl:
+                queue.append(key)
+                queued.add(key)
+        self._queue = queue
+
+    def _finish(self, probe):
+        """Record the result of a finished probe.
+
+        Returns:
+            bool: True if the device's status changed.
+        """
+        previous = self.status(*probe.key)
+        self.results[probe.key] = (probe.status, time.time())
+        timings.record('probe', probe.start, host=probe.key[0],
+                       port=probe.key[1], status=probe.status)
+        return probe.status != previous
+
+    def poll(self):
+        """Start queued probes and collect any results, without waiting.
+
+        Returns:
+            bool: True if the status of any device changed.
+        """
+        changed = False
+        while self._queue and len(self._probes) < self.max_probes:
+            probe = Probe(*self._queue.pop(0))
+            if probe.status is None:
+                self._probes[probe.fileno()] = probe
+            elif self._finish(probe):
+                changed = True
+
+        if not self._probes:
+            return changed
+
+        sockets = list(self._probes)
+        _, writable, failed = select.select([], sockets, sockets, 0)
+        now = time.time()
+        for fileno in set(writable + failed):
+            probe = self._probes.pop(fileno)
+            probe.check()
+            if self._finish(probe):
+                changed = True
+        for fileno, probe in list(self._probes.items()):
+            if now - probe.started >= self.timeout:
+                del self._probes[fileno]
+                probe.finish(DOWN)
+                if self._finish(probe):
+                    changed = True
+        return changed
+
+
+prober = ReachabilityProber.from_environ()
@@ -0,0 +1,130 @@
+from collections import defaultdict
+from itertools import islice
+
+
+def trigrams(text):
+    """Return the set of three character substrings in `text`.
+
+    Arguments:
+        text (str): The text to be split.
+
+    Returns:
+        set: The trigrams in `text`.
+    """
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+class SearchIndex(object):
+    """An in-memory search index over the device inventory.
+
+    Devices are indexed by the trigrams of their hostname and primary IP
+    address, so a search only has to check the devices that contain every
+    trigram of the search string, instead of asking Netbox.
+
+    Arguments:
+        devices (optional): The `DeviceRecord` for each device to be indexed,
+            such as a `DeviceStore`. Records the store updates in place are
+            re-indexed.
+        complete (bool, optional): False while `devices` is still being
+            loaded, in which case searches should be sent to Netbox instead.
+            Default is True.
+
+    Notes:
+        Searches are case insensitive and match any part of the hostname
+        or primary IP address. The `devices` are only indexed when a search is
+        made, so building the menu isn't held up by it. Any devices added to
+        the end of `devices` since the last search are indexed at that time.
+    """
+
+    def __init__(self, devices=None, complete=True):
+        self.devices = list()
+        self.complete = complete
+        self._keys = list()
+        self._positions = dict()
+        self._trigrams = defaultdict(set)
+        self._source = devices
+        self._indexed = 0
+
+        if devices is not None and hasattr(devices, 'update_handlers'):
+            devices.update_handlers.append(self.update)
+
+    def __len__(self):
+        self._build()
+        return len(self.devices)
+
+    def _build(self):
+        """Index any devices from the source not already in the index."""
+        if self._source is None or len(self._source) <= self._indexed:
+            return
+        pending = list(islice(iter(self._source), self._indexed, None))
+        self._indexed += len(pending)
+        for item in pending:
+            self.add(item)
+
+    def add(self, device):
+        """Add a device to the index.
+
+        Arguments:
+            device (:obj:`DeviceRecord`): The record for a single device.
+        """
+        key = self._key(device)
+        position = len(self.devices)
+        self.devices.append(device)
+        self._keys.append(key)
+        self._positions[device] = position
+        for trigram in trigrams(key):
+            self._trigrams[trigram].add(position)
+
+    def update(self, device):
+        """Re-index a device whose hostname or address has changed.
+
+        Devices that haven't been indexed yet are left alone, since they are
+        indexed with their new values when the next search is made.
+
+        Arguments:
+            device (:obj:`DeviceRecord`): The record that changed.
+        """
+        position = self._positions.get(device)
+        if position is None:
+            return
+        for trigram in trigrams(self._keys[position]):
+            self._trigrams[trigram].discard(position)
+        key = self._key(device)
+        self._keys[position] = key
+        for trigram in trigrams(key):
+            self._trigrams[trigram].add(position)
+
+    def _key(self, device):
+        """Build the text a device is searched by."""
+        # The newline keeps trigrams from spanning the hostname and address,
+        # and never appears in a search string.
+        return "%s\n%s" % (device.name.lower(), device.address)
+
+    def search(self, query):
+        """Search the index for devices matching `query`.
+
+        Arguments:
+            query (str): A full or partial hostname or IP address.
+
+        Returns:
+            list: The records for the matching devices, in the order they
+            were added.
+        """
+        self._build()
+        query = query.strip().lower()
+        if not query:
+            return list(self.devices)
+
+        if len(query) < 3:
+            candidates = xrange(len(self.devices))
+        else:
+            postings = list()
+            for trigram in trigrams(query):
+                if trigram not in self._trigrams:
+                    return list()
+                postings.append(self._trigrams[trigram])
+            postings.sort(key=len)
+            candidates = sorted(set.intersection(*postings))
+
+        return [self.devices[position] for position in candidates
+                if query in self._keys[position]]
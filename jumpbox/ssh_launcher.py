@@ -0,0 +1,204 @@
+import io
+import os
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from ssh_mux import multiplexer
+from ssh_mux import ssh_options
+from timing import timings
+
+LOG_DIR = os.path.expanduser('~/.cache/jumpbox/ssh')
+SSH_COMMAND = 'ssh'
+WATCH_INTERVAL = 0.05
+
+# Lines `ssh -v` logs once the session is ready: a new connection has
+# authenticated, or a shared master connection has accepted the session.
+CONNECTED = re.compile(r'Authenticated to |Authentication succeeded|'
+                       r'master session id')
+# Lines only logged because of `ssh -v`, which are not shown to the user.
+VERBOSE = re.compile(r'debug\d: |OpenSSH_|Transferred: |Bytes per second')
+
+
+class SSHLauncher(object):
+    """Start SSH sessions without a shell in between.
+
+    `ssh` is started directly from a list of arguments, so the username and
+    host are passed to it exactly as they were typed. Each session is timed
+    and its exit status is recorded in `history` and as an `ssh.session`
+    timing span.
+
+    Arguments:
+        ssh (str, optional): The `ssh` program. Default is `ssh`.
+        options (list, optional): Extra options passed to every session,
+            such as `['-o', 'ConnectTimeout=5']`. Default is None.
+        measure (bool, optional): True to measure how long each session takes
+            to connect, by having `ssh -v` log to a private file that is
+            watched until the session ends. Messages that `ssh` would normally
+            show, such as errors, are passed on from the file as they appear,
+            which can be a moment after `ssh` shows its next prompt. This
+            needs OpenSSH 6.7 or later, for `-E`. Sessions aren't measured
+            while SSH multiplexing is enabled, since a master connection
+            started by the session would keep logging after it ends. Default
+            is False, which leaves the `ssh` output untouched.
+        log_dir (str, optional): The private directory for those logs.
+            Default is `~/.cache/jumpbox/ssh`.
+    """
+
+    def __init__(self, ssh=SSH_COMMAND, options=None, measure=False,
+                 log_dir=LOG_DIR):
+        self.ssh = ssh
+        self.options = list(options or list())
+        self.measure = measure
+        self.log_dir = log_dir
+        self.history = list()
+
+    @classmethod
+    def from_environ(cls, environ=None):
+        """Configure the launcher from the environment.
+
+        `JUMPBOX_SSH_OPTIONS` holds extra options for every session, split as
+        a shell would split them, such as `-o ConnectTimeout=5 -A`.
+        `JUMPBOX_SSH_MEASURE=1` measures how long each session takes to
+        connect, for the timing report.
+
+        Arguments:
+            environ (dict, optional): The environment. Default is
+                `os.environ`.
+
+        Returns:
+            SSHLauncher
+        """
+        if environ is None:
+            environ = os.environ
+        return cls(
+            options=shlex.split(environ.get('JUMPBOX_SSH_OPTIONS', '')),
+            measure=environ.get('JUMPBOX_SSH_MEASURE', '') not in ('', '0'))
+
+    def argv(self, host, username=None, port=None, options=None,
+             master=True):
+        """Build the arguments for an SSH session.
+
+        Arguments:
+            host (str): The hostname or IP address of the device.
+            username (str, optional): The username to log in with. Default is
+                the `ssh` default.
+            port (int, optional): The SSH port of the device. Default is the
+                `ssh` default.
+            options (list, optional): Extra options for this session only.
+            master (bool, optional): True if the session may start a shared
+                master connection when SSH multiplexing is enabled. Default
+                is True.
+
+        Returns:
+            list
+        """
+        argv = ([self.ssh] + ssh_options(master) + self.options +
+                list(options or []))
+        if port:
+            argv += ['-p', str(port)]
+        if username:
+            argv += ['-l', username]
+        # `--` stops a host starting with `-` being read as an option.
+        return argv + ['--', host]
+
+    def _log_file(self):
+        """Create a private file for `ssh` to log to.
+
+        Returns:
+            str: The path of the file, or None if it couldn't be created.
+        """
+        try:
+            if not os.path.isdir(self.log_dir):
+                os.makedirs(self.log_dir, 0o700)
+            handle, path = tempfile.mkstemp(prefix='session-', suffix='.log',
+                                            dir=self.log_dir)
+        except OSError:
+            return None
+        os.close(handle)
+        return path
+
+    def _watch(self, path, started, finished, result):
+        """Follow the log of a session until `ssh` exits.
+
+        The time the session is ready is recorded, and any message `ssh`
+        would have shown without `-v` is written to stderr.
+
+        Arguments:
+            path (str): The log file `ssh` writes to.
+            started (float): When `ssh` was started.
+            finished (:obj:`threading.Event`): Set when `ssh` exits.
+            result (dict): The session record to add `connect_latency` to.
+        """
+        with io.open(path, 'rb') as log:
+            pending = ''
+            while True:
+                done = finished.wait(WATCH_INTERVAL)
+                lines = (pending + log.read()).split('\n')
+                pending = '' if done else lines.pop()
+                for line in lines:
+                    if CONNECTED.search(line):
+                        if result['connect_latency'] is None:
+                            result['connect_latency'] = time.time() - started
+                    elif line and not VERBOSE.match(line):
+                        sys.stderr.write(line + '\n')
+                sys.stderr.flush()
+                if done:
+                    return
+
+    def connect(self, host, username=None, port=None, options=None):
+        """Start an SSH session and wait for it to finish.
+
+        Arguments:
+            host (str): The hostname or IP address of the device.
+            username (str, optional): The username to log in with.
+            port (int, optional): The SSH port of the device.
+            options (list, optional): Extra options for this session only.
+
+        Returns:
+            dict: The `host`, `username` and `port`, the `exit_status` of
+            `ssh`, the `duration` of the session and its `connect_latency`,
+            which is None if it wasn't measured or the session never
+            connected.
+        """
+        argv = self.argv(host, username, port, options)
+        log_path = None
+        if self.measure and multiplexer is None:
+            log_path = self._log_file()
+        if log_path:
+            argv[1:1] = ['-v', '-E', log_path]
+
+        result = {'host': host, 'username': username, 'port': port,
+                  'exit_status': None, 'connect_latency': None}
+        finished = threading.Event()
+        start = timings.clock()
+        started = time.time()
+        try:
+            if log_path:
+                watcher = threading.Thread(
+                    target=self._watch,
+                    args=(log_path, started, finished, result))
+                watcher.daemon = True
+                watcher.start()
+            try:
+                result['exit_status'] = subprocess.call(argv)
+            except OSError as err:
+                result['error'] = str(err)
+            finished.set()
+            if log_path:
+                watcher.join()
+        finally:
+            if log_path:
+                os.unlink(log_path)
+
+        result['duration'] = time.time() - started
+        timings.record('ssh.session', start, **result)
+        self.history.append(result)
+        return result
+
+
+launcher = SSHLauncher.from_environ()
@@ -0,0 +1,146 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
+CONTROL_PERSIST = 600
+SSH_COMMAND = 'ssh'
+
+
+class SSHMultiplexer(object):
+    """Share one SSH connection between sessions to the same device.
+
+    The first session to a device as a given user becomes the master
+    connection, which is left running in the background for `persist`
+    seconds after the last session closes. Later sessions to the same device
+    and user reuse it, skipping the TCP handshake, key exchange and
+    authentication.
+
+    Connections are only shared within a single run of the menu. Their
+    sockets are kept in a private directory created for the run, and `close`
+    stops every master connection and removes the directory when the menu
+    exits, so engineers sharing the `jumpbox` account never reuse each
+    other's connections.
+
+    Arguments:
+        persist (int, optional): The number of seconds an idle master
+            connection is kept open. Default is 600.
+        temp_dir (str, optional): The directory the private socket directory
+            is created in. Default is the system's temporary directory, which
+            keeps the socket paths short enough for OpenSSH.
+        ssh (str, optional): The `ssh` program used to stop the master
+            connections. Default is `ssh`.
+
+    Attributes:
+        control_dir (str): The private socket directory, or None until the
+            first session needs it.
+    """
+
+    def __init__(self, persist=CONTROL_PERSIST, temp_dir=None,
+                 ssh=SSH_COMMAND):
+        self.persist = persist
+        self.temp_dir = temp_dir
+        self.ssh = ssh
+        self.control_dir = None
+
+    @classmethod
+    def from_environ(cls, environ=None):
+        """Configure multiplexing from the environment.
+
+        `JUMPBOX_SSH_MUX=1` enables multiplexing, and `JUMPBOX_SSH_PERSIST`
+        sets the number of seconds an idle master connection is kept open.
+
+        Arguments:
+            environ (dict, optional): The environment. Default is
+                `os.environ`.
+
+        Returns:
+            SSHMultiplexer or None: None if multiplexing isn't enabled.
+        """
+        if environ is None:
+            environ = os.environ
+        if environ.get('JUMPBOX_SSH_MUX', '') in ('', '0'):
+            return None
+        try:
+            persist = int(environ.get('JUMPBOX_SSH_PERSIST', CONTROL_PERSIST))
+        except ValueError:
+            persist = CONTROL_PERSIST
+        return cls(persist=persist)
+
+    def prepare(self):
+        """Create the private socket directory for this run, if needed.
+
+        `tempfile.mkdtemp` creates it with mode 0700 under a name no other
+        process can predict.
+
+        Returns:
+            bool: True if the directory is ready, False if it couldn't be
+            created.
+        """
+        if self.control_dir is None:
+            try:
+                self.control_dir = tempfile.mkdtemp(prefix='jumpbox-ssh-',
+                                                    dir=self.temp_dir)
+            except (IOError, OSError):
+                return False
+        return True
+
+    def options(self, master=True):
+        """The `ssh` options that use a shared master connection.
+
+        The socket for each connection is named by OpenSSH's `%C` hash of the
+        local host, remote host, port and remote user.
+
+        Arguments:
+            master (bool, optional): True if the session may start a master
+                connection when there isn't one. False only reuses an open
+                master connection, for sessions such as fan-out that would
+                otherwise leave one behind for every device. Default is True.
+
+        Returns:
+            list: The options, or an empty list if the socket directory isn't
+            usable.
+        """
+        if not self.prepare():
+            return list()
+        control_path = ['-o', 'ControlPath=' +
+                        os.path.join(self.control_dir, '%C')]
+        if not master:
+            return ['-o', 'ControlMaster=no'] + control_path
+        return (['-o', 'ControlMaster=auto'] + control_path +
+                ['-o', 'ControlPersist=%d' % self.persist])
+
+    def close(self):
+        """Stop every master connection and remove the socket directory."""
+        if self.control_dir is None:
+            return
+        control_dir, self.control_dir = self.control_dir, None
+        with open(os.devnull, 'wb') as devnull:
+            for name in os.listdir(control_dir):
+                # The host is ignored, since the socket is named in full.
+                try:
+                    subprocess.call(
+                        [self.ssh, '-o', 'ControlPath=' +
+                         os.path.join(control_dir, name), '-O', 'exit',
+                         'localhost'], stdout=devnull, stderr=devnull)
+                except OSError:
+                    pass
+        shutil.rmtree(control_dir, ignore_errors=True)
+
+
+multiplexer = SSHMultiplexer.from_environ()
+
+
+def ssh_options(master=True):
+    """The `ssh` options for the configured multiplexing mode.
+
+    Arguments:
+        master (bool, optional): True if the session may start a master
+            connection. Default is True.
+
+    Returns:
+        list: The options, which are empty if multiplexing isn't enabled.
+    """
+    if multiplexer is None:
+        return list()
+    return multiplexer.options(master)
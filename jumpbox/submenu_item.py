@@ -12,13 +12,18 @@ class SubmenuItem(MenuItem):
         menu: The menu the option belongs to.
         should_exit (bool, optional): True if the menu should exit,
             False otherwise.
+        loader (optional): A callable that fills in the submenu, which is
+            called the first time the option is selected and then released.
+            Default is None, in which case the submenu is used as-is.
     """
 
-    def __init__(self, text, submenu, menu=None, should_exit=False):
+    def __init__(self, text, submenu, menu=None, should_exit=False,
+                 loader=None):
         super(SubmenuItem, self).__init__(
             text=text, menu=menu, should_exit=should_exit)
 
         self.submenu = submenu
+        self.loader = loader
         if menu:
             self.submenu.parent = menu
 
@@ -42,8 +47,12 @@ class SubmenuItem(MenuItem):
     def action(self):
         """Action to be performed when the option is selected.
 
-        Start the submenu and display it on the screen.
+        Fill in the submenu, if it has a loader that hasn't run yet, then
+        start it and display it on the screen.
         """
+        if self.loader is not None:
+            self.loader()
+            self.loader = None
         self.submenu.start()
 
     def clean_up(self):
@@ -0,0 +1,207 @@
+import cProfile
+import json
+import os
+import threading
+import time
+import timeit
+
+LOG_DIR = os.path.expanduser('~/.cache/jumpbox/timing')
+
+
+class Span(object):
+    """Time a block of code and record it when the block exits.
+
+    Fields can be added while the block runs, such as the size of a response
+    that is only known once it has been read.
+
+    Arguments:
+        timings (:obj:`Timings`): Where the span is recorded.
+        name (str): The name of the span, such as `api_call`.
+        **fields: Anything else worth recording, such as the URL.
+    """
+
+    def __init__(self, timings, name, **fields):
+        self.timings = timings
+        self.name = name
+        self.fields = fields
+        self.start = None
+
+    def __enter__(self):
+        self.start = self.timings.clock()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.fields['error'] = exc_type.__name__
+        self.timings.record(self.name, self.start, **self.fields)
+        return False
+
+    def set(self, **fields):
+        """Add fields to the span."""
+        self.fields.update(fields)
+
+
+class NullSpan(object):
+    """A span that records nothing, used when timing is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Timings(object):
+    """Timing spans for a single Jumpbox session.
+
+    Spans are recorded from any thread. When the session ends, `write_report`
+    writes them to `<log_dir>/<time>-<pid>.json`, along with the total time
+    and count for each name, and the cProfile data to a `.prof` file next to
+    it if profiling is enabled.
+
+    Arguments:
+        enabled (bool, optional): True if spans should be recorded. Default
+            is False, which makes every span a no-op.
+        log_dir (str, optional): The directory reports are written to.
+            Default is `~/.cache/jumpbox/timing`.
+        profile (bool, optional): True to profile the main thread with
+            cProfile as well. Default is False.
+    """
+
+    def __init__(self, enabled=False, log_dir=LOG_DIR, profile=False):
+        self.enabled = enabled or profile
+        self.log_dir = log_dir
+        self.profile = profile
+        self.spans = list()
+
+        self._origin = timeit.default_timer()
+        self._started = time.time()
+        self._lock = threading.Lock()
+        self._profiler = None
+
+    @classmethod
+    def from_environ(cls, environ=None):
+        """Configure timing from the environment.
+
+        `JUMPBOX_TIMING=1` records spans, `JUMPBOX_PROFILE=1` records spans
+        and profiles the session, and `JUMPBOX_TIMING_DIR` sets the directory
+        reports are written to.
+
+        Arguments:
+            environ (dict, optional): The environment. Default is
+                `os.environ`.
+
+        Returns:
+            Timings
+        """
+        if environ is None:
+            environ = os.environ
+        return cls(
+            enabled=environ.get('JUMPBOX_TIMING', '') not in ('', '0'),
+            log_dir=environ.get('JUMPBOX_TIMING_DIR') or LOG_DIR,
+            profile=environ.get('JUMPBOX_PROFILE', '') not in ('', '0'))
+
+    def clock(self):
+        """Return the current time, in seconds, for timing a span."""
+        return timeit.default_timer()
+
+    def span(self, name, **fields):
+        """Time a block of code.
+
+        Arguments:
+            name (str): The name of the span.
+            **fields: Anything else worth recording with the span.
+
+        Returns:
+            Span: A context manager, which does nothing if timing is
+            disabled.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, **fields)
+
+    def record(self, name, start, **fields):
+        """Record a span that started at `start` and ends now.
+
+        Arguments:
+            name (str): The name of the span.
+            start (float): The start time, as returned by `clock`.
+            **fields: Anything else worth recording with the span.
+        """
+        if not self.enabled:
+            return
+        end = self.clock()
+        fields.update({
+            'name': name,
+            'start': start - self._origin,
+            'duration': end - start,
+            'thread': threading.current_thread().name,
+        })
+        with self._lock:
+            self.spans.append(fields)
+
+    def start(self):
+        """Start profiling, if it is enabled."""
+        if self.profile and self._profiler is None:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def summary(self):
+        """Total the recorded spans by name.
+
+        Returns:
+            dict: The `count` and `total` duration of the spans with each
+            name.
+        """
+        totals = dict()
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            total = totals.setdefault(span['name'], {'count': 0, 'total': 0.0})
+            total['count'] += 1
+            total['total'] += span['duration']
+        return totals
+
+    def write_report(self):
+        """Write the timing report, and the profile if there is one.
+
+        Returns:
+            str: The path of the report, or None if timing is disabled or the
+            report could not be written.
+        """
+        if not self.enabled:
+            return None
+        if self._profiler is not None:
+            self._profiler.disable()
+
+        name = '%s-%d' % (time.strftime('%Y%m%dT%H%M%S',
+                                        time.localtime(self._started)),
+                          os.getpid())
+        path = os.path.join(self.log_dir, name + '.json')
+        report = {
+            'started': self._started,
+            'pid': os.getpid(),
+            'duration': self.clock() - self._origin,
+            'summary': self.summary(),
+            'spans': sorted(self.spans, key=lambda span: span['start']),
+        }
+        try:
+            if not os.path.isdir(self.log_dir):
+                os.makedirs(self.log_dir, 0o700)
+            with open(path, 'w') as output:
+                json.dump(report, output, indent=2, sort_keys=True)
+            if self._profiler is not None:
+                self._profiler.dump_stats(os.path.join(self.log_dir,
+                                                       name + '.prof'))
+        except (IOError, OSError):
+            return None
+        return path
+
+
+timings = Timings.from_environ()
@@ -0,0 +1,116 @@
+import socket
+import threading
+import unittest
+
+from jumpbox.async_netbox import AsyncNetboxAPI
+
+
+class TimeoutTests(unittest.TestCase):
+
+    def setUp(self):
+        # A server that accepts connections but never answers them.
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.url = 'http://127.0.0.1:%d/api/dcim/sites/' % (
+            self.server.getsockname()[1])
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_stalled_request(self):
+        """
+        Fail a request that makes no progress within the timeout
+        """
+        client = AsyncNetboxAPI(timeout=0.2)
+        errors = list()
+        client.fetch_pages(self.url, lambda results: None, done=errors.append)
+        client.run()
+        self.assertEqual(errors, ["URL Error: timed out"])
+        self.assertFalse(client.pending)
+
+    def test_connection_refused(self):
+        """
+        Report a request that can't connect through `done`
+        """
+        self.server.close()
+        client = AsyncNetboxAPI(timeout=5)
+        errors = list()
+        client.fetch_pages(self.url, lambda results: None, done=errors.append)
+        client.run()
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith("URL Error"))
+
+
+class ResponseTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.url = 'http://127.0.0.1:%d/api/dcim/sites/' % (
+            self.server.getsockname()[1])
+
+    def tearDown(self):
+        self.server.close()
+
+    def fetch(self, response):
+        """Answer a single request with `response`, then close."""
+        def answer():
+            conn, _ = self.server.accept()
+            conn.recv(65536)
+            conn.sendall(response)
+            conn.close()
+        thread = threading.Thread(target=answer)
+        thread.daemon = True
+        thread.start()
+
+        responses = list()
+        client = AsyncNetboxAPI(timeout=5)
+        client.fetch(self.url, responses.append)
+        client.run()
+        thread.join()
+        return responses
+
+    def test_json(self):
+        """
+        Parse the JSON body of a successful response
+        """
+        self.assertEqual(self.fetch(
+            'HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n\r\n'
+            '{"count": 0}'), [{'count': 0}])
+
+    def test_malformed_status(self):
+        """
+        Fail a response with a malformed status line
+        """
+        for head in ('HTTP/1.0\r\n\r\n', 'HTTP/1.0 OK\r\n\r\n'):
+            responses = self.fetch(head + '{}')
+            self.assertEqual(len(responses), 1)
+            self.assertTrue(responses[0].startswith("URL Error"))
+
+    def test_malformed_body(self):
+        """
+        Fail a response whose body can't be decompressed or parsed
+        """
+        responses = self.fetch('HTTP/1.0 200 OK\r\n'
+                               'Content-Encoding: gzip\r\n\r\nnot gzip')
+        self.assertTrue(responses[0].startswith("URL Error"))
+        responses = self.fetch('HTTP/1.0 200 OK\r\n\r\n{"count"')
+        self.assertTrue(responses[0].startswith("URL Error"))
+
+    def test_truncated(self):
+        """
+        Fail a response that ends before its headers
+        """
+        self.assertEqual(self.fetch('HTTP/1.0 200 OK\r\n'),
+                         ["URL Error: incomplete response"])
+
+    def test_not_ok(self):
+        """
+        Return an `HTTP Error` for redirects and errors
+        """
+        for status in (301, 404, 500):
+            self.assertEqual(self.fetch(
+                'HTTP/1.0 %d X\r\nLocation: /\r\n\r\n{}' % status),
+                ["HTTP Error: %d" % status])
@@ -0,0 +1,112 @@
+import unittest
+
+from jumpbox.device_store import DeviceRecord
+from jumpbox.device_store import DeviceStore
+
+
+def device(device_id, name, address='10.0.0.1', site_slug='site-a'):
+    return {
+        'id': device_id,
+        'display_name': name,
+        'primary_ip': {'address': address},
+        'site': {'slug': site_slug},
+    }
+
+
+class DeviceRecordTests(unittest.TestCase):
+
+    def test_round_trip(self):
+        """
+        Convert a record to the format returned by `get_devices` and back
+        """
+        record = DeviceRecord.from_device(device(1, 'sw1'))
+        copy = DeviceRecord.from_device(record.to_device())
+        self.assertEqual((copy.id, copy.name, copy.address, copy.site_slug),
+                         (1, 'sw1', '10.0.0.1', 'site-a'))
+
+    def test_no_site(self):
+        """
+        Allow devices without a site
+        """
+        item = device(1, 'sw1')
+        item['site'] = None
+        self.assertIsNone(DeviceRecord.from_device(item).site_slug)
+
+
+class DeviceStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.store = DeviceStore([
+            device(1, 'sw1', site_slug='site-a'),
+            device(2, 'sw2', site_slug='site-b'),
+            device(3, 'sw3', site_slug='site-a'),
+        ])
+
+    def test_deduplicate(self):
+        """
+        Keep a single record for a device added more than once
+        """
+        record = self.store.get(2)
+        self.assertIs(self.store.add(device(2, 'sw2', site_slug='site-b')),
+                      record)
+        self.assertEqual(len(self.store), 3)
+        self.assertEqual([item.id for item in self.store], [1, 2, 3])
+
+    def test_by_site(self):
+        """
+        Group records by site, in the order they were added
+        """
+        self.assertEqual([item.id for item in self.store.by_site('site-a')],
+                         [1, 3])
+        self.assertEqual([item.id for item in self.store.by_site('site-b')],
+                         [2])
+        self.assertTrue(self.store.has_site('site-a'))
+        self.assertFalse(self.store.has_site('site-c'))
+        self.assertEqual(self.store.by_site('site-c'), [])
+
+    def test_update_in_place(self):
+        """
+        Update the existing record, which every menu shares, in place
+        """
+        record = self.store.get(1)
+        self.store.add(device(1, 'sw1-new', address='10.0.0.9'))
+        self.assertEqual((record.name, record.address),
+                         ('sw1-new', '10.0.0.9'))
+        self.assertIs(self.store.records[0], record)
+
+    def test_update_moves_site(self):
+        """
+        Move an updated record to its new site, dropping empty sites
+        """
+        record = self.store.get(2)
+        self.store.add(device(2, 'sw2', site_slug='site-a'))
+        self.assertEqual(record.site_slug, 'site-a')
+        self.assertEqual([item.id for item in self.store.by_site('site-a')],
+                         [1, 3, 2])
+        self.assertFalse(self.store.has_site('site-b'))
+
+    def test_update_handlers(self):
+        """
+        Run the update handlers only when a hostname or address changes
+        """
+        updated = list()
+        self.store.update_handlers.append(updated.append)
+        self.store.add(device(3, 'sw3', site_slug='site-a'))
+        self.assertEqual(updated, [])
+        self.store.add(device(3, 'sw3-new', site_slug='site-a'))
+        self.assertEqual(updated, [self.store.get(3)])
+
+    def test_shared_site_slugs(self):
+        """
+        Share a single copy of each site slug between records
+        """
+        slugs = [item.site_slug for item in self.store.by_site('site-a')]
+        self.assertIs(slugs[0], slugs[1])
+
+    def test_without_id(self):
+        """
+        Add devices without an ID without deduplicating them
+        """
+        self.store.add(device(None, 'lab1'))
+        self.store.add(device(None, 'lab1'))
+        self.assertEqual(len(self.store), 5)
@@ -0,0 +1,223 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from jumpbox import external_item
+from jumpbox.external_item import FanOutItem
+from jumpbox.fan_out import FanOut
+from jumpbox.fan_out import describe
+from jumpbox.fan_out import summarize
+
+
+class ScriptLauncher(object):
+    """Runs a shell script for each device instead of `ssh`.
+
+    The script is looked up by the device's host. The command is passed to
+    `sh` as `$0`, where it is ignored.
+    """
+
+    def __init__(self, scripts):
+        self.scripts = scripts
+        self.calls = list()
+
+    def argv(self, host, username=None, port=None, options=None,
+             master=True):
+        self.calls.append((host, username, master))
+        return ['sh', '-c', self.scripts[host]]
+
+
+class Marked(object):
+    """A marked device in a menu."""
+
+    def __init__(self, text, text_id):
+        self.text = text
+        self.text_id = text_id
+        self.port = None
+        self.ssh_options = None
+
+
+class Menu(object):
+
+    def __init__(self, marked_items):
+        self.marked_items = marked_items
+
+
+def device(name, host):
+    return {'name': name, 'host': host}
+
+
+class FanOutTests(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def run_scripts(self, devices, scripts, timeout=10, command='show ver'):
+        self.launcher = ScriptLauncher(scripts)
+        runner = FanOut(launcher=self.launcher, max_workers=4,
+                        timeout=timeout, output_dir=self.output_dir)
+        return runner.run(devices, 'bob', command)
+
+    def test_device_order(self):
+        """
+        Return results in device order, whatever order they finish in
+        """
+        results, _ = self.run_scripts(
+            [device('slow', 'a'), device('fast', 'b'), device('mid', 'c')],
+            {'a': 'sleep 0.4; echo a', 'b': 'echo b',
+             'c': 'sleep 0.2; echo c'})
+        self.assertEqual([result['name'] for result in results],
+                         ['slow', 'fast', 'mid'])
+        for result, text in zip(results, 'abc'):
+            with open(result['output']) as output:
+                self.assertEqual(output.read(), text + '\n')
+        self.assertEqual([call[2] for call in self.launcher.calls],
+                         [False] * 3)
+
+    def test_exit_status(self):
+        """
+        Record the exit status and output of each device
+        """
+        results, _ = self.run_scripts(
+            [device('ok', 'a'), device('bad', 'b')],
+            {'a': 'echo x; exit 0', 'b': 'echo x; echo oops >&2; exit 3'})
+        self.assertEqual([result['exit_status'] for result in results],
+                         [0, 3])
+        with open(results[1]['output']) as output:
+            self.assertEqual(output.read(), 'x\noops\n')
+        self.assertTrue(describe(results[1]).startswith('exit status 3 in'))
+
+    def test_duplicate_names(self):
+        """
+        Give devices with the same name their own output files
+        """
+        results, path = self.run_scripts(
+            [device('sw1', 'a'), device('sw1', 'b'), device('sw/1', 'c'),
+             device('all', 'd')],
+            {'a': 'echo a', 'b': 'echo b', 'c': 'echo c', 'd': 'echo d'})
+        self.assertEqual([os.path.basename(result['output'])
+                          for result in results],
+                         ['sw1.txt', 'sw1-2.txt', 'sw_1.txt', 'all-2.txt'])
+        self.assertEqual(os.path.basename(path), 'all.txt')
+
+    def test_timeout(self):
+        """
+        Stop a device that runs past the timeout
+        """
+        results, _ = self.run_scripts(
+            [device('hung', 'a'), device('ok', 'b')],
+            {'a': 'echo started; exec sleep 10', 'b': 'echo x'},
+            timeout=0.3)
+        hung, ok = results
+        self.assertTrue(hung['timed_out'])
+        self.assertNotEqual(hung['exit_status'], 0)
+        self.assertLess(hung['duration'], 5)
+        self.assertFalse(ok['timed_out'])
+        self.assertTrue(describe(hung).startswith('timed out in'))
+
+    def test_gathered(self):
+        """
+        Gather the summary and every device's output into `all.txt`
+        """
+        results, path = self.run_scripts(
+            [device('sw1', 'a'), device('sw2', 'b')],
+            {'a': 'echo one', 'b': 'echo two; exit 1'})
+        with open(path) as gathered:
+            lines = gathered.read().splitlines()
+        self.assertEqual(lines[0], '$ show ver')
+        self.assertEqual(lines[2], '2 devices: 1 ok, 1 failed')
+        self.assertIn('  sw2 (b): %s' % describe(results[1]), lines)
+        first = lines.index('==> sw1 (a): %s <==' % describe(results[0]))
+        second = lines.index('==> sw2 (b): %s <==' % describe(results[1]))
+        self.assertEqual(lines[first + 1], 'one')
+        self.assertEqual(lines[second + 1], 'two')
+        self.assertLess(first, second)
+
+
+class SummarizeTests(unittest.TestCase):
+
+    def result(self, name, exit_status, duration, timed_out=False):
+        return {'name': name, 'host': name + '.example', 'output': None,
+                'exit_status': exit_status, 'duration': duration,
+                'timed_out': timed_out}
+
+    def test_summary(self):
+        """
+        Count each outcome, list the failures and name the slowest device
+        """
+        lines = summarize([
+            self.result('sw1', 0, 1.0), self.result('sw2', 255, 0.5),
+            self.result('sw3', None, 0.0), self.result('sw4', -9, 3.0,
+                                                       timed_out=True)],
+            elapsed=3.2)
+        self.assertEqual(lines, [
+            '4 devices: 1 ok, 3 failed in 3.2s',
+            '  sw2 (sw2.example): exit status 255 in 0.5s',
+            '  sw3 (sw3.example): cancelled',
+            '  sw4 (sw4.example): timed out in 3.0s',
+            'Slowest: sw4 in 3.0s'])
+
+    def test_nothing_ran(self):
+        """
+        Leave out the slowest device when none finished
+        """
+        self.assertEqual(summarize([self.result('sw1', None, 0.0)]),
+                         ['1 devices: 0 ok, 1 failed',
+                          '  sw1 (sw1.example): cancelled'])
+
+
+class FanOutItemTests(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.answers = list()
+        self.prompts = list()
+
+        def raw_input(prompt=''):
+            self.prompts.append(prompt)
+            return self.answers.pop(0)
+        external_item.raw_input = raw_input
+
+    def tearDown(self):
+        del external_item.raw_input
+        shutil.rmtree(self.output_dir)
+
+    def item(self, marked_items):
+        launcher = ScriptLauncher({'a': 'echo a', 'b': 'echo b'})
+        runner = FanOut(launcher=launcher, output_dir=self.output_dir)
+        return FanOutItem(menu=Menu(marked_items), runner=runner)
+
+    def test_run(self):
+        """
+        Run the command on the marked devices without starting a pager
+        """
+        item = self.item([Marked('sw1', 'a'), Marked('sw2', 'b')])
+        self.answers = ['bob', 'show ver', '']
+        item.action()
+        self.assertEqual([result['exit_status'] for result in item.results],
+                         [0, 0])
+        self.assertEqual(self.prompts[-1], "Press enter to continue...")
+        self.assertEqual(self.answers, [])
+
+    def test_nothing_marked(self):
+        """
+        Explain how to mark devices when none are marked
+        """
+        item = self.item([])
+        self.answers = ['']
+        item.action()
+        self.assertIsNone(item.results)
+        self.assertIn('No devices are marked', self.prompts[0])
+
+    def test_cancel(self):
+        """
+        Run nothing when the command is left empty
+        """
+        item = self.item([Marked('sw1', 'a')])
+        self.answers = ['bob', '']
+        item.action()
+        self.assertIsNone(item.results)
+        self.assertEqual(os.listdir(self.output_dir), [])
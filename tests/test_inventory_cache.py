@@ -0,0 +1,138 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from jumpbox.inventory_cache import InventoryCache
+
+
+class Fetch(object):
+    """A fetch callable that counts its calls.
+
+    Arguments:
+        data: What each call returns.
+        gate (threading.Event, optional): If given, calls wait for it to be
+            set before returning.
+    """
+
+    def __init__(self, data, gate=None):
+        self.data = data
+        self.gate = gate
+        self.calls = 0
+        self.done = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.done.set()
+        return self.data
+
+
+class InventoryCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = InventoryCache(cache_dir=self.cache_dir, ttl=60)
+        self.key = 'https://netbox/api/dcim/devices/'
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def age(self, seconds):
+        """Make the cached entry `seconds` old."""
+        mtime = time.time() - seconds
+        os.utime(self.cache._path(self.key), (mtime, mtime))
+
+    def test_miss(self):
+        """
+        Fetch and store an entry that isn't cached
+        """
+        fetch = Fetch({'results': [1]})
+        self.assertEqual(self.cache.get(self.key, fetch), {'results': [1]})
+        self.assertEqual(fetch.calls, 1)
+        data, age = self.cache.read(self.key)
+        self.assertEqual(data, {'results': [1]})
+        self.assertLess(age, 60)
+
+    def test_fresh(self):
+        """
+        Serve a fresh entry without fetching
+        """
+        self.cache.write(self.key, {'results': [1]})
+        self.age(59)
+        fetch = Fetch({'results': [2]})
+        self.assertEqual(self.cache.get(self.key, fetch), {'results': [1]})
+        self.assertEqual(fetch.calls, 0)
+
+    def test_stale_while_revalidate(self):
+        """
+        Serve a stale entry at once while it is refreshed in the background
+        """
+        self.cache.write(self.key, {'results': [1]})
+        self.age(61)
+        gate = threading.Event()
+        fetch = Fetch({'results': [2]}, gate=gate)
+        self.assertEqual(self.cache.get(self.key, fetch), {'results': [1]})
+        self.assertEqual(self.cache.read(self.key)[0], {'results': [1]})
+
+        gate.set()
+        self.assertTrue(wait_for(
+            lambda: self.cache.read(self.key)[0] == {'results': [2]}))
+        data, age = self.cache.read(self.key)
+        self.assertLess(age, 60)
+        self.assertEqual(fetch.calls, 1)
+
+    def test_single_refresh(self):
+        """
+        Refresh a stale entry only once while a refresh is running
+        """
+        self.cache.write(self.key, {'results': [1]})
+        self.age(61)
+        gate = threading.Event()
+        fetch = Fetch({'results': [2]}, gate=gate)
+        self.cache.get(self.key, fetch)
+        self.assertTrue(wait_for(lambda: fetch.calls == 1))
+
+        other = Fetch({'results': [3]})
+        thread = self.cache.refresh_async(self.key, other)
+        thread.join(5)
+        self.assertEqual(other.calls, 0)
+        gate.set()
+
+    def test_errors_not_cached(self):
+        """
+        Return error strings from the fetch without caching them
+        """
+        for error in ("HTTP Error: 500", "URL Error: timed out"):
+            fetch = Fetch(error)
+            self.assertEqual(self.cache.get(self.key, fetch), error)
+            self.assertEqual(self.cache.get(self.key, fetch), error)
+            self.assertEqual(fetch.calls, 2)
+            self.assertEqual(self.cache.read(self.key), (None, None))
+
+    def test_stale_kept_on_error(self):
+        """
+        Keep serving the stale entry when the background refresh fails
+        """
+        self.cache.write(self.key, {'results': [1]})
+        self.age(61)
+        fetch = Fetch("URL Error: timed out")
+        self.assertEqual(self.cache.get(self.key, fetch), {'results': [1]})
+        self.assertTrue(fetch.done.wait(5))
+        time.sleep(0.05)
+        data, age = self.cache.read(self.key)
+        self.assertEqual(data, {'results': [1]})
+        self.assertGreater(age, 60)
+
+
+def wait_for(condition, timeout=5):
+    """Poll `condition` until it is true or `timeout` seconds pass."""
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
@@ -0,0 +1,90 @@
+import json
+import unittest
+
+from jumpbox.json_stream import parse_page
+
+PAGE = json.dumps({
+    'count': 3,
+    'next': 'http://netbox/api/dcim/devices/?offset=3',
+    'results': [{'id': 1, 'name': 'sw1'}, {'id': 2, 'name': 'sw2'},
+                {'id': 3, 'name': 'sw3', 'rack': 12345}],
+    'previous': None,
+})
+
+
+def split(text, size):
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+
+class ParsePageTests(unittest.TestCase):
+
+    def test_whole(self):
+        """
+        Decode a page arriving in a single chunk
+        """
+        page = parse_page([PAGE])
+        self.assertEqual(page['count'], 3)
+        self.assertEqual(list(page['results']), json.loads(PAGE)['results'])
+        self.assertIsNone(page['previous'])
+
+    def test_split(self):
+        """
+        Decode a page split into chunks at every possible size
+        """
+        expected = json.loads(PAGE)
+        for size in range(1, len(PAGE) + 1):
+            page = parse_page(split(PAGE, size))
+            results = list(page['results'])
+            self.assertEqual(results, expected['results'], size)
+            self.assertEqual(page['next'], expected['next'], size)
+            self.assertIsNone(page['previous'], size)
+
+    def test_split_number(self):
+        """
+        Decode a number split across two chunks
+        """
+        page = parse_page(['{"count": 12', '34, "results": []}'])
+        self.assertEqual(page['count'], 1234)
+        self.assertEqual(list(page['results']), [])
+
+    def test_empty_results(self):
+        """
+        Decode a page with no records
+        """
+        page = parse_page(['{"count": 0, "results": [', ']}'])
+        self.assertEqual(page['count'], 0)
+        self.assertEqual(list(page['results']), [])
+
+    def test_no_results(self):
+        """
+        Raise ValueError for a response without results
+        """
+        self.assertRaises(ValueError, parse_page,
+                          ['{"detail": "Invalid token."}'])
+        self.assertRaises(ValueError, parse_page, ['{', '}'])
+        self.assertRaises(ValueError, parse_page, ['{"results": null}'])
+
+    def test_truncated_header(self):
+        """
+        Raise ValueError when the page ends before the results
+        """
+        self.assertRaises(ValueError, parse_page, [PAGE[:10]])
+
+    def test_truncated_results(self):
+        """
+        Raise ValueError from the results when the page ends part way through
+        """
+        cut = PAGE.index('sw2')
+        for size in (1, 7, cut):
+            page = parse_page(split(PAGE[:cut], size))
+            with self.assertRaises(ValueError):
+                list(page['results'])
+
+    def test_malformed(self):
+        """
+        Raise ValueError for a response that isn't a JSON object
+        """
+        self.assertRaises(ValueError, parse_page, ['[1, 2]'])
+        page = parse_page(['{"results": [1 2]}'])
+        with self.assertRaises(ValueError):
+            list(page['results'])
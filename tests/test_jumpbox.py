@@ -0,0 +1,358 @@
+import curses
+import unittest
+
+from jumpbox import jumpbox
+from jumpbox.jumpbox import Jumpbox
+from jumpbox.jumpbox import MenuItem
+
+
+class Screen(object):
+    """A stand-in for a curses pad that draws nothing."""
+
+    def __init__(self, rows=16, cols=80):
+        self.rows = rows
+        self.cols = cols
+
+    def getmaxyx(self):
+        return self.rows, self.cols
+
+    def erase(self):
+        pass
+
+    def border(self, *args):
+        pass
+
+    def addstr(self, *args):
+        pass
+
+    def refresh(self, *args):
+        pass
+
+
+class ScriptedJumpbox(Jumpbox):
+    """A menu that reads its keys from `script` instead of a terminal.
+
+    Keys are waiting to be read until `script` runs out, after which no key
+    is pressed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(ScriptedJumpbox, self).__init__(*args, **kwargs)
+        self.script = list()
+        self.screen = Screen()
+        self.term_y, self.term_x = self.screen.getmaxyx()
+
+    def get_input(self, wait=True):
+        if not self.script:
+            return -1
+        key = self.script.pop(0)
+        return ord(key) if isinstance(key, str) else key
+
+    def run_idle_handlers(self):
+        pass
+
+    def press(self, *keys):
+        """Process each key as if it had been pressed separately."""
+        for key in keys:
+            self.script.append(key)
+            self.process_user_input()
+
+
+class Item(MenuItem):
+
+    markable = True
+
+
+def menu(names):
+    menu = ScriptedJumpbox("Devices", "Select a device...")
+    menu.extend_items(Item(name) for name in names)
+    menu.add_exit()
+    return menu
+
+
+def shown(menu):
+    return [item.text for item in menu.options]
+
+
+class FilterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.menu = menu(['core-sw01', 'core-sw02', 'edge-rtr01'])
+
+    def test_type_ahead(self):
+        """
+        Narrow the options with each letter typed, keeping the exit option
+        """
+        self.menu.press('c', 'o', 'r')
+        self.assertEqual(self.menu.filter_text, 'cor')
+        self.assertEqual(shown(self.menu), ['core-sw01', 'core-sw02', 'Exit'])
+        self.menu.press('e', '-', 's', 'w', '0', '2')
+        self.assertEqual(shown(self.menu), ['core-sw02', 'Exit'])
+
+    def test_case_insensitive(self):
+        """
+        Match options without regard to case
+        """
+        self.menu.push_filter('EDGE')
+        self.assertEqual(shown(self.menu), ['edge-rtr01', 'Exit'])
+
+    def test_slash(self):
+        """
+        Start a filter with `/` so it can begin with a digit
+        """
+        self.menu.press('/', '0', '1')
+        self.assertEqual(shown(self.menu), ['core-sw01', 'edge-rtr01',
+                                            'Exit'])
+
+    def test_pop_filter(self):
+        """
+        Restore the previous matches with backspace, then leave the filter
+        """
+        self.menu.press('c', 'o', 'r', 'x')
+        self.assertEqual(shown(self.menu), ['Exit'])
+        self.menu.press(curses.KEY_BACKSPACE)
+        self.assertEqual(self.menu.filter_text, 'cor')
+        self.assertEqual(shown(self.menu), ['core-sw01', 'core-sw02', 'Exit'])
+        self.menu.press(127, 127, 127)
+        self.assertIsNone(self.menu.filter_text)
+        self.assertEqual(len(self.menu.options), 4)
+
+    def test_escape(self):
+        """
+        Leave the filter with escape, highlighting the first option
+        """
+        self.menu.press('e', 'd')
+        self.menu.go_down()
+        self.menu.press(jumpbox.ESCAPE_KEY)
+        self.assertIsNone(self.menu.filter_text)
+        self.assertEqual(self.menu.current_option, 0)
+        self.assertEqual(len(self.menu.options), 4)
+
+    def test_new_items(self):
+        """
+        Add matching options appended while filtering to every filter
+        """
+        self.menu.press('r', 'e')
+        self.menu.append_item(Item('core-sw03'))
+        self.menu.append_item(Item('rtr02'))
+        self.menu.append_item(Item('dist-sw01'))
+        self.assertEqual(shown(self.menu), ['core-sw01', 'core-sw02',
+                                            'core-sw03', 'Exit'])
+        self.menu.pop_filter()
+        self.assertEqual(shown(self.menu), ['core-sw01', 'core-sw02',
+                                            'edge-rtr01', 'core-sw03',
+                                            'rtr02', 'Exit'])
+
+    def test_mark_while_filtering(self):
+        """
+        Mark only the options matching the filter with Ctrl-A
+        """
+        self.menu.press('c', 'o', jumpbox.MARK_ALL_KEY)
+        self.menu.clear_filter()
+        self.assertEqual([item.text for item in self.menu.marked_items],
+                         ['core-sw01', 'core-sw02'])
+
+
+class TypeDigitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.menu = menu(['sw%02d' % index for index in range(1, 31)])
+        self.now = 1000.0
+        self.time = jumpbox.time.time
+        jumpbox.time.time = lambda: self.now
+
+    def tearDown(self):
+        jumpbox.time.time = self.time
+
+    def type(self, digits, delay=0.1):
+        for digit in digits:
+            self.now += delay
+            self.menu.type_digit(digit)
+
+    def test_single_digit(self):
+        """
+        Go to an option by its number
+        """
+        self.type('5')
+        self.assertEqual(self.menu.current_option, 4)
+
+    def test_multiple_digits(self):
+        """
+        Read digits typed quickly as a single option number
+        """
+        self.type('12')
+        self.assertEqual(self.menu.current_option, 11)
+        self.assertEqual(self.menu._digits, '12')
+
+    def test_timeout(self):
+        """
+        Start a new number once `GO_TO_TIMEOUT` seconds have passed
+        """
+        self.type('1')
+        self.type('2', delay=jumpbox.GO_TO_TIMEOUT + 0.1)
+        self.assertEqual(self.menu.current_option, 1)
+
+    def test_out_of_range(self):
+        """
+        Start again from the last digit when the longer number is too big
+        """
+        self.type('4')
+        self.type('5')
+        self.assertEqual(self.menu.current_option, 4)
+        self.assertEqual(self.menu._digits, '5')
+
+    def test_exit_option(self):
+        """
+        Go to the exit option by its number
+        """
+        self.type('31')
+        self.assertIs(self.menu.current_item, self.menu.exit_item)
+
+    def test_zero(self):
+        """
+        Ignore a number that isn't an option
+        """
+        self.type('0')
+        self.assertEqual(self.menu.current_option, 0)
+        self.assertEqual(self.menu._digits, '')
+
+    def test_other_key(self):
+        """
+        Start a new number after any other key
+        """
+        self.menu.press('1', curses.KEY_HOME, '2')
+        self.assertEqual(self.menu.current_option, 1)
+
+
+class NavigationTests(unittest.TestCase):
+
+    def setUp(self):
+        # 24 options and the exit option, with 10 shown at once.
+        self.menu = menu(['sw%02d' % index for index in range(1, 25)])
+        self.last = 24
+
+    def target(self, key, option):
+        return self.menu._navigation_target(key, option)
+
+    def test_wrap(self):
+        """
+        Wrap from the last option to the first and back with the arrow keys
+        """
+        self.assertEqual(self.target(curses.KEY_DOWN, self.last), 0)
+        self.assertEqual(self.target(curses.KEY_UP, 0), self.last)
+        self.assertEqual(self.target(curses.KEY_DOWN, 3), 4)
+        self.assertEqual(self.target(curses.KEY_UP, 3), 2)
+
+    def test_paging(self):
+        """
+        Move a page at a time, stopping at the first and last options
+        """
+        self.assertEqual(self.menu.visible_options, 10)
+        self.assertEqual(self.target(curses.KEY_NPAGE, 0), 10)
+        self.assertEqual(self.target(curses.KEY_NPAGE, 20), self.last)
+        self.assertEqual(self.target(curses.KEY_NPAGE, self.last), self.last)
+        self.assertEqual(self.target(curses.KEY_PPAGE, 15), 5)
+        self.assertEqual(self.target(curses.KEY_PPAGE, 5), 0)
+
+    def test_home_end(self):
+        """
+        Jump to the first and last options
+        """
+        self.assertEqual(self.target(curses.KEY_HOME, 12), 0)
+        self.assertEqual(self.target(curses.KEY_END, 12), self.last)
+
+    def test_empty_menu(self):
+        """
+        Stay on the first option of an empty menu
+        """
+        empty = ScriptedJumpbox("Empty")
+        for key in jumpbox.NAVIGATION_KEYS:
+            self.assertEqual(empty._navigation_target(key, 0), 0)
+
+    def test_scroll(self):
+        """
+        Scroll just far enough to keep the highlighted option shown
+        """
+        self.menu.press(curses.KEY_END)
+        self.assertEqual(self.menu.top_option, self.last - 9)
+        self.menu.press(curses.KEY_HOME)
+        self.assertEqual(self.menu.top_option, 0)
+
+
+class DrainNavigationTests(unittest.TestCase):
+
+    def setUp(self):
+        self.menu = menu(['sw%02d' % index for index in range(1, 25)])
+        self.moves = list()
+        move_to = self.menu._move_to
+
+        def record(option):
+            self.moves.append(option)
+            move_to(option)
+        self.menu._move_to = record
+
+    def test_held_key(self):
+        """
+        Apply waiting navigation keys together, with a single move
+        """
+        self.menu.script = [curses.KEY_DOWN] * 5
+        self.menu.process_user_input()
+        self.assertEqual(self.moves, [5])
+        self.assertEqual(self.menu.script, [])
+
+    def test_mixed_keys(self):
+        """
+        Apply every kind of waiting navigation key in order
+        """
+        self.menu.script = [curses.KEY_NPAGE, curses.KEY_NPAGE,
+                            curses.KEY_UP, curses.KEY_UP]
+        self.menu.process_user_input()
+        self.assertEqual(self.moves, [18])
+
+    def test_other_key_waiting(self):
+        """
+        Stop at a key that isn't a navigation key and process it next
+        """
+        self.menu.script = [curses.KEY_DOWN, curses.KEY_DOWN, ord(' '),
+                            curses.KEY_DOWN]
+        self.menu.process_user_input()
+        self.assertEqual(self.moves, [2])
+        self.assertEqual(self.menu.script, [curses.KEY_DOWN])
+        self.assertEqual(self.menu.marked_items, [])
+
+        self.menu.process_user_input()
+        self.assertEqual([item.text for item in self.menu.marked_items],
+                         ['sw03'])
+        self.assertEqual(self.menu.current_option, 3)
+
+        self.menu.process_user_input()
+        self.assertEqual(self.moves, [2, 4])
+
+
+class MarkedActionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.menu = menu(['sw01', 'sw02', 'sw03'])
+        self.ran = list()
+        action = MenuItem("Run a command on marked devices")
+        action.action = lambda: self.ran.append(
+            [item.text for item in self.menu.marked_items])
+        self.menu.set_marked_action(action)
+
+    def test_run(self):
+        """
+        Run the marked action on the marked options with Ctrl-R
+        """
+        self.menu.press(curses.KEY_DOWN, ' ', ' ', jumpbox.RUN_MARKED_KEY)
+        self.assertEqual(self.ran, [['sw02', 'sw03']])
+        self.assertFalse(self.menu.should_exit)
+
+    def test_not_listed(self):
+        """
+        Leave the marked action out of the options, keeping their numbers
+        """
+        self.assertEqual(shown(self.menu), ['sw01', 'sw02', 'sw03', 'Exit'])
+        self.menu.press('2')
+        self.assertEqual(self.menu.current_item.text, 'sw02')
+        self.menu.press(jumpbox.MARK_ALL_KEY)
+        self.assertEqual(len(self.menu.marked_items), 3)
@@ -0,0 +1,290 @@
+import shutil
+import tempfile
+import unittest
+
+from jumpbox.json_stream import parse_page
+from jumpbox.netbox_api import NetboxAPI
+from jumpbox.netbox_api import NetboxError
+from jumpbox.netbox_api import clean_address
+from jumpbox.netbox_api import clean_hostname
+
+
+def raw_device(device_id, name, address='10.0.0.1/24',
+               last_updated='2018-01-01T00:00:00Z'):
+    return {
+        'id': device_id,
+        'display_name': name,
+        'primary_ip': {'address': address} if address else None,
+        'site': {'slug': 'site-a'},
+        'last_updated': last_updated,
+    }
+
+
+class Response(object):
+    """A response from the connection pool, with its body in chunks."""
+
+    def __init__(self, status, chunks):
+        self.status = status
+        self.chunks = chunks
+
+    def iter_content(self):
+        return iter(self.chunks)
+
+    def read(self):
+        return ''.join(self.chunks)
+
+
+class SyncTestAPI(NetboxAPI):
+    """A `NetboxAPI` answering from lists instead of Netbox."""
+
+    def __init__(self, *args, **kwargs):
+        super(SyncTestAPI, self).__init__(*args, **kwargs)
+        self.inventory = list()
+        self.changed = list()
+        self.high_waters = list()
+
+    def iter_pages(self, req, use_cache=True):
+        yield [dict(item, primary_ip=dict(item['primary_ip']))
+               for item in self.inventory]
+
+    def _changed_devices(self, high_water):
+        self.high_waters.append(high_water)
+        return self.changed
+
+
+def raw_site(site_id, count_devices):
+    return {
+        'id': site_id,
+        'name': 'Site %d' % site_id,
+        'slug': 'site-%d' % site_id,
+        'facility': None,
+        'count_devices': count_devices,
+        'region': None,
+    }
+
+
+class CleanAddressTests(unittest.TestCase):
+
+    def test_ipv4(self):
+        """
+        Remove the prefix length from an IPv4 address
+        """
+        self.assertEqual(clean_address('192.0.2.1/24'), '192.0.2.1')
+        self.assertEqual(clean_address('192.0.2.1/32'), '192.0.2.1')
+
+    def test_ipv6(self):
+        """
+        Remove the prefix length from an IPv6 address
+        """
+        self.assertEqual(clean_address('2001:db8::1/64'), '2001:db8::1')
+        self.assertEqual(clean_address('2001:db8::1/128'), '2001:db8::1')
+
+    def test_without_prefix(self):
+        """
+        Leave addresses without a prefix length unchanged
+        """
+        self.assertEqual(clean_address('192.0.2.1'), '192.0.2.1')
+        self.assertEqual(clean_address('2001:db8::1'), '2001:db8::1')
+
+    def test_not_a_prefix(self):
+        """
+        Only remove a slash followed by digits
+        """
+        self.assertEqual(clean_address('192.0.2.1/'), '192.0.2.1/')
+        self.assertEqual(clean_address('192.0.2.1/x'), '192.0.2.1/x')
+
+
+class CleanHostnameTests(unittest.TestCase):
+
+    def test_member_number(self):
+        """
+        Remove a trailing member number from a hostname
+        """
+        self.assertEqual(clean_hostname('switch01-1'), 'switch01')
+        self.assertEqual(clean_hostname('core-sw01-2'), 'core-sw01')
+
+    def test_without_member_number(self):
+        """
+        Leave hostnames without a member number unchanged
+        """
+        self.assertEqual(clean_hostname('switch01'), 'switch01')
+        self.assertEqual(clean_hostname('core-sw01'), 'core-sw01')
+        self.assertEqual(clean_hostname('switch-a'), 'switch-a')
+
+    def test_single_digit_only(self):
+        """
+        Only remove a single digit member number
+        """
+        self.assertEqual(clean_hostname('switch-10'), 'switch-10')
+
+    def test_short_names(self):
+        """
+        Handle hostnames too short to have a member number
+        """
+        self.assertEqual(clean_hostname(''), '')
+        self.assertEqual(clean_hostname('1'), '1')
+
+
+class FormatSitesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.api = NetboxAPI(cache_ttl=0, socket_path=None)
+
+    def test_empty_sites(self):
+        """
+        Drop every site without devices, including consecutive ones
+        """
+        sites = self.api.format_sites([
+            raw_site(1, 4), raw_site(2, 0), raw_site(3, 0), raw_site(4, 1),
+            raw_site(5, 0)])
+        self.assertEqual([item['id'] for item in sites], [1, 4])
+
+    def test_fields(self):
+        """
+        Keep only the fields the menu uses
+        """
+        site = self.api.format_sites([raw_site(1, 4)])[0]
+        self.assertEqual(sorted(site), ['count_devices', 'facility', 'id',
+                                        'name', 'slug'])
+
+
+class MergeDevicesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.api = NetboxAPI(cache_ttl=0, socket_path=None)
+        self.devices = self.api.format_devices([
+            raw_device(1, 'sw1'), raw_device(2, 'sw2'), raw_device(3, 'sw3')])
+
+    def test_order(self):
+        """
+        Keep updated devices in place and add new devices to the end
+        """
+        merged = self.api.merge_devices(self.devices, [
+            raw_device(4, 'sw4'), raw_device(2, 'sw2-renamed')])
+        self.assertEqual([item['id'] for item in merged], [1, 2, 3, 4])
+        self.assertEqual(merged[1]['display_name'], 'sw2-renamed')
+
+    def test_formats_changed_devices(self):
+        """
+        Clean the address and hostname of changed devices
+        """
+        merged = self.api.merge_devices(self.devices, [
+            raw_device(4, 'sw4-1', address='10.0.0.4/24')])
+        self.assertEqual(merged[-1]['display_name'], 'sw4')
+        self.assertEqual(merged[-1]['primary_ip']['address'], '10.0.0.4')
+
+    def test_primary_ip_removed(self):
+        """
+        Drop devices that no longer have a primary IP address
+        """
+        merged = self.api.merge_devices(self.devices, [
+            raw_device(2, 'sw2', address=None), raw_device(5, 'sw5',
+                                                           address=None)])
+        self.assertEqual([item['id'] for item in merged], [1, 3])
+
+
+class SyncDevicesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.api = SyncTestAPI(cache_dir=self.cache_dir, socket_path=None)
+        self.key = self.api.devices_url(page_size=0) + '#inventory'
+
+    def tearDown(self):
+        self.api.close()
+        shutil.rmtree(self.cache_dir)
+
+    def test_high_water(self):
+        """
+        Request only the devices changed since the newest `last_updated`
+        """
+        self.api.inventory = [
+            raw_device(1, 'sw1', last_updated='2018-01-02T00:00:00Z'),
+            raw_device(2, 'sw2', last_updated='2018-01-03T00:00:00Z')]
+        self.assertEqual(len(self.api.sync_devices()), 2)
+        state, age = self.api.cache.read(self.key)
+        self.assertEqual(state['high_water'], '2018-01-03T00:00:00Z')
+
+        self.api.changed = [
+            raw_device(3, 'sw3', last_updated='2018-01-04T00:00:00Z')]
+        state = self.api._sync_state(self.key)
+        self.assertEqual(self.api.high_waters, ['2018-01-03T00:00:00Z'])
+        self.assertEqual([item['id'] for item in state['devices']], [1, 2, 3])
+        self.assertEqual(state['high_water'], '2018-01-04T00:00:00Z')
+
+    def test_high_water_without_changes(self):
+        """
+        Keep the high-water mark when nothing has changed
+        """
+        self.api.inventory = [
+            raw_device(1, 'sw1', last_updated='2018-01-02T00:00:00Z')]
+        self.api.sync_devices()
+        state = self.api._sync_state(self.key)
+        self.assertEqual(state['high_water'], '2018-01-02T00:00:00Z')
+
+    def test_reconcile(self):
+        """
+        Download the full inventory again once the reconcile interval passes
+        """
+        self.api.inventory = [raw_device(1, 'sw1'), raw_device(2, 'sw2')]
+        self.api.sync_devices()
+        self.api.reconcile_interval = -1
+        self.api.inventory = [raw_device(2, 'sw2')]
+        state = self.api._sync_state(self.key)
+        self.assertEqual([item['id'] for item in state['devices']], [2])
+        self.assertEqual(self.api.high_waters, [])
+
+
+class NetboxDownTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def api(self, **kwargs):
+        api = NetboxAPI(socket_path=None, **kwargs)
+        api.api_call = lambda req: "URL Error: [Errno 111] Connection refused"
+        return api
+
+    def test_sync_devices(self):
+        """
+        Raise `NetboxError` when the inventory can't be synced
+        """
+        api = self.api(cache_dir=self.cache_dir)
+        with self.assertRaises(NetboxError) as context:
+            api.sync_devices()
+        self.assertIn('Connection refused', str(context.exception))
+        self.assertEqual(api.cache.read(api.devices_url(page_size=0) +
+                                        '#inventory'), (None, None))
+
+    def test_get_devices(self):
+        """
+        Raise `NetboxError` when devices can't be requested
+        """
+        self.assertRaises(NetboxError, self.api(cache_ttl=0).get_devices)
+        self.assertRaises(NetboxError, self.api(
+            cache_dir=self.cache_dir).get_sites)
+
+    def test_stream_truncated(self):
+        """
+        Raise `NetboxError` when a streamed response is cut off
+        """
+        api = self.api(cache_ttl=0, stream=True)
+        api.stream_call = lambda req: parse_page(
+            ['{"count": 2, "next": null, "results": [', '{"id": 1}, {"id'])
+        with self.assertRaises(NetboxError) as context:
+            list(api.iter_pages(api.devices_url()))
+        self.assertIn('URL Error', str(context.exception))
+
+    def test_stream_without_results(self):
+        """
+        Raise `NetboxError` for a streamed response without results
+        """
+        api = NetboxAPI(cache_ttl=0, socket_path=None, stream=True)
+        api.http.get = lambda req: Response(200, ['{"detail": ',
+                                                  '"Invalid token."}'])
+        with self.assertRaises(NetboxError) as context:
+            list(api.iter_pages(api.devices_url()))
+        self.assertIn('URL Error', str(context.exception))
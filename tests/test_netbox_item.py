@@ -0,0 +1,60 @@
+import unittest
+
+from jumpbox.device_store import DeviceRecord
+from jumpbox.jumpbox import Jumpbox
+from jumpbox.netbox_item import DeviceItem
+from jumpbox.netbox_item import SearchItem
+
+
+class DeviceItemTests(unittest.TestCase):
+
+    def test_compact(self):
+        """
+        Only store the record, menu and exit flag on each option by default
+        """
+        item = DeviceItem(record=DeviceRecord(1, 'sw1', '10.0.0.1'))
+        self.assertEqual(sorted(vars(item)), ['menu', 'record', 'should_exit'])
+        self.assertIsNone(item.port)
+        self.assertIsNone(item.ssh_options)
+        self.assertIsNone(item.exit_status)
+        self.assertIsNone(item.connect_latency)
+
+    def test_options(self):
+        """
+        Store a port and `ssh` options when they are given
+        """
+        item = DeviceItem('sw1', '10.0.0.1', port=2222,
+                          ssh_options=['-o', 'ConnectTimeout=5'])
+        self.assertEqual(item.port, 2222)
+        self.assertEqual(item.ssh_options, ['-o', 'ConnectTimeout=5'])
+        self.assertEqual(item.probe_target, ('10.0.0.1', 2222))
+        self.assertEqual((item.text, item.text_id), ('sw1', '10.0.0.1'))
+
+
+class SearchAPI(object):
+    """Answers searches from a list, counting them."""
+
+    def __init__(self):
+        self.searches = list()
+
+    def iter_devices(self, q=None):
+        self.searches.append(q)
+        return iter([{'id': 1, 'display_name': 'core-sw01',
+                      'primary_ip': {'address': '10.0.0.1'},
+                      'site': {'slug': 'site-a'}}])
+
+
+class SearchItemTests(unittest.TestCase):
+
+    def test_reuse_api(self):
+        """
+        Search Netbox through the same API every time
+        """
+        api = SearchAPI()
+        item = SearchItem("Search", submenu=Jumpbox("Search Results"),
+                          api=api)
+        for query in ('core', 'sw01'):
+            self.assertEqual([record.name for record in item.search(query)],
+                             ['core-sw01'])
+        self.assertEqual(api.searches, ['core', 'sw01'])
+        self.assertIs(item.api, api)
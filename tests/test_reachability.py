@@ -0,0 +1,167 @@
+import socket
+import time
+import unittest
+
+from jumpbox.reachability import DOWN
+from jumpbox.reachability import UNKNOWN
+from jumpbox.reachability import UP
+from jumpbox.reachability import ReachabilityProber
+
+
+def run(prober, limit=5):
+    """Poll until every probe has finished, returning what `poll` did."""
+    changes = list()
+    deadline = time.time() + limit
+    while prober.pending and time.time() < deadline:
+        changes.append(prober.poll())
+        time.sleep(0.01)
+    return changes
+
+
+class ProberTests(unittest.TestCase):
+
+    def setUp(self):
+        self.sockets = list()
+        self.prober = ReachabilityProber(timeout=0.3, ttl=60)
+
+    def tearDown(self):
+        for sock in self.sockets:
+            sock.close()
+
+    def listen(self, backlog=5):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(backlog)
+        self.sockets.append(sock)
+        return sock.getsockname()[1]
+
+    def closed_port(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        return port
+
+    def test_up(self):
+        """
+        Mark a device accepting connections as up
+        """
+        port = self.listen()
+        self.assertEqual(self.prober.status('127.0.0.1', port), UNKNOWN)
+        self.prober.watch([('127.0.0.1', port)])
+        self.assertTrue(any(run(self.prober)))
+        self.assertEqual(self.prober.status('127.0.0.1', port), UP)
+
+    def test_down(self):
+        """
+        Mark a device refusing connections as down
+        """
+        port = self.closed_port()
+        self.prober.watch([('127.0.0.1', port)])
+        run(self.prober)
+        self.assertEqual(self.prober.status('127.0.0.1', port), DOWN)
+
+    def test_timeout(self):
+        """
+        Mark a device that doesn't answer within the timeout as down
+        """
+        # Once the backlog is full, further connections are left waiting.
+        port = self.listen(backlog=0)
+        for _ in range(2):
+            client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            client.setblocking(0)
+            client.connect_ex(('127.0.0.1', port))
+            self.sockets.append(client)
+
+        started = time.time()
+        self.prober.watch([('127.0.0.1', port)])
+        run(self.prober)
+        self.assertGreaterEqual(time.time() - started, 0.3)
+        self.assertEqual(self.prober.status('127.0.0.1', port), DOWN)
+
+    def test_hostname(self):
+        """
+        Don't look up hostnames, leaving their status unknown
+        """
+        self.prober.watch([('localhost', self.listen())])
+        self.assertEqual(run(self.prober), [False])
+        self.assertEqual(self.prober.status('localhost'), UNKNOWN)
+
+    def test_default_port(self):
+        """
+        Probe port 22 for devices without a port
+        """
+        self.prober.watch([('127.0.0.1', None)])
+        self.assertEqual(self.prober._queue, [('127.0.0.1', 22)])
+
+    def test_ttl(self):
+        """
+        Only probe a device again once its result is older than the TTL
+        """
+        port = self.listen()
+        target = [('127.0.0.1', port)]
+        self.prober.watch(target)
+        run(self.prober)
+        self.prober.watch(target)
+        self.assertFalse(self.prober.pending)
+
+        self.prober.ttl = 0
+        self.prober.watch(target)
+        self.assertTrue(self.prober.pending)
+        self.assertFalse(any(run(self.prober)))
+        self.assertEqual(self.prober.status('127.0.0.1', port), UP)
+
+    def test_changed(self):
+        """
+        Report a change only when a device's status changes
+        """
+        port = self.listen()
+        target = [('127.0.0.1', port)]
+        self.prober.ttl = 0
+        self.prober.watch(target)
+        self.assertTrue(any(run(self.prober)))
+        self.assertFalse(self.prober.poll())
+
+        self.sockets.pop().close()
+        self.prober.watch(target)
+        self.assertTrue(any(run(self.prober)))
+        self.assertEqual(self.prober.status('127.0.0.1', port), DOWN)
+
+    def test_watch_replaces_queue(self):
+        """
+        Drop queued devices that are no longer on the screen
+        """
+        self.prober.watch([('127.0.0.1', 1), ('127.0.0.1', 2),
+                           ('127.0.0.1', 1)])
+        self.assertEqual(self.prober._queue, [('127.0.0.1', 1),
+                                              ('127.0.0.1', 2)])
+        self.prober.watch([('127.0.0.1', 3)])
+        self.assertEqual(self.prober._queue, [('127.0.0.1', 3)])
+
+    def test_max_probes(self):
+        """
+        Keep no more than `max_probes` probes in flight
+        """
+        port = self.listen(backlog=0)
+        for _ in range(2):
+            client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            client.setblocking(0)
+            client.connect_ex(('127.0.0.1', port))
+            self.sockets.append(client)
+
+        self.prober.max_probes = 1
+        self.prober.watch([('127.0.0.1', port), ('127.0.0.2', port)])
+        self.prober.poll()
+        self.assertEqual(len(self.prober._probes), 1)
+        self.assertEqual(len(self.prober._queue), 1)
+        run(self.prober)
+
+    def test_from_environ(self):
+        """
+        Only probe when `JUMPBOX_PROBE` is set
+        """
+        self.assertIsNone(ReachabilityProber.from_environ({}))
+        prober = ReachabilityProber.from_environ({
+            'JUMPBOX_PROBE': '1', 'JUMPBOX_PROBE_TIMEOUT': '0.5',
+            'JUMPBOX_PROBE_TTL': 'x'})
+        self.assertEqual((prober.timeout, prober.ttl), (0.5, 60))
@@ -0,0 +1,118 @@
+import unittest
+
+from jumpbox.device_store import DeviceRecord
+from jumpbox.device_store import DeviceStore
+from jumpbox.search_index import SearchIndex
+from jumpbox.search_index import trigrams
+
+
+def device(device_id, name, address, site_slug='site-a'):
+    return {
+        'id': device_id,
+        'display_name': name,
+        'primary_ip': {'address': address},
+        'site': {'slug': site_slug},
+    }
+
+
+class TrigramTests(unittest.TestCase):
+
+    def test_trigrams(self):
+        """
+        Split text into every three character substring
+        """
+        self.assertEqual(trigrams('abcd'), set(['abc', 'bcd']))
+
+    def test_short_text(self):
+        """
+        Text shorter than three characters has no trigrams
+        """
+        self.assertEqual(trigrams('ab'), set())
+
+
+class SearchIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.store = DeviceStore([
+            device(1, 'core-sw01', '10.0.0.1'),
+            device(2, 'core-sw02', '10.0.0.2'),
+            device(3, 'edge-rtr01', '10.0.1.1'),
+        ])
+        self.index = SearchIndex(self.store)
+
+    def names(self, query):
+        return [record.name for record in self.index.search(query)]
+
+    def test_hostname(self):
+        """
+        Match any part of a hostname, in the order devices were added
+        """
+        self.assertEqual(self.names('sw0'), ['core-sw01', 'core-sw02'])
+        self.assertEqual(self.names('rtr'), ['edge-rtr01'])
+
+    def test_address(self):
+        """
+        Match any part of a primary IP address
+        """
+        self.assertEqual(self.names('10.0.1'), ['edge-rtr01'])
+
+    def test_no_match(self):
+        """
+        Return nothing when a trigram of the query isn't indexed
+        """
+        self.assertEqual(self.names('xyz'), [])
+
+    def test_trigrams_not_in_order(self):
+        """
+        Only return devices holding the whole query, not just its trigrams
+        """
+        self.assertEqual(self.names('sw01core'), [])
+
+    def test_short_query(self):
+        """
+        Match queries under three characters as plain substrings
+        """
+        self.assertEqual(self.names('02'), ['core-sw02'])
+        self.assertEqual(self.names('e'), ['core-sw01', 'core-sw02',
+                                           'edge-rtr01'])
+
+    def test_case_insensitive(self):
+        """
+        Match hostnames without regard to case
+        """
+        self.assertEqual(self.names('EDGE'), ['edge-rtr01'])
+        self.store.add(device(4, 'DIST-SW01', '10.0.2.1'))
+        self.assertEqual(self.names('dist'), ['DIST-SW01'])
+
+    def test_empty_query(self):
+        """
+        Return every device for an empty query
+        """
+        self.assertEqual(len(self.index.search('  ')), 3)
+
+    def test_added_devices(self):
+        """
+        Index devices added to the store since the last search
+        """
+        self.assertEqual(self.names('access'), [])
+        self.store.add(device(4, 'access-sw01', '10.0.3.1'))
+        self.assertEqual(self.names('access'), ['access-sw01'])
+
+    def test_updated_device(self):
+        """
+        Re-index a device the store updates with a new hostname
+        """
+        self.assertEqual(self.names('rtr'), ['edge-rtr01'])
+        self.store.add(device(3, 'border-fw01', '10.0.1.9'))
+        self.assertEqual(self.names('rtr'), [])
+        self.assertEqual(self.names('border'), ['border-fw01'])
+        self.assertEqual(self.names('10.0.1.9'), ['border-fw01'])
+
+    def test_without_store(self):
+        """
+        Index records added directly to the index
+        """
+        index = SearchIndex()
+        index.add(DeviceRecord(1, 'lab-sw01', '192.0.2.1'))
+        self.assertEqual([record.name for record in index.search('lab')],
+                         ['lab-sw01'])
@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from jumpbox.ssh_launcher import SSHLauncher
+
+
+class MeasureTests(unittest.TestCase):
+
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.log_dir)
+
+    def test_opt_in(self):
+        """
+        Only measure connections when `JUMPBOX_SSH_MEASURE` is set
+        """
+        self.assertFalse(SSHLauncher.from_environ({}).measure)
+        self.assertFalse(SSHLauncher.from_environ(
+            {'JUMPBOX_SSH_MEASURE': '0'}).measure)
+        self.assertTrue(SSHLauncher.from_environ(
+            {'JUMPBOX_SSH_MEASURE': '1'}).measure)
+
+    def test_not_measured(self):
+        """
+        Run `ssh` without `-v` or a log file by default
+        """
+        launcher = SSHLauncher(ssh='true', log_dir=self.log_dir)
+        self.assertNotIn('-v', launcher.argv('192.0.2.1'))
+        session = launcher.connect('192.0.2.1')
+        self.assertEqual(session['exit_status'], 0)
+        self.assertIsNone(session['connect_latency'])
+        self.assertEqual(os.listdir(self.log_dir), [])
@@ -0,0 +1,63 @@
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+from jumpbox.ssh_mux import SSHMultiplexer
+
+
+class SSHMultiplexerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.multiplexer = SSHMultiplexer(temp_dir=self.temp_dir, ssh='true')
+
+    def tearDown(self):
+        self.multiplexer.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_private_directory(self):
+        """
+        Keep the sockets in a private directory created for the run
+        """
+        options = self.multiplexer.options()
+        control_dir = self.multiplexer.control_dir
+        self.assertEqual(os.path.dirname(control_dir), self.temp_dir)
+        self.assertEqual(stat.S_IMODE(os.stat(control_dir).st_mode), 0o700)
+        self.assertIn('ControlPath=' + os.path.join(control_dir, '%C'),
+                      options)
+        self.assertEqual(self.multiplexer.options(), options)
+
+    def test_separate_runs(self):
+        """
+        Never share a socket directory between runs of the menu
+        """
+        other = SSHMultiplexer(temp_dir=self.temp_dir, ssh='true')
+        try:
+            self.assertNotEqual(other.options(), self.multiplexer.options())
+        finally:
+            other.close()
+
+    def test_master(self):
+        """
+        Only start a master connection when the session may
+        """
+        self.assertIn('ControlMaster=auto', self.multiplexer.options())
+        self.assertIn('ControlPersist=600', self.multiplexer.options())
+        options = self.multiplexer.options(master=False)
+        self.assertIn('ControlMaster=no', options)
+        self.assertFalse([option for option in options
+                          if option.startswith('ControlPersist')])
+
+    def test_close(self):
+        """
+        Stop the master connections and remove the directory on exit
+        """
+        self.multiplexer.options()
+        control_dir = self.multiplexer.control_dir
+        open(os.path.join(control_dir, 'socket'), 'w').close()
+        self.multiplexer.close()
+        self.assertFalse(os.path.exists(control_dir))
+        self.assertIsNone(self.multiplexer.control_dir)
+        self.multiplexer.close()